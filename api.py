@@ -0,0 +1,446 @@
+# Headless JSON API over the HRMS data. Run with: uvicorn api:app --port 8000
+# Select an entity with the X-HRMS-Entity header; the default entity is used otherwise.
+# Every request needs "Authorization: Bearer $HRMS_API_KEY"; without a configured key the API rejects all requests.
+import asyncio
+import hashlib
+import hmac
+import os
+from datetime import datetime
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import main
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+API_KEY = os.environ.get("HRMS_API_KEY")
+
+table_caches = {}
+write_locks = {}
+
+
+class BadRequest(Exception):
+    pass
+
+
+class SaveFailed(Exception):
+    pass
+
+
+def load_tables():
+    table_cache = table_caches.setdefault(main.current_entity_dir.get(), {})
+    version = main.get_data_version()
+    if "tables" not in table_cache or table_cache["version"] != version:
+        table_cache["tables"] = main.get_db_connection()
+        table_cache["version"] = version
+    return table_cache["tables"], version
+
+
+async def write_tables(mutate, notify=None, changed=None):
+    async with write_locks.setdefault(main.current_entity_dir.get(), asyncio.Lock()):
+        def apply():
+            tables, _ = load_tables()
+            tables = dict(tables)
+            result = mutate(tables)
+            if not main.save_db(tables, notifications=notify(tables, result) if notify else None, changed=changed):
+                raise SaveFailed()
+            table_cache = table_caches[main.current_entity_dir.get()]
+            table_cache["tables"] = tables
+            table_cache["version"] = main.get_data_version()
+            return result
+        return await asyncio.to_thread(apply)
+
+
+def error(message, status_code=400):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def cached_json(request, version, build):
+    etag = '"' + hashlib.sha1(f"{main.current_entity_dir.get()}|{version}|{request.url.path}|"
+                              f"{request.url.query}".encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(build(), media_type="application/json", headers={"ETag": etag})
+
+
+def int_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"Query parameter '{name}' must be an integer")
+
+
+def paginate(request, df):
+    page = max(int_param(request, "page", 1), 1)
+    page_size = min(max(int_param(request, "page_size", DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    items = df.iloc[(page - 1) * page_size:page * page_size]
+    return (f'{{"total": {len(df)}, "page": {page}, "page_size": {page_size}, '
+            f'"items": {items.to_json(orient="records", date_format="iso")}}}')
+
+
+def filter_by_employee(request, df):
+    employee_id = int_param(request, "employee_id")
+    if employee_id is not None:
+        df = df[df["employee_id"] == employee_id]
+    return df
+
+
+async def read_json_object(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise BadRequest("Request body must be valid JSON")
+    if not isinstance(payload, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return payload
+
+
+async def read_json_list(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise BadRequest("Request body must be valid JSON")
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("Request body must be a JSON object or a non-empty list of objects")
+    return payload
+
+
+async def list_employees(request):
+    tables, version = await asyncio.to_thread(load_tables)
+
+    def build():
+        employees = tables.get("employees", pd.DataFrame(
+            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                     "department", "salary", "is_active"]))
+        if request.query_params.get("include_inactive") != "true":
+            employees = employees[employees["is_active"] == 1]
+        department = request.query_params.get("department")
+        if department:
+            employees = employees[employees["department"] == department]
+        return paginate(request, employees.sort_values("id"))
+    return cached_json(request, version, build)
+
+
+async def get_employee(request):
+    tables, version = await asyncio.to_thread(load_tables)
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    employee = employees[employees["id"] == request.path_params["id"]]
+    if employee.empty:
+        return error("Employee not found", 404)
+    return cached_json(request, version, lambda: employee.iloc[[0]].to_json(orient="records", date_format="iso")[1:-1])
+
+
+async def create_employees(request):
+    try:
+        records = await read_json_list(request)
+    except ValueError as e:
+        return error(str(e))
+    required = ["employee_id", "first_name", "last_name", "email", "department", "salary"]
+    regimes, states = main.get_tax_options()
+    for record in records:
+        if not isinstance(record, dict):
+            return error(f"Expected an object, got {record!r}")
+        missing = [field for field in required if not record.get(field) and record.get(field) != 0]
+        if missing:
+            return error(f"Missing fields {missing} in {record}")
+        try:
+            float(record["salary"])
+            pd.to_datetime(record.get("hire_date", datetime.now().date()))
+        except (TypeError, ValueError) as e:
+            return error(f"Invalid salary or hire_date in {record}: {e}")
+        if record.get("tax_regime") is not None and record["tax_regime"] not in regimes:
+            return error(f"Unknown tax_regime in {record}; expected one of {regimes}")
+        if record.get("state") is not None and record["state"] not in states:
+            return error(f"Unknown state in {record}; expected one of {states}")
+
+    def mutate(tables):
+        employees = tables.get("employees", pd.DataFrame(
+            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                     "department", "salary", "is_active"]))
+        duplicates = set(employees["employee_id"].astype(str)) & {str(record["employee_id"]) for record in records}
+        if duplicates:
+            raise ValueError(f"Employee IDs already exist: {sorted(duplicates)}")
+        start_id = int(employees["id"].max()) + 1 if not employees.empty else 1
+        new_employees = pd.DataFrame([{
+            "id": start_id + offset,
+            "employee_id": record["employee_id"],
+            "first_name": record["first_name"],
+            "last_name": record["last_name"],
+            "email": record["email"],
+            "phone": record.get("phone"),
+            "hire_date": pd.to_datetime(record.get("hire_date", datetime.now().date())),
+            "job_title": record.get("job_title"),
+            "department": record["department"],
+            "salary": float(record["salary"]),
+            "is_active": 1,
+            "tax_regime": record.get("tax_regime"),
+            "state": record.get("state")
+        } for offset, record in enumerate(records)])
+        tables["employees"] = pd.concat([employees, new_employees], ignore_index=True)
+        return new_employees["id"].tolist()
+
+    try:
+        ids = await write_tables(mutate, changed=["employees"])
+    except ValueError as e:
+        return error(str(e), 409)
+    return JSONResponse({"created": len(ids), "ids": ids}, status_code=201)
+
+
+async def list_attendance(request):
+    tables, version = await asyncio.to_thread(load_tables)
+
+    def build():
+        attendance = main.read_table_range(tables, "attendance", request.query_params.get("start"),
+                                           request.query_params.get("end"))
+        attendance = filter_by_employee(request, attendance)
+        return paginate(request, attendance.sort_values("check_in", ascending=False))
+    return cached_json(request, version, build)
+
+
+async def create_punches(request):
+    try:
+        records = await read_json_list(request)
+        punches = pd.DataFrame(records)
+        punches["employee_id"] = punches["employee_id"].astype(int)
+        punches["check_in"] = pd.to_datetime(punches["check_in"])
+        punches["check_out"] = pd.to_datetime(punches["check_out"]) if "check_out" in punches.columns else pd.NaT
+    except (ValueError, KeyError, TypeError) as e:
+        return error(f"Invalid punches: {e}")
+    if (punches["check_out"].notna() & (punches["check_out"] <= punches["check_in"])).any():
+        return error("Check-out time must be after check-in time!")
+
+    def mutate(tables):
+        attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
+        employees = tables.get("employees", pd.DataFrame(columns=["id"]))
+        unknown = set(punches["employee_id"]) - set(employees["id"])
+        if unknown:
+            raise ValueError(f"Unknown employees: {sorted(unknown)}")
+        start_id = main.get_next_id("attendance", attendance)
+        new_attendance = punches[["employee_id", "check_in", "check_out"]].copy()
+        new_attendance.insert(0, "id", range(start_id, start_id + len(new_attendance)))
+        tables["attendance"] = pd.concat([attendance, new_attendance], ignore_index=True)
+        return len(new_attendance)
+
+    try:
+        created = await write_tables(mutate, changed=["attendance"])
+    except ValueError as e:
+        return error(str(e), 422)
+    return JSONResponse({"created": created}, status_code=201)
+
+
+async def list_leave_requests(request):
+    tables, version = await asyncio.to_thread(load_tables)
+
+    def build():
+        leave_requests = tables.get("leave_requests", pd.DataFrame(
+            columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
+        leave_requests = filter_by_employee(request, leave_requests)
+        status = request.query_params.get("status")
+        if status:
+            leave_requests = leave_requests[leave_requests["status"] == status]
+        return paginate(request, leave_requests.sort_values("created_at", ascending=False))
+    return cached_json(request, version, build)
+
+
+async def create_leave_requests(request):
+    try:
+        records = await read_json_list(request)
+        leaves = pd.DataFrame(records)
+        leaves["employee_id"] = leaves["employee_id"].astype(int)
+        leaves["start_date"] = pd.to_datetime(leaves["start_date"])
+        leaves["end_date"] = pd.to_datetime(leaves["end_date"])
+    except (ValueError, KeyError, TypeError) as e:
+        return error(f"Invalid leave requests: {e}")
+    if (leaves["start_date"] > leaves["end_date"]).any():
+        return error("End date must be after start date!")
+
+    def mutate(tables):
+        leave_requests = tables.get("leave_requests", pd.DataFrame(
+            columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
+        employees = tables.get("employees", pd.DataFrame(columns=["id"]))
+        unknown = set(leaves["employee_id"]) - set(employees["id"])
+        if unknown:
+            raise ValueError(f"Unknown employees: {sorted(unknown)}")
+        start_id = int(leave_requests["id"].max()) + 1 if not leave_requests.empty else 1
+        new_leaves = pd.DataFrame({
+            "id": range(start_id, start_id + len(leaves)),
+            "employee_id": leaves["employee_id"].values,
+            "start_date": leaves["start_date"].values,
+            "end_date": leaves["end_date"].values,
+            "leave_type": leaves.get("leave_type", pd.Series("Casual", index=leaves.index)).values,
+            "reason": leaves.get("reason", pd.Series("", index=leaves.index)).values,
+            "status": "Pending",
+            "created_at": datetime.now()
+        })
+        tables["leave_requests"] = pd.concat([leave_requests, new_leaves], ignore_index=True)
+        return new_leaves["id"].tolist()
+
+    try:
+        ids = await write_tables(mutate, changed=["leave_requests"])
+    except ValueError as e:
+        return error(str(e), 422)
+    return JSONResponse({"created": len(ids), "ids": ids}, status_code=201)
+
+
+async def update_leave_status(request):
+    payload = await read_json_object(request)
+    ids = payload.get("ids", [])
+    status = payload.get("status")
+    if status not in ["Pending", "Approved", "Rejected"] or not isinstance(ids, list) or not ids:
+        return error("Provide 'ids' and a 'status' of Pending, Approved or Rejected")
+    if not all(isinstance(leave_id, int) and not isinstance(leave_id, bool) for leave_id in ids):
+        return error("'ids' must be a list of integers")
+
+    def mutate(tables):
+        leave_requests = tables.get("leave_requests", pd.DataFrame(
+            columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status",
+                     "created_at"])).copy()
+        selected = leave_requests["id"].isin(ids)
+        decided = leave_requests.loc[selected & (leave_requests["status"] != status), "id"].tolist()
+        leave_requests.loc[selected, "status"] = status
+        tables["leave_requests"] = leave_requests
+        return {"updated": int(selected.sum()), "decided": decided}
+
+    def notify(tables, result):
+        return main.build_leave_notifications(tables, result["decided"])
+
+    result = await write_tables(mutate, notify, changed=["leave_requests"])
+    return JSONResponse({"updated": result["updated"]})
+
+
+async def list_payroll_runs(request):
+    tables, version = await asyncio.to_thread(load_tables)
+
+    def build():
+        payroll_transactions = main.read_table_range(tables, "payroll_transactions")
+        runs = payroll_transactions.assign(
+            transaction_date=pd.to_datetime(payroll_transactions["transaction_date"]).dt.strftime("%Y-%m-%d")
+        ).groupby("transaction_date", as_index=False).agg(
+            transactions=("id", "count"), total_gross=("gross_pay", "sum"), total_net=("net_pay", "sum")
+        ).sort_values("transaction_date", ascending=False)
+        return paginate(request, runs)
+    return cached_json(request, version, build)
+
+
+async def get_payroll_run(request):
+    tables, version = await asyncio.to_thread(load_tables)
+    payroll_date = request.path_params["payroll_date"]
+
+    def build():
+        transactions = main.read_table_range(tables, "payroll_transactions", payroll_date, payroll_date)
+        return paginate(request, filter_by_employee(request, transactions).sort_values("employee_id"))
+    return cached_json(request, version, build)
+
+
+async def create_payroll_run(request):
+    payload = await read_json_object(request)
+    try:
+        payroll_date = pd.to_datetime(payload["payroll_date"])
+        if pd.isna(payroll_date):
+            raise ValueError("a date is required")
+        payroll_date = payroll_date.date()
+    except (KeyError, TypeError, ValueError) as e:
+        return error(f"Invalid payroll_date: {e}")
+    department = payload.get("department", "All")
+    if not isinstance(department, str):
+        return error("'department' must be a string")
+
+    def mutate(tables):
+        new_transactions = main.build_payroll_run(tables, payroll_date, department)
+        if new_transactions is None:
+            raise LookupError("No employees found for the selected department!")
+        return new_transactions
+
+    try:
+        new_transactions = await write_tables(mutate, main.build_payroll_notifications,
+                                              changed=["payroll_transactions"])
+    except LookupError as e:
+        return error(str(e), 404)
+    return JSONResponse({"payroll_date": str(payroll_date), "transactions": len(new_transactions),
+                         "total_gross": float(new_transactions["gross_pay"].sum()),
+                         "total_net": float(new_transactions["net_pay"].sum())}, status_code=201)
+
+
+async def get_report(request):
+    report_type = request.path_params["report_type"].replace("-", " ").title()
+    if report_type not in ["Payroll Summary", "Tax Withholding", "Benefits Deductions"]:
+        return error("Unknown report type", 404)
+    version = await asyncio.to_thread(main.get_report_version, report_type)
+    report = await asyncio.to_thread(main.build_payroll_report, report_type, version)
+    return cached_json(request, version, lambda: report["summary"].to_json(orient="records", date_format="iso"))
+
+
+async def export_table(request):
+    table_name = request.path_params["table_name"]
+    file_format = request.query_params.get("format", "csv").upper()
+    compress = request.query_params.get("gzip") == "true"
+    tables, _ = await asyncio.to_thread(load_tables)
+    if table_name not in tables or table_name == "users":
+        return error("Unknown table", 404)
+    if file_format not in main.EXPORT_FORMATS:
+        return error(f"Unsupported format {file_format.lower()}")
+    try:
+        start_date = pd.to_datetime(request.query_params["start"]) if "start" in request.query_params else None
+        end_date = pd.to_datetime(request.query_params["end"]) if "end" in request.query_params else None
+    except ValueError as e:
+        return error(f"Invalid date range: {e}")
+    if (start_date is not None or end_date is not None) and table_name not in main.PARTITIONED_TABLES:
+        return error("Date ranges are only supported for attendance and payroll_transactions")
+    chunks = await asyncio.to_thread(main.iter_table_chunks, table_name, start_date, end_date)
+    file_name, mime = main.get_export_file_name(table_name, file_format, compress)
+    return StreamingResponse(main.stream_export(chunks, file_format, compress, table_name), media_type=mime,
+                             headers={"Content-Disposition": f'attachment; filename="{file_name}"'})
+
+
+async def check_api_key(request, call_next):
+    if not API_KEY:
+        return error("HRMS_API_KEY is not configured; the API is disabled", 503)
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), f"Bearer {API_KEY}".encode()):
+        return error("Unauthorized", 401)
+    try:
+        main.set_current_entity(request.headers.get("x-hrms-entity", main.DEFAULT_ENTITY))
+        main.current_actor.set("api")
+    except KeyError as e:
+        return error(str(e.args[0]), 404)
+    return await call_next(request)
+
+
+routes = [
+    Route("/employees", list_employees, methods=["GET"]),
+    Route("/employees", create_employees, methods=["POST"]),
+    Route("/employees/{id:int}", get_employee, methods=["GET"]),
+    Route("/attendance", list_attendance, methods=["GET"]),
+    Route("/attendance", create_punches, methods=["POST"]),
+    Route("/leave-requests", list_leave_requests, methods=["GET"]),
+    Route("/leave-requests", create_leave_requests, methods=["POST"]),
+    Route("/leave-requests/status", update_leave_status, methods=["POST"]),
+    Route("/payroll/runs", list_payroll_runs, methods=["GET"]),
+    Route("/payroll/runs", create_payroll_run, methods=["POST"]),
+    Route("/payroll/runs/{payroll_date}", get_payroll_run, methods=["GET"]),
+    Route("/reports/{report_type}", get_report, methods=["GET"]),
+    Route("/export/{table_name}", export_table, methods=["GET"]),
+]
+
+
+async def bad_request(request, exc):
+    return error(str(exc))
+
+
+async def save_failed(request, exc):
+    return error("The data could not be saved", 500)
+
+
+app = Starlette(routes=routes, middleware=[Middleware(BaseHTTPMiddleware, dispatch=check_api_key)],
+                exception_handlers={BadRequest: bad_request, SaveFailed: save_failed})
@@ -0,0 +1,51 @@
+# Login throughput benchmark for the bcrypt cost factors. Run with: python benchmark_passwords.py
+# Reports verification time and achievable logins per second, per core and for all cores, at each cost.
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+import main
+
+
+def verify_batch(hashed, samples):
+    start = time.perf_counter()
+    for _ in range(samples):
+        bcrypt.checkpw(b"benchmark-password", hashed)
+    return time.perf_counter() - start
+
+
+def benchmark_rounds(rounds, samples, workers):
+    hashed = bcrypt.hashpw(b"benchmark-password", bcrypt.gensalt(rounds=rounds))
+    single_seconds = verify_batch(hashed, samples) / samples
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        list(executor.map(verify_batch, [hashed] * workers, [samples] * workers))
+        elapsed = time.perf_counter() - start
+    return {"rounds": rounds, "verify_ms": single_seconds * 1000, "per_core": 1 / single_seconds,
+            "all_cores": workers * samples / elapsed}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt login throughput")
+    parser.add_argument("--min-rounds", type=int, default=main.BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=main.BCRYPT_MAX_ROUNDS - 2)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rounds, expected_seconds = main.calibrate_bcrypt_rounds()
+    print(f"Calibrated cost for a {main.BCRYPT_TARGET_SECONDS * 1000:.0f} ms target: {rounds} "
+          f"(~{expected_seconds * 1000:.0f} ms per verification)")
+    print(f"{'cost':>4}  {'verify ms':>10}  {'logins/s/core':>13}  {'logins/s (' + str(args.workers) + ' cores)':>20}")
+    for cost in range(args.min_rounds, args.max_rounds + 1):
+        result = benchmark_rounds(cost, args.samples, args.workers)
+        marker = "  <- policy" if cost == rounds else ""
+        print(f"{result['rounds']:>4}  {result['verify_ms']:>10.1f}  {result['per_core']:>13.1f}  "
+              f"{result['all_cores']:>20.1f}{marker}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,32 +1,362 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import bcrypt
 from datetime import datetime, date
+from bisect import bisect_left, bisect_right
 import plotly.express as px
 import plotly.graph_objects as go
+from pypdf import PdfReader
+from openpyxl import Workbook
+import pyarrow.parquet as pq
 import os
 import base64
+import tempfile
+import io
+import gzip
+import hashlib
+import hmac
+import secrets
+import zipfile
+import zlib
+import json
+import time
+import threading
+import contextvars
+import asyncio
+import sqlite3
+import smtplib
+import re
+import math
+import heapq
+import queue
+from collections import Counter
+from email.message import EmailMessage
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Constants
 EXCEL_FILE = "hrms_data.xlsx"
+ENTITIES_FILE = "entities.json"
+ENTITIES_DIR = "entities"
+DEFAULT_ENTITY = "default"
+EVENT_LOG_FILE = "events.log.gz"
+EVENT_INDEX_FILE = "events.log.idx"
+EVENT_REDACTED_COLUMNS = {"users": ["password"], "bank_details": ["account_number"]}
+CHANGE_LOG_LIMIT = 500
+REPORT_TABLES = {"Payroll Summary": ["payroll_transactions"],
+                 "Tax Withholding": ["payroll_deductions", "employees"],
+                 "Benefits Deductions": ["payroll_deductions", "employees"]}
+EMPLOYEE_DIRECTORY_COLUMNS = ["employee_id", "first_name", "last_name", "department", "job_title"]
+TAX_CONFIG_FILE = "tax_config.json"
+DEFAULT_TAX_CONFIG = {
+    "default_regime": "old",
+    "default_state": "Default",
+    "provident_fund_rate": 0.12,
+    "income_tax": {
+        "2024-25": {
+            "old": [[0, 0.0], [250000, 0.05], [500000, 0.20], [1000000, 0.30]],
+            "new": [[0, 0.0], [300000, 0.05], [700000, 0.10], [1000000, 0.15], [1200000, 0.20], [1500000, 0.30]]
+        },
+        "2025-26": {
+            "old": [[0, 0.0], [250000, 0.05], [500000, 0.20], [1000000, 0.30]],
+            "new": [[0, 0.0], [400000, 0.05], [800000, 0.10], [1200000, 0.15], [1600000, 0.20], [2000000, 0.25],
+                    [2400000, 0.30]]
+        }
+    },
+    "professional_tax": {
+        "Default": [[0, 200]],
+        "Maharashtra": [[0, 0], [7500, 175], [10000, 200]],
+        "Karnataka": [[0, 0], [25000, 200]],
+        "West Bengal": [[0, 0], [10000, 110], [15000, 130], [25000, 150], [40000, 200]],
+        "Gujarat": [[0, 0], [12000, 200]],
+        "Tamil Nadu": [[0, 0], [21000, 135], [30000, 315], [45000, 690], [60000, 1025], [75000, 1250]]
+    }
+}
 RESUME_DIR = "resumes"
+PAYSLIP_DIR = "payslips"
+PAYSLIP_FIELDS = ["employee_id", "first_name", "last_name", "department", "job_title", "base_salary", "allowances",
+                  "overtime_hours", "overtime_pay", "tax_regime", "tax_slab", "income_tax", "provident_fund",
+                  "professional_tax", "deductions", "total_deductions"]
+DISBURSEMENT_DIR = "disbursements"
+ARCHIVE_DIR = "archive"
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_INTERVAL_SECONDS = 15 * 60
+SNAPSHOT_COUNT = 10
+PARTITIONED_TABLES = {"attendance": "check_in", "payroll_transactions": "transaction_date"}
+IFSC_PATTERN = r"[A-Z]{4}0[A-Z0-9]{6}"
+ACCOUNT_NUMBER_PATTERN = r"\d{9,18}"
+RTGS_MINIMUM = 200000
+LATE_ARRIVAL_GRACE = pd.Timedelta(minutes=30)
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DEFAULT_SHIFT = {"id": 0, "name": "Standard", "start_time": "09:00", "end_time": "17:00", "break_minutes": 0,
+                 "work_days": "Mon,Tue,Wed,Thu,Fri"}
+ROLLING_REVIEW_WINDOW = 3
+CALIBRATION_THRESHOLD = 0.5
+CALIBRATION_MIN_REVIEWS = 3
+PROJECTION_RAISE_MONTH = 4
+DEFAULT_TIME_TO_FILL_MONTHS = 2
+PROJECTION_PERCENTILES = [10, 50, 90]
+RECRUITMENT_STAGES = ["Applied", "Screening", "Interview", "Offer", "Hired"]
+POSITION_STATUSES = ["Open", "Closed", "On Hold"]
+RESUME_INDEX_FILE = "search_index.json"
+RESUME_EXCERPT_LENGTH = 300
+BM25_K1 = 1.2
+BM25_B = 0.75
+PASSWORD_POLICY_FILE = "password_policy.json"
+BCRYPT_TARGET_SECONDS = 0.25
+BCRYPT_MIN_ROUNDS = 12
+BCRYPT_MAX_ROUNDS = 16
+SESSION_STORE_FILE = "sessions.json"
+SESSION_SECRET_FILE = "session_secret.key"
+SESSION_COOKIE = "hrms_session"
+SESSION_TTL_SECONDS = 8 * 60 * 60
+EXPORT_CHUNK_ROWS = 50000
+EXPORT_UI_MAX_ROWS = 200000
+OUTBOX_FILE = "outbox.db"
+NOTIFICATION_DIR = "notifications"
+NOTIFICATION_TRANSPORT = os.environ.get("HRMS_NOTIFICATION_TRANSPORT", "file")
+NOTIFICATION_SENDER = os.environ.get("HRMS_NOTIFICATION_SENDER", "hrms@localhost")
+SMTP_HOST = os.environ.get("HRMS_SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("HRMS_SMTP_PORT", "25"))
+SMTP_USER = os.environ.get("HRMS_SMTP_USER")
+SMTP_PASSWORD = os.environ.get("HRMS_SMTP_PASSWORD")
+SMTP_TIMEOUT_SECONDS = 30
+NOTIFICATION_BATCH_SIZE = 20
+NOTIFICATION_RATE_PER_SECOND = 5
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_SECONDS = 30
+NOTIFICATION_POLL_SECONDS = 10
+NOTIFICATION_LEASE_SECONDS = 10 * SMTP_TIMEOUT_SECONDS
+EXPORT_FORMATS = {"CSV": ("csv", "text/csv"),
+                  "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+
+
+write_batch = threading.local()
+current_entity_dir = contextvars.ContextVar("current_entity_dir", default="")
+current_actor = contextvars.ContextVar("current_actor", default="system")
+
+
+def load_entities():
+    entities = {DEFAULT_ENTITY: {"name": "Default", "data_dir": ""}}
+    if os.path.exists(ENTITIES_FILE):
+        try:
+            with open(ENTITIES_FILE, "r") as f:
+                entities = json.load(f)
+        except Exception as e:
+            st.error(f"Error reading {ENTITIES_FILE}: {str(e)}")
+    return entities
+
+
+def set_current_entity(entity):
+    entities = load_entities()
+    if entity not in entities:
+        raise KeyError(f"Unknown entity: {entity}")
+    data_dir = entities[entity].get("data_dir", os.path.join(ENTITIES_DIR, entity))
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+    current_entity_dir.set(data_dir)
+    return entities[entity]
+
+
+def entity_path(*parts):
+    return os.path.join(current_entity_dir.get(), *parts)
 
 
 # Helper Functions
 def get_db_connection():
+    if getattr(write_batch, "depth", 0):
+        if getattr(write_batch, "tables", None) is None:
+            write_batch.tables = read_db()
+        return write_batch.tables
+    return read_db()
+
+
+def read_db():
+    if not os.path.exists(entity_path(EXCEL_FILE)):
+        return {}
+    version = get_data_version()
     try:
-        if os.path.exists(EXCEL_FILE):
-            return pd.read_excel(EXCEL_FILE, sheet_name=None)
-        else:
-            return {}
+        with open(entity_path(EXCEL_FILE), "rb") as f:
+            data = f.read()
+    except OSError as e:
+        get_index_cache()["read_error"] = {"version": version, "message": str(e), "quarantine": None}
+        st.error(f"Error reading Excel file: {str(e)}. Changes will not be saved until it can be read.")
+        return {}
+    if not verify_checksum(data):
+        quarantine_path = quarantine_workbook(data)
+        st.warning(f"hrms_data.xlsx was changed outside the app (checksum mismatch). "
+                   f"A copy was kept at {quarantine_path}.")
+        write_checksum(data)
+    try:
+        tables = pd.read_excel(io.BytesIO(data), sheet_name=None)
     except Exception as e:
-        st.error(f"Error reading Excel file: {str(e)}")
+        quarantine_path = quarantine_workbook(data)
+        get_index_cache()["read_error"] = {"version": version, "message": str(e), "quarantine": quarantine_path}
+        st.error(f"Error reading Excel file: {str(e)}. A copy was kept at {quarantine_path}. "
+                 f"Changes will not be saved until the file is repaired or an admin restores a snapshot.")
         return {}
+    get_index_cache().pop("read_error", None)
+    if get_index_cache().get("row_hashes", {}).get("version") != version:
+        remember_row_hashes(tables, version)
+    return tables
+
+
+def get_read_error():
+    read_error = get_index_cache().get("read_error")
+    if read_error and read_error["version"] == get_data_version():
+        return read_error
+    return None
+
+
+def quarantine_workbook(data):
+    quarantine_dir = entity_path(SNAPSHOT_DIR, "quarantine")
+    os.makedirs(quarantine_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(EXCEL_FILE))[0]
+    path = os.path.join(quarantine_dir, f"{base_name}-{hashlib.sha256(data).hexdigest()[:16]}.xlsx")
+    if not os.path.exists(path):
+        atomic_write(path, data)
+    return path
+
+
+def atomic_write(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def load_checksums():
+    checksum_path = f"{entity_path(EXCEL_FILE)}.sha256"
+    if not os.path.exists(checksum_path):
+        return None
+    with open(checksum_path) as f:
+        return json.load(f)
+
+
+def verify_checksum(data):
+    checksums = load_checksums()
+    if checksums is None:
+        return True
+    return hashlib.sha256(data).hexdigest() in (checksums.get("sha256"), checksums.get("previous"))
+
+
+def write_checksum(data):
+    checksums = load_checksums() or {}
+    atomic_write(f"{entity_path(EXCEL_FILE)}.sha256", json.dumps({
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "previous": checksums.get("sha256")
+    }).encode("utf-8"))
+
+
+def save_snapshot(data):
+    snapshot_dir = entity_path(SNAPSHOT_DIR)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshots = sorted(name for name in os.listdir(snapshot_dir) if name.endswith(".xlsx.gz"))
+    if snapshots and datetime.now().timestamp() - os.path.getmtime(
+            os.path.join(snapshot_dir, snapshots[-1])) < SNAPSHOT_INTERVAL_SECONDS:
+        return
+    base_name = os.path.splitext(os.path.basename(EXCEL_FILE))[0]
+    snapshot_name = f"{base_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.xlsx.gz"
+    atomic_write(os.path.join(snapshot_dir, snapshot_name), gzip.compress(data, compresslevel=6))
+    for old_snapshot in (snapshots + [snapshot_name])[:-SNAPSHOT_COUNT]:
+        os.remove(os.path.join(snapshot_dir, old_snapshot))
+
+
+def load_latest_snapshot():
+    snapshot_dir = entity_path(SNAPSHOT_DIR)
+    if not os.path.exists(snapshot_dir):
+        return None
+    for snapshot_name in sorted(os.listdir(snapshot_dir), reverse=True):
+        if not snapshot_name.endswith(".xlsx.gz"):
+            continue
+        try:
+            with gzip.open(os.path.join(snapshot_dir, snapshot_name), "rb") as f:
+                data = f.read()
+            tables = pd.read_excel(io.BytesIO(data), sheet_name=None)
+        except Exception:
+            continue
+        return snapshot_name, data, tables
+    return None
 
 
-def save_db(tables):
+def restore_snapshot(data):
+    write_checksum(data)
+    atomic_write(entity_path(EXCEL_FILE), data)
+    get_index_cache().pop("read_error", None)
+
+
+def show_workbook_recovery():
+    read_error = get_read_error()
+    if read_error is None or not read_error["quarantine"]:
+        return
+    with st.expander("Restore from snapshot", expanded=True):
+        snapshot = load_latest_snapshot()
+        if snapshot is None:
+            st.error("No valid snapshot available to restore from.")
+            return
+        snapshot_name, data, tables = snapshot
+        st.warning(f"Restoring replaces hrms_data.xlsx with {snapshot_name}. Changes made after that snapshot are "
+                   f"only kept in the quarantined copy at {read_error['quarantine']}.")
+        email = st.text_input("Admin Email", key="restore_admin_email")
+        password = st.text_input("Admin Password", type="password", key="restore_admin_password")
+        confirmed = st.checkbox("I understand that recent changes will be replaced", key="restore_confirm")
+        if st.button("Restore Snapshot", key="restore_snapshot_button", disabled=not confirmed):
+            users = tables.get("users", pd.DataFrame(columns=["email", "password", "user_type"]))
+            admin = users[(users["email"] == email) & (users["user_type"] == "admin")]
+            if admin.empty or not check_password(password, admin["password"].iloc[0]):
+                st.error("Invalid admin credentials for this snapshot.")
+                return
+            restore_snapshot(data)
+            st.success(f"Restored data from snapshot {snapshot_name}.")
+            st.rerun()
+
+
+@contextmanager
+def batch_writes():
+    depth = getattr(write_batch, "depth", 0)
+    write_batch.depth = depth + 1
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        write_batch.depth = depth
+        if depth == 0:
+            tables = write_batch.__dict__.pop("tables", None)
+            dirty = write_batch.__dict__.pop("dirty", False)
+            notifications = write_batch.__dict__.pop("notifications", [])
+            changed = write_batch.__dict__.pop("changed", None)
+            if dirty and not failed:
+                save_db(tables, notifications=notifications, changed=changed)
+
+
+def save_db(tables, reason=None, notifications=None, changed=None):
+    if getattr(write_batch, "depth", 0):
+        pending = write_batch.__dict__.get("changed", set())
+        write_batch.tables = tables
+        write_batch.dirty = True
+        write_batch.notifications = getattr(write_batch, "notifications", []) + list(notifications or [])
+        write_batch.changed = None if changed is None or pending is None else pending | set(changed)
+        return True
+    if get_read_error() is not None:
+        st.error("hrms_data.xlsx could not be read, so changes were not saved.")
+        return False
     try:
-        with pd.ExcelWriter(EXCEL_FILE, engine="openpyxl") as writer:
+        previous = get_row_hashes()
+        written = {}
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
             for table_name, df in tables.items():
                 if table_name == "employees":
                     df = df.astype({"id": int, "salary": float, "is_active": int}, errors="ignore")
@@ -39,8 +369,12 @@ def save_db(tables):
                 elif table_name == "benefits":
                     df = df.astype({"id": int, "employee_id": int, "health_insurance": int, "provident_fund": int,
                                     "paid_time_off": int}, errors="ignore")
-                elif table_name == "recruitment":
+                elif table_name == "job_positions":
                     df = df.astype({"id": int}, errors="ignore")
+                elif table_name == "applicants":
+                    df = df.astype({"id": int, "position_id": int}, errors="ignore")
+                elif table_name == "applicant_stages":
+                    df = df.astype({"id": int, "applicant_id": int}, errors="ignore")
                 elif table_name == "leave_requests":
                     df = df.astype({"id": int, "employee_id": int}, errors="ignore")
                 elif table_name == "payroll_transactions":
@@ -52,34 +386,729 @@ def save_db(tables):
                     df = df.astype({"id": int, "employee_id": int, "amount": float}, errors="ignore")
                 elif table_name == "bank_details":
                     df = df.astype({"id": int, "employee_id": int}, errors="ignore")
+                elif table_name == "shift_templates":
+                    df = df.astype({"id": int, "break_minutes": int}, errors="ignore")
+                elif table_name == "shift_assignments":
+                    df = df.astype({"id": int, "employee_id": int, "shift_id": int}, errors="ignore")
                 df.to_excel(writer, sheet_name=table_name, index=False)
+                written[table_name] = df
+        data = buffer.getvalue()
+        events, hashes = diff_tables(previous, written, reason, changed)
+        write_checksum(data)
+        atomic_write(entity_path(EXCEL_FILE), data)
     except PermissionError:
         st.error("Permission denied: Cannot write to hrms_data.xlsx. Check file permissions.")
+        return False
     except Exception as e:
         st.error(f"Error saving Excel file: {str(e)}")
+        return False
+    get_index_cache()["row_hashes"] = {"version": get_data_version(), "hashes": hashes}
+    try:
+        append_events(events)
+    except Exception as e:
+        st.warning(f"Data was saved, but the change log could not be updated: {str(e)}")
+    try:
+        save_snapshot(data)
+    except Exception as e:
+        st.warning(f"Data was saved, but the recovery snapshot could not be written: {str(e)}")
+    if notifications:
+        queue_notifications(notifications)
+    return True
 
 
-def init_db():
+def get_data_version():
+    try:
+        stat = os.stat(entity_path(EXCEL_FILE))
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def load_archive_manifest():
+    manifest_path = entity_path(ARCHIVE_DIR, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+@st.cache_data(max_entries=256)
+def load_partition(path, mtime):
+    return pd.read_parquet(path)
+
+
+def read_table_range(tables, table_name, start_date=None, end_date=None):
+    date_column = PARTITIONED_TABLES[table_name]
+    live = tables.get(table_name, pd.DataFrame(columns=["id", "employee_id", date_column]))
+    start_month = pd.Timestamp(start_date).strftime("%Y-%m") if start_date is not None else None
+    end_month = pd.Timestamp(end_date).strftime("%Y-%m") if end_date is not None else None
+    frames = []
+    for month in load_archive_manifest().get(table_name, {}).get("partitions", []):
+        if (start_month is None or month >= start_month) and (end_month is None or month <= end_month):
+            path = entity_path(ARCHIVE_DIR, table_name, f"{month}.parquet")
+            frames.append(load_partition(path, os.path.getmtime(path)))
+    if frames:
+        archived = pd.concat(frames, ignore_index=True).drop_duplicates("id", keep="last")
+        archived = archived[~archived["id"].isin(live["id"])]
+        live = pd.concat([archived, live] if not live.empty else [archived], ignore_index=True)
+    return filter_date_range(live, date_column, start_date, end_date)
+
+
+def filter_date_range(df, date_column, start_date=None, end_date=None):
+    if start_date is None and end_date is None:
+        return df
+    dates = pd.to_datetime(df[date_column])
+    in_range = pd.Series(True, index=df.index)
+    if start_date is not None:
+        in_range &= dates >= pd.Timestamp(start_date)
+    if end_date is not None:
+        in_range &= dates <= pd.Timestamp(end_date)
+    return df[in_range]
+
+
+def iter_frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_partition_chunks(paths, live, date_column, start_date, end_date, chunk_rows):
+    live_ids = set(live["id"].tolist())
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            rows = batch.to_pandas().drop_duplicates("id", keep="last")
+            yield filter_date_range(rows[~rows["id"].isin(live_ids)], date_column, start_date, end_date)
+    yield from iter_frame_chunks(filter_date_range(live, date_column, start_date, end_date), chunk_rows)
+
+
+def get_partition_paths(table_name, start_date=None, end_date=None):
+    start_month = pd.Timestamp(start_date).strftime("%Y-%m") if start_date is not None else None
+    end_month = pd.Timestamp(end_date).strftime("%Y-%m") if end_date is not None else None
+    return [entity_path(ARCHIVE_DIR, table_name, f"{month}.parquet")
+            for month in load_archive_manifest().get(table_name, {}).get("partitions", [])
+            if (start_month is None or month >= start_month) and (end_month is None or month <= end_month)]
+
+
+def iter_table_chunks(table_name, start_date=None, end_date=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    tables = get_db_connection()
+    if table_name not in PARTITIONED_TABLES:
+        return iter_frame_chunks(tables.get(table_name, pd.DataFrame(columns=["id"])), chunk_rows)
+    date_column = PARTITIONED_TABLES[table_name]
+    live = tables.get(table_name, pd.DataFrame(columns=["id", "employee_id", date_column]))
+    return iter_partition_chunks(get_partition_paths(table_name, start_date, end_date), live, date_column,
+                                 start_date, end_date, chunk_rows)
+
+
+def estimate_table_rows(table_name, start_date=None, end_date=None):
+    tables = get_db_connection()
+    if table_name not in PARTITIONED_TABLES:
+        return len(tables.get(table_name, pd.DataFrame(columns=["id"])))
+    date_column = PARTITIONED_TABLES[table_name]
+    live = tables.get(table_name, pd.DataFrame(columns=["id", "employee_id", date_column]))
+    archived = sum(pq.ParquetFile(path).metadata.num_rows
+                   for path in get_partition_paths(table_name, start_date, end_date))
+    return archived + len(filter_date_range(live, date_column, start_date, end_date))
+
+
+def stream_csv(chunks):
+    columns = None
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+            yield chunk.to_csv(index=False).encode("utf-8")
+        elif not chunk.empty:
+            yield chunk.reindex(columns=columns).to_csv(index=False, header=False).encode("utf-8")
+
+
+def stream_xlsx(chunks, sheet_name="export"):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    columns = None
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+            sheet.append(columns)
+        chunk = chunk.reindex(columns=columns).astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            yield block
+
+
+def stream_export(chunks, file_format="CSV", compress=False, sheet_name="export"):
+    blocks = stream_xlsx(chunks, sheet_name) if file_format == "XLSX" else stream_csv(chunks)
+    if not compress:
+        yield from blocks
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in blocks:
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+
+def get_export_file_name(name, file_format="CSV", compress=False):
+    extension, mime = EXPORT_FORMATS[file_format]
+    if compress:
+        return f"{name}.{extension}.gz", "application/gzip"
+    return f"{name}.{extension}", mime
+
+
+def get_next_id(table_name, df):
+    live_max = df["id"].max() if not df.empty else 0
+    archived_max = load_archive_manifest().get(table_name, {}).get("max_id", 0)
+    return int(max(live_max, archived_max)) + 1
+
+
+def archive_closed_periods(cutoff=None):
+    if cutoff is None:
+        cutoff = pd.Timestamp(date.today()).to_period("M").start_time
+    tables = get_db_connection()
+    manifest = load_archive_manifest()
+    archived = {}
+    for table_name, date_column in PARTITIONED_TABLES.items():
+        df = tables.get(table_name)
+        if df is None or df.empty:
+            continue
+        dates = pd.to_datetime(df[date_column], errors="coerce")
+        closed = dates < pd.Timestamp(cutoff)
+        if not closed.any():
+            continue
+        table_dir = entity_path(ARCHIVE_DIR, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        closed_rows = df[closed].copy()
+        for column in ["check_in", "check_out", "transaction_date", "created_at"]:
+            if column in closed_rows.columns:
+                closed_rows[column] = pd.to_datetime(closed_rows[column], errors="coerce")
+        table_manifest = manifest.setdefault(table_name, {"partitions": [], "max_id": 0})
+        for month, rows in closed_rows.groupby(dates[closed].dt.strftime("%Y-%m")):
+            path = os.path.join(table_dir, f"{month}.parquet")
+            if os.path.exists(path):
+                rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+                rows = rows.drop_duplicates("id", keep="last")
+            partition = io.BytesIO()
+            rows.to_parquet(partition, compression="zstd", index=False)
+            atomic_write(path, partition.getvalue())
+            if month not in table_manifest["partitions"]:
+                table_manifest["partitions"] = sorted(table_manifest["partitions"] + [month])
+        table_manifest["max_id"] = int(max(table_manifest["max_id"], closed_rows["id"].max()))
+        tables[table_name] = df[~closed]
+        archived[table_name] = int(closed.sum())
+    if archived:
+        if not save_db(tables, reason="archive", changed=list(archived)):
+            return None
+        atomic_write(entity_path(ARCHIVE_DIR, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return archived
+
+
+@st.cache_resource
+def get_entity_cache(data_dir, cache_name):
+    return {}
+
+
+def get_report_cache():
+    return get_entity_cache(current_entity_dir.get(), "report")
+
+
+def get_index_cache():
+    return get_entity_cache(current_entity_dir.get(), "index")
+
+
+def canonical_value(value):
+    if isinstance(value, (datetime, date)):
+        return str(pd.Timestamp(value).round("ms").value)
+    if isinstance(value, (bool, int, float, np.number)):
+        return "" if pd.isna(value) else "%.15g" % float(value)
+    if value is None or value is pd.NaT or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    try:
+        return "%.15g" % float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def canonical_column(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.astype("datetime64[ns]").dt.round("ms")
+        canonical = pd.Series("", index=series.index, dtype=object)
+        canonical[values.notna()] = values[values.notna()].astype("int64").astype(str)
+        return canonical
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.astype(float)
+        return pd.Series(np.char.mod("%.15g", values.to_numpy()), index=series.index, dtype=object).where(
+            values.notna(), "")
+    return series.map(canonical_value)
+
+
+def hash_table_rows(df):
+    if df is None or df.empty or "id" not in df.columns:
+        return pd.Series(dtype="uint64")
+    canonical = pd.DataFrame({column: canonical_column(df[column]) for column in sorted(df.columns)})
+    hashes = pd.util.hash_pandas_object(canonical, index=False)
+    hashes.index = df["id"].to_numpy()
+    return hashes[~hashes.index.duplicated(keep="last")]
+
+
+def remember_row_hashes(tables, version):
+    get_index_cache()["row_hashes"] = {
+        "version": version,
+        "hashes": {table_name: hash_table_rows(df) for table_name, df in tables.items()}
+    }
+
+
+def get_row_hashes():
+    cached = get_index_cache().get("row_hashes")
+    if not cached or cached["version"] != get_data_version():
+        read_db()
+        cached = get_index_cache().get("row_hashes", {"hashes": {}})
+    return cached["hashes"]
+
+
+def diff_tables(previous, tables, reason=None, changed=None):
+    events = []
+    hashes = {}
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    actor = current_actor.get()
+    for table_name in sorted(set(previous) | set(tables)):
+        if changed is not None and table_name not in changed and table_name in previous and table_name in tables:
+            hashes[table_name] = previous[table_name]
+            continue
+        old = previous.get(table_name, pd.Series(dtype="uint64"))
+        df = tables.get(table_name)
+        new = hash_table_rows(df)
+        hashes[table_name] = new
+        common = new.index.intersection(old.index)
+        updated = common[new[common].to_numpy() != old[common].to_numpy()]
+        changes = [("insert", new.index.difference(old.index)), ("update", updated)]
+        for op, ids in changes:
+            if len(ids):
+                rows = df[df["id"].isin(ids)].drop_duplicates("id", keep="last")
+                for row in json.loads(rows.to_json(orient="records", date_format="iso", default_handler=str)):
+                    events.append({"ts": timestamp, "actor": actor, "table": table_name, "op": op,
+                                   "id": row["id"], "row": redact_event_row(table_name, row)})
+        for row_id in old.index.difference(new.index).tolist():
+            event = {"ts": timestamp, "actor": actor, "table": table_name, "op": "delete", "id": row_id}
+            if reason:
+                event["reason"] = reason
+            events.append(event)
+    return events, hashes
+
+
+def redact_event_row(table_name, row):
+    for column in EVENT_REDACTED_COLUMNS.get(table_name, []):
+        if row.get(column) is not None:
+            row[column] = "[redacted]"
+    return row
+
+
+def append_events(events):
+    if not events:
+        return
+    payload = "".join(json.dumps(event, separators=(",", ":"), default=str) + "\n" for event in events)
+    with open(entity_path(EVENT_LOG_FILE), "ab") as f:
+        offset = f.tell()
+        f.write(gzip.compress(payload.encode("utf-8"), compresslevel=6))
+        f.flush()
+        os.fsync(f.fileno())
+    with open(entity_path(EVENT_INDEX_FILE), "a") as f:
+        f.write(f"{offset}\n")
+
+
+def get_event_log_size():
+    try:
+        return os.path.getsize(entity_path(EVENT_LOG_FILE))
+    except OSError:
+        return 0
+
+
+def connect_outbox(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, dedupe_key TEXT UNIQUE, "
+        "kind TEXT, recipient TEXT, subject TEXT, body TEXT, status TEXT DEFAULT 'pending', "
+        "attempts INTEGER DEFAULT 0, next_attempt_at REAL DEFAULT 0, claimed_at REAL, last_error TEXT, "
+        "created_at TEXT, sent_at TEXT)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)")
+    return connection
+
+
+def get_employee_emails(tables):
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    return dict(zip(employees["id"], employees["email"]))
+
+
+def deliverable_notifications(notifications):
+    return [notification for notification in notifications
+            if isinstance(notification["recipient"], str) and "@" in notification["recipient"]]
+
+
+def build_leave_notifications(tables, leave_ids):
+    leave_requests = tables.get("leave_requests", pd.DataFrame(
+        columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
+    decided = leave_requests[leave_requests["id"].isin(leave_ids) &
+                             leave_requests["status"].isin(["Approved", "Rejected"])]
+    emails = get_employee_emails(tables)
+    sequence = get_event_log_size()
+    return deliverable_notifications([{
+        "dedupe_key": f"leave:{row['id']}:{row['status']}:{sequence}", "kind": "leave",
+        "recipient": emails.get(row["employee_id"]),
+        "subject": f"Leave request {row['status'].lower()}",
+        "body": f"Your {row.get('leave_type') if pd.notna(row.get('leave_type')) else ''} leave from "
+                f"{str(row['start_date'])[:10]} to {str(row['end_date'])[:10]} has been {row['status'].lower()}."
+    } for row in decided.to_dict("records")])
+
+
+def build_payroll_notifications(tables, transactions):
+    emails = get_employee_emails(tables)
+    return deliverable_notifications([{
+        "dedupe_key": f"payroll:{row['id']}", "kind": "payroll",
+        "recipient": emails.get(row["employee_id"]),
+        "subject": f"Payroll processed for {str(row['transaction_date'])[:10]}",
+        "body": f"Your net pay of ₹{float(row['net_pay']):,.2f} for {str(row['transaction_date'])[:10]} "
+                f"has been processed."
+    } for row in transactions.to_dict("records")])
+
+
+def build_applicant_notifications(tables, applicants):
+    positions = tables.get("job_positions", pd.DataFrame(
+        columns=["id", "position", "department", "status", "opened_date"]))
+    position_names = dict(zip(positions["id"], positions["position"]))
+    return deliverable_notifications([{
+        "dedupe_key": f"applicant:{row['id']}", "kind": "recruitment",
+        "recipient": row["applicant_email"],
+        "subject": "Application received",
+        "body": f"Hi {row['applicant_name']}, thank you for applying for the "
+                f"{position_names.get(row['position_id'], 'open')} position. We will be in touch."
+    } for row in applicants.to_dict("records")])
+
+
+def queue_notifications(notifications):
+    try:
+        enqueue_notifications(notifications)
+    except Exception as e:
+        st.warning(f"Could not queue notifications: {str(e)}")
+
+
+def enqueue_notifications(notifications):
+    created_at = datetime.now().isoformat(timespec="seconds")
+    connection = connect_outbox(entity_path(OUTBOX_FILE))
+    try:
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO outbox (dedupe_key, kind, recipient, subject, body, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(notification["dedupe_key"], notification["kind"], notification["recipient"],
+                  notification["subject"], notification["body"], created_at) for notification in notifications])
+    finally:
+        connection.close()
+    wake_notification_worker(get_notification_worker())
+
+
+def build_email(notification):
+    message = EmailMessage()
+    message["From"] = NOTIFICATION_SENDER
+    message["To"] = notification["recipient"]
+    message["Subject"] = notification["subject"]
+    message.set_content(notification["body"])
+    return message
+
+
+def send_file_notifications(worker, notifications):
+    os.makedirs(worker["mail_dir"], exist_ok=True)
+    results = {}
+    for notification in notifications:
+        path = os.path.join(worker["mail_dir"], f"{notification['id']:08d}.eml")
+        atomic_write(path, bytes(build_email(notification)))
+        results[notification["id"]] = None
+    return results
+
+
+def send_smtp_notifications(worker, notifications):
+    results = {}
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS) as server:
+        if SMTP_USER:
+            server.starttls()
+            server.login(SMTP_USER, SMTP_PASSWORD or "")
+        for position, notification in enumerate(notifications):
+            renew_notification_leases(worker, [pending["id"] for pending in notifications[position:]])
+            try:
+                server.send_message(build_email(notification))
+                results[notification["id"]] = None
+            except smtplib.SMTPException as e:
+                results[notification["id"]] = str(e)
+    return results
+
+
+NOTIFICATION_TRANSPORTS = {"file": send_file_notifications, "smtp": send_smtp_notifications}
+
+
+def claim_notifications(worker, limit):
+    now = time.time()
+    connection = connect_outbox(worker["outbox_path"])
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                           (now - NOTIFICATION_LEASE_SECONDS,))
+        rows = connection.execute(
+            "SELECT id, recipient, subject, body, attempts FROM outbox WHERE status = 'pending' "
+            "AND next_attempt_at <= ? ORDER BY id LIMIT ?", (now, limit)).fetchall()
+        connection.executemany("UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                               [(now, row[0]) for row in rows])
+        connection.commit()
+    finally:
+        connection.close()
+    return [dict(zip(["id", "recipient", "subject", "body", "attempts"], row)) for row in rows]
+
+
+def renew_notification_leases(worker, ids):
+    connection = connect_outbox(worker["outbox_path"])
+    try:
+        with connection:
+            connection.executemany("UPDATE outbox SET claimed_at = ? WHERE id = ? AND status = 'sending'",
+                                   [(time.time(), notification_id) for notification_id in ids])
+    finally:
+        connection.close()
+
+
+def complete_notifications(worker, notifications, results):
+    now = time.time()
+    sent_at = datetime.now().isoformat(timespec="seconds")
+    updates = []
+    for notification in notifications:
+        error = results.get(notification["id"], "No delivery result")
+        attempts = notification["attempts"] + 1
+        if error is None:
+            updates.append(("sent", attempts, 0, None, sent_at, notification["id"]))
+        else:
+            status = "failed" if attempts >= NOTIFICATION_MAX_ATTEMPTS else "pending"
+            retry_at = now + NOTIFICATION_RETRY_SECONDS * 2 ** (attempts - 1)
+            updates.append((status, attempts, retry_at, error[:500], None, notification["id"]))
+    connection = connect_outbox(worker["outbox_path"])
+    try:
+        with connection:
+            connection.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, sent_at = ?, "
+                "claimed_at = NULL WHERE id = ?", updates)
+    finally:
+        connection.close()
+
+
+async def drain_notifications(worker):
+    tokens = float(NOTIFICATION_BATCH_SIZE)
+    refilled_at = time.monotonic()
+    while True:
+        now = time.monotonic()
+        tokens = min(NOTIFICATION_BATCH_SIZE, tokens + (now - refilled_at) * NOTIFICATION_RATE_PER_SECOND)
+        refilled_at = now
+        if tokens < 1:
+            await asyncio.sleep((1 - tokens) / NOTIFICATION_RATE_PER_SECOND)
+            continue
+        notifications = await asyncio.to_thread(claim_notifications, worker, int(tokens))
+        if not notifications:
+            return
+        tokens -= len(notifications)
+        transport = NOTIFICATION_TRANSPORTS[worker["transport"]]
+        try:
+            results = await asyncio.to_thread(transport, worker, notifications)
+        except Exception as e:
+            results = {notification["id"]: str(e) for notification in notifications}
+        await asyncio.to_thread(complete_notifications, worker, notifications, results)
+
+
+async def run_notification_worker(worker):
+    worker["wake"] = asyncio.Event()
+    worker["ready"].set()
+    while True:
+        try:
+            await drain_notifications(worker)
+        except Exception as e:
+            worker["last_error"] = str(e)
+        try:
+            await asyncio.wait_for(worker["wake"].wait(), NOTIFICATION_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        worker["wake"].clear()
+
+
+@st.cache_resource
+def get_entity_notification_worker(data_dir):
+    worker = {"outbox_path": os.path.join(data_dir, OUTBOX_FILE), "mail_dir": os.path.join(data_dir, NOTIFICATION_DIR),
+              "transport": NOTIFICATION_TRANSPORT if NOTIFICATION_TRANSPORT in NOTIFICATION_TRANSPORTS else "file",
+              "loop": asyncio.new_event_loop(), "ready": threading.Event(), "last_error": None}
+    threading.Thread(target=worker["loop"].run_until_complete, args=(run_notification_worker(worker),),
+                     daemon=True).start()
+    worker["ready"].wait(5)
+    return worker
+
+
+def get_notification_worker():
+    return get_entity_notification_worker(current_entity_dir.get())
+
+
+def wake_notification_worker(worker):
+    if worker["ready"].is_set():
+        worker["loop"].call_soon_threadsafe(worker["wake"].set)
+
+
+def get_outbox_summary(limit=50):
+    if not os.path.exists(entity_path(OUTBOX_FILE)):
+        return {}, pd.DataFrame(columns=["id", "kind", "recipient", "subject", "status", "attempts", "last_error",
+                                         "created_at", "sent_at"])
+    connection = connect_outbox(entity_path(OUTBOX_FILE))
+    try:
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        recent = pd.read_sql_query(
+            "SELECT id, kind, recipient, subject, status, attempts, last_error, created_at, sent_at FROM outbox "
+            "ORDER BY id DESC LIMIT ?", connection, params=(limit,))
+    finally:
+        connection.close()
+    return counts, recent
+
+
+def retry_failed_notifications():
+    connection = connect_outbox(entity_path(OUTBOX_FILE))
+    try:
+        with connection:
+            retried = connection.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0 "
+                                         "WHERE status = 'failed'").rowcount
+    finally:
+        connection.close()
+    wake_notification_worker(get_notification_worker())
+    return retried
+
+
+def read_events(offset=0):
+    path = entity_path(EVENT_LOG_FILE)
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    if not data:
+        return [], offset
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
+    return [json.loads(line) for line in lines if line], offset + len(data)
+
+
+def scan_event_members(path):
+    offsets = [0]
+    position = 0
+    decompressor = zlib.decompressobj(31)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            while block:
+                decompressor.decompress(block)
+                if not decompressor.eof:
+                    position += len(block)
+                    break
+                position += len(block) - len(decompressor.unused_data)
+                block = decompressor.unused_data
+                offsets.append(position)
+                decompressor = zlib.decompressobj(31)
+    return offsets[:-1] if offsets[-1] == position else offsets
+
+
+def load_event_index():
+    size = get_event_log_size()
+    index_path = entity_path(EVENT_INDEX_FILE)
+    offsets = []
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            offsets = [int(line) for line in f if line.strip()]
+    if size and (not offsets or offsets[0] != 0):
+        offsets = scan_event_members(entity_path(EVENT_LOG_FILE))
+        atomic_write(index_path, "".join(f"{offset}\n" for offset in offsets).encode("utf-8"))
+    return [offset for offset in offsets if offset < size], size
+
+
+def read_recent_events(limit, table_name=None):
+    offsets, end = load_event_index()
+    events = []
+    if not offsets:
+        return events
+    with open(entity_path(EVENT_LOG_FILE), "rb") as f:
+        for start in reversed(offsets):
+            if start >= end:
+                continue
+            f.seek(start)
+            lines = gzip.decompress(f.read(end - start)).decode("utf-8").splitlines()
+            member_events = [json.loads(line) for line in lines if line]
+            if table_name is not None:
+                member_events = [event for event in member_events if event["table"] == table_name]
+            events = member_events + events
+            end = start
+            if len(events) >= limit:
+                break
+    return events[-limit:]
+
+
+def get_materialized_view(view_name, build, apply):
+    cache = get_index_cache()
+    version = get_data_version()
+    offset = get_event_log_size()
+    view = cache.get(f"view:{view_name}")
+    if view and view["version"] != version:
+        if offset < view["offset"]:
+            view = None
+        else:
+            events, offset = read_events(view["offset"])
+            if events:
+                view["state"] = apply(view["state"], events)
+            else:
+                view = None
+    if not view:
+        view = {"state": build()}
+    view["version"] = version
+    view["offset"] = offset
+    cache[f"view:{view_name}"] = view
+    return view["state"]
+
+
+def events_to_frame(rows, template):
+    df = pd.DataFrame(rows, columns=template.columns)
+    for column in template.columns:
+        if pd.api.types.is_datetime64_any_dtype(template[column]):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+
+def get_table_schemas():
     tables = {
         "users": pd.DataFrame(columns=["id", "email", "password", "role", "user_type", "password_changed"]),
         "employees": pd.DataFrame(
             columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]),
+                     "department", "salary", "is_active", "tax_regime", "state"]),
         "attendance": pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]),
         "performance": pd.DataFrame(columns=["id", "employee_id", "review_date", "rating", "comments"]),
         "benefits": pd.DataFrame(columns=["id", "employee_id", "health_insurance", "provident_fund", "paid_time_off"]),
-        "recruitment": pd.DataFrame(
-            columns=["id", "position", "department", "status", "applicant_name", "applicant_email", "application_date",
+        "job_positions": pd.DataFrame(columns=["id", "position", "department", "status", "opened_date"]),
+        "applicants": pd.DataFrame(
+            columns=["id", "position_id", "applicant_name", "applicant_email", "application_date", "stage",
                      "resume_path"]),
+        "applicant_stages": pd.DataFrame(columns=["id", "applicant_id", "stage", "changed_at"]),
         "leave_requests": pd.DataFrame(
             columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]),
         "payroll_transactions": pd.DataFrame(
             columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
-                     "created_at"]),
+                     "created_at", "transaction_type", "period_date", "breakdown"]),
         "payroll_deductions": pd.DataFrame(columns=["id", "employee_id", "deduction_type", "amount", "effective_date"]),
         "payroll_allowances": pd.DataFrame(columns=["id", "employee_id", "allowance_type", "amount", "effective_date"]),
         "bank_details": pd.DataFrame(
-            columns=["id", "employee_id", "bank_name", "account_number", "ifsc_code", "account_type"])
+            columns=["id", "employee_id", "bank_name", "account_number", "ifsc_code", "account_type"]),
+        "shift_templates": pd.DataFrame(
+            columns=["id", "name", "start_time", "end_time", "break_minutes", "work_days"]),
+        "shift_assignments": pd.DataFrame(columns=["id", "employee_id", "shift_id", "effective_date"])
     }
 
     tables["users"] = tables["users"].astype({"id": int, "password_changed": int})
@@ -88,15 +1117,23 @@ def init_db():
     tables["performance"] = tables["performance"].astype({"id": int, "employee_id": int, "rating": float})
     tables["benefits"] = tables["benefits"].astype(
         {"id": int, "employee_id": int, "health_insurance": int, "provident_fund": int, "paid_time_off": int})
-    tables["recruitment"] = tables["recruitment"].astype({"id": int})
+    tables["job_positions"] = tables["job_positions"].astype({"id": int})
+    tables["applicants"] = tables["applicants"].astype({"id": int, "position_id": int})
+    tables["applicant_stages"] = tables["applicant_stages"].astype({"id": int, "applicant_id": int})
     tables["leave_requests"] = tables["leave_requests"].astype({"id": int, "employee_id": int})
     tables["payroll_transactions"] = tables["payroll_transactions"].astype(
         {"id": int, "employee_id": int, "gross_pay": float, "net_pay": float})
     tables["payroll_deductions"] = tables["payroll_deductions"].astype({"id": int, "employee_id": int, "amount": float})
     tables["payroll_allowances"] = tables["payroll_allowances"].astype({"id": int, "employee_id": int, "amount": float})
     tables["bank_details"] = tables["bank_details"].astype({"id": int, "employee_id": int})
+    tables["shift_templates"] = tables["shift_templates"].astype({"id": int, "break_minutes": int})
+    tables["shift_assignments"] = tables["shift_assignments"].astype({"id": int, "employee_id": int, "shift_id": int})
+    return tables
 
-    hashed_password = bcrypt.hashpw("Admin@123".encode('utf-8'), bcrypt.gensalt())
+
+def init_db():
+    tables = get_table_schemas()
+    hashed_password = hash_password("Admin@123")
     admin_user = pd.DataFrame([{
         "id": 1,
         "email": "admin@hrms.com",
@@ -131,8 +1168,53 @@ def validate_password(password, user_type):
         return True, "Password valid"
 
 
+def time_bcrypt(rounds, samples=1):
+    salt = bcrypt.gensalt(rounds=rounds)
+    start = time.perf_counter()
+    for _ in range(samples):
+        bcrypt.hashpw(b"calibration-password", salt)
+    return (time.perf_counter() - start) / samples
+
+
+def calibrate_bcrypt_rounds(target_seconds=BCRYPT_TARGET_SECONDS):
+    base_seconds = time_bcrypt(BCRYPT_MIN_ROUNDS, samples=3)
+    rounds = BCRYPT_MIN_ROUNDS + int(math.floor(math.log2(max(target_seconds / base_seconds, 1))))
+    rounds = min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+    return rounds, base_seconds * 2 ** (rounds - BCRYPT_MIN_ROUNDS)
+
+
+@st.cache_resource
+def get_password_policy():
+    if os.path.exists(PASSWORD_POLICY_FILE):
+        try:
+            with open(PASSWORD_POLICY_FILE, "r") as f:
+                policy = json.load(f)
+            if BCRYPT_MIN_ROUNDS <= int(policy["rounds"]) <= BCRYPT_MAX_ROUNDS:
+                return policy
+        except Exception as e:
+            st.error(f"Error reading {PASSWORD_POLICY_FILE}: {str(e)}")
+    rounds, expected_seconds = calibrate_bcrypt_rounds()
+    policy = {"rounds": rounds, "target_seconds": BCRYPT_TARGET_SECONDS,
+              "expected_seconds": round(expected_seconds, 4), "calibrated_at": datetime.now().isoformat()}
+    try:
+        atomic_write(PASSWORD_POLICY_FILE, json.dumps(policy, indent=2).encode("utf-8"))
+    except Exception as e:
+        st.warning(f"Could not save password policy: {str(e)}")
+    return policy
+
+
+def get_bcrypt_rounds(hashed):
+    hashed = hashed.decode('utf-8') if isinstance(hashed, bytes) else str(hashed)
+    parts = hashed.split("$")
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else 0
+
+
+def password_needs_rehash(hashed):
+    return get_bcrypt_rounds(hashed) < int(get_password_policy()["rounds"])
+
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=int(get_password_policy()["rounds"])))
 
 
 def check_password(password, hashed):
@@ -167,7 +1249,7 @@ def create_employee_user(email, password):
         "password_changed": 0
     }])
     tables["users"] = pd.concat([users, new_user], ignore_index=True)
-    save_db(tables)
+    save_db(tables, changed=["users"])
     return True, "User created successfully"
 
 
@@ -188,10 +1270,22 @@ def delete_employee(employee_id):
     users = users[users["email"] != employee_email]
     tables["employees"] = employees
     tables["users"] = users
-    save_db(tables)
+    save_db(tables, changed=["employees", "users"])
+    revoke_user_sessions(employee_email)
     return True, "Employee deleted successfully"
 
 
+def update_leave_status(leave_id, status):
+    tables = get_db_connection()
+    leave_requests = tables.get("leave_requests", pd.DataFrame(
+        columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
+    selected = leave_requests["id"] == leave_id
+    decided = leave_requests.loc[selected & (leave_requests["status"] != status), "id"].tolist()
+    leave_requests.loc[selected, "status"] = status
+    tables["leave_requests"] = leave_requests
+    save_db(tables, notifications=build_leave_notifications(tables, decided), changed=["leave_requests"])
+
+
 def login_user(email, password, user_type):
     tables = get_db_connection()
     users = tables.get("users",
@@ -199,10 +1293,116 @@ def login_user(email, password, user_type):
 
     user = users[(users["email"] == email) & (users["user_type"] == user_type.lower())]
     if not user.empty and check_password(password, user["password"].iloc[0]):
+        if password_needs_rehash(user["password"].iloc[0]):
+            users.loc[user.index[0], "password"] = hash_password(password).decode('utf-8')
+            tables["users"] = users
+            save_db(tables, changed=["users"])
         return True, user["role"].iloc[0], user["user_type"].iloc[0]
     return False, None, None
 
 
+@st.cache_resource
+def get_session_secret():
+    if os.path.exists(SESSION_SECRET_FILE):
+        with open(SESSION_SECRET_FILE, "rb") as f:
+            secret = f.read()
+        if secret:
+            return secret
+    secret = secrets.token_bytes(32)
+    atomic_write(SESSION_SECRET_FILE, secret)
+    return secret
+
+
+@st.cache_resource
+def get_session_cache():
+    return {"lock": threading.Lock(), "sessions": {}, "mtime": None}
+
+
+def get_session_store():
+    store = get_session_cache()
+    try:
+        mtime = os.stat(SESSION_STORE_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != store["mtime"]:
+        try:
+            with open(SESSION_STORE_FILE, "r") as f:
+                store["sessions"] = json.load(f)
+        except Exception:
+            store["sessions"] = {}
+        store["mtime"] = mtime
+    return store
+
+
+def save_session_store(store):
+    now = time.time()
+    store["sessions"] = {sid: session for sid, session in store["sessions"].items() if session["expires"] > now}
+    atomic_write(SESSION_STORE_FILE, json.dumps(store["sessions"]).encode("utf-8"))
+    store["mtime"] = os.stat(SESSION_STORE_FILE).st_mtime_ns
+
+
+def sign_session(session_id, expires):
+    return hmac.new(get_session_secret(), f"{session_id}.{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def create_session(email, role, user_type, entity, employee_id=None, employee_name=None):
+    session_id = secrets.token_urlsafe(24)
+    expires = int(time.time()) + SESSION_TTL_SECONDS
+    with get_session_cache()["lock"]:
+        store = get_session_store()
+        store["sessions"][session_id] = {
+            "email": email, "role": role, "user_type": user_type, "entity": entity,
+            "employee_id": None if employee_id is None else int(employee_id), "employee_name": employee_name,
+            "expires": expires}
+        save_session_store(store)
+    return f"{session_id}.{expires}.{sign_session(session_id, expires)}"
+
+
+def validate_session_token(token):
+    try:
+        session_id, expires, signature = str(token).split(".")
+        if int(expires) <= time.time():
+            return None
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, sign_session(session_id, expires)):
+        return None
+    session = get_session_store()["sessions"].get(session_id)
+    if session is None or session["expires"] != int(expires):
+        return None
+    return session
+
+
+def revoke_session(token):
+    session_id = str(token).split(".")[0]
+    with get_session_cache()["lock"]:
+        store = get_session_store()
+        if store["sessions"].pop(session_id, None) is not None:
+            save_session_store(store)
+
+
+def revoke_user_sessions(email):
+    with get_session_cache()["lock"]:
+        store = get_session_store()
+        revoked = [sid for sid, session in store["sessions"].items() if session["email"] == email]
+        for session_id in revoked:
+            del store["sessions"][session_id]
+        if revoked:
+            save_session_store(store)
+
+
+def set_session_cookie(token, max_age):
+    st.html(f"<script>document.cookie = '{SESSION_COOKIE}={token}; max-age={max_age}; path=/; Secure; "
+            f"SameSite=Strict';</script>", unsafe_allow_javascript=True)
+
+
+def get_session_cookie():
+    try:
+        return st.context.cookies.get(SESSION_COOKIE)
+    except Exception:
+        return None
+
+
 def get_departments():
     tables = get_db_connection()
     employees = tables.get("employees", pd.DataFrame(
@@ -236,54 +1436,280 @@ def display_pdf(file_path):
         st.error(f"Error displaying PDF: {str(e)}")
 
 
-def show_dashboard():
-    st.title("HR Dashboard")
+def build_employee_directory():
+    employees = get_db_connection().get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    return employees.drop_duplicates("id").set_index("id")[EMPLOYEE_DIRECTORY_COLUMNS]
+
+
+def apply_employee_directory_events(directory, events):
+    changed = {event["id"]: event.get("row") for event in events if event["table"] == "employees"}
+    if not changed:
+        return directory
+    directory = directory[~directory.index.isin(list(changed))]
+    rows = [row for row in changed.values() if row]
+    if rows:
+        directory = pd.concat([directory, pd.DataFrame(rows).set_index("id")[EMPLOYEE_DIRECTORY_COLUMNS]])
+    return directory
+
+
+def get_employee_directory():
+    return get_materialized_view("employee_directory", build_employee_directory, apply_employee_directory_events)
+
+
+def attach_employee_details(df, columns=("first_name", "last_name"), key_column="employee_id"):
+    directory = get_employee_directory()
+    positions = directory.index.get_indexer(df[key_column])
+    found = positions >= 0
+    details = {}
+    for column in columns:
+        values = np.full(len(df), None, dtype=object)
+        values[found] = directory[column].to_numpy(dtype=object)[positions[found]]
+        details[column] = values
+    return df.assign(**details)
+
+
+def build_dashboard_summary():
+    employees = get_db_connection().get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    return employees[employees["is_active"] == 1][["id", "department", "salary"]].set_index("id")
+
+
+def apply_dashboard_summary_events(summary, events):
+    employee_events = [event for event in events if event["table"] == "employees"]
+    if not employee_events:
+        return summary
+    changed = {event["id"]: event.get("row") for event in employee_events}
+    summary = summary[~summary.index.isin(list(changed))]
+    active = [row for row in changed.values() if row and row.get("is_active") == 1]
+    if active:
+        summary = pd.concat([summary, pd.DataFrame(active)[["id", "department", "salary"]].set_index("id")])
+    return summary
+
+
+def build_workforce_cost_inputs(version):
+    cache = get_report_cache()
+    cached = cache.get("workforce_cost_inputs")
+    if cached and cached["version"] == version:
+        return cached
     tables = get_db_connection()
     employees = tables.get("employees", pd.DataFrame(
         columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
                  "department", "salary", "is_active"]))
-    recruitment = tables.get("recruitment", pd.DataFrame(
-        columns=["id", "position", "department", "status", "applicant_name", "applicant_email", "application_date",
-                 "resume_path"]))
+    active = employees[employees["is_active"] == 1].drop_duplicates("id")
+    compensation_index = get_compensation_index()
+    as_of = pd.Timestamp(date.today())
+    allowances = [sum(amount for _, amount in get_compensation_in_force(compensation_index["allowances"], employee_id,
+                                                                        as_of)) for employee_id in active["id"]]
+    deductions = [sum(amount for _, amount in get_compensation_in_force(compensation_index["deductions"], employee_id,
+                                                                        as_of)) for employee_id in active["id"]]
+    staff = pd.DataFrame({
+        "department": active["department"].fillna("Unassigned").astype(str).to_numpy(),
+        "gross": pd.to_numeric(active["salary"], errors="coerce").fillna(0.0).to_numpy() + np.array(allowances,
+                                                                                                   dtype=float),
+        "deductions": np.array(deductions, dtype=float),
+        "start": 0})
+
+    pipeline = get_recruitment_pipeline()
+    open_positions = get_pipeline_rows("positions", "positions_by_status", ["Open"])
+    department_pay = staff.groupby("department")[["gross", "deductions"]].mean()
+    overall_pay = staff[["gross", "deductions"]].mean().fillna(0.0) if not staff.empty else pd.Series(
+        {"gross": 0.0, "deductions": 0.0})
+    hires = pd.DataFrame({"department": open_positions["department"].fillna("Unassigned").astype(str).to_numpy()})
+    hires = hires.join(department_pay, on="department").fillna(overall_pay.to_dict())
+
+    fill_months = (pipeline["time_to_hire"].set_index("department")["median_days"] / 30).round()
+    for frame in [staff, hires]:
+        frame["fill_months"] = frame["department"].map(fill_months).fillna(DEFAULT_TIME_TO_FILL_MONTHS).clip(
+            lower=1).astype(int)
+    hires["start"] = hires["fill_months"]
+    inputs = {"version": version, "staff": staff, "hires": hires}
+    cache["workforce_cost_inputs"] = inputs
+    return inputs
+
+
+def get_projection_months(months):
+    start = pd.Timestamp(date.today()).to_period("M") + 1
+    return pd.period_range(start, periods=months, freq="M")
+
+
+def get_raise_factors(periods, annual_raise):
+    raises = np.cumsum(periods.month.to_numpy() == PROJECTION_RAISE_MONTH)
+    return (1 + annual_raise) ** raises
+
+
+def get_workforce(inputs, hire_open_positions=True):
+    frames = [inputs["staff"], inputs["hires"]] if hire_open_positions else [inputs["staff"]]
+    return pd.concat(frames, ignore_index=True)
+
+
+def project_workforce_cost(inputs, months=12, annual_raise=0.05, attrition_rate=0.1, backfill=True,
+                           hire_open_positions=True):
+    workforce = get_workforce(inputs, hire_open_positions)
+    periods = get_projection_months(months)
+    hazard = 1 - (1 - attrition_rate) ** (1 / 12)
+    steps = np.arange(months)
+    survival = (1 - hazard) ** steps
+    leave_probability = np.concatenate([[0.0], hazard * survival[:-1]])
+    replacement = np.convolve(leave_probability, survival)[:months]
+
+    fill_values = np.unique(workforce["fill_months"].to_numpy()) if not workforce.empty else np.array([1])
+    curves = np.tile(survival, (len(fill_values), 1))
+    if backfill:
+        for row, fill in enumerate(fill_values):
+            curves[row, fill:] += replacement[:max(months - fill, 0)]
+    offsets = steps[None, :] - workforce["start"].to_numpy()[:, None]
+    curve_rows = np.searchsorted(fill_values, workforce["fill_months"].to_numpy())
+    active = np.where(offsets >= 0, curves[curve_rows[:, None], offsets.clip(0)], 0.0)
+
+    raise_factors = get_raise_factors(periods, annual_raise)
+    gross = active * workforce["gross"].to_numpy()[:, None] * raise_factors[None, :]
+    deductions = active * workforce["deductions"].to_numpy()[:, None]
+    projection = pd.DataFrame({
+        "month": periods.astype(str),
+        "headcount": active.sum(axis=0),
+        "gross_cost": gross.sum(axis=0),
+        "fixed_deductions": deductions.sum(axis=0)})
+    projection["net_cost"] = projection["gross_cost"] - projection["fixed_deductions"]
+    by_department = pd.DataFrame(gross, columns=projection["month"]).groupby(
+        workforce["department"].to_numpy()).sum().T
+    return projection, by_department
+
+
+def simulate_workforce_cost(inputs, months=12, annual_raise=0.05, attrition_rate=0.1, backfill=True,
+                            hire_open_positions=True, runs=1000, seed=None):
+    workforce = get_workforce(inputs, hire_open_positions)
+    periods = get_projection_months(months)
+    rng = np.random.default_rng(seed)
+    count = len(workforce)
+    hazard = 1 - (1 - attrition_rate) ** (1 / 12)
+    fill_months = workforce["fill_months"].to_numpy()
+
+    def tenure():
+        if hazard <= 0:
+            return np.full((runs, count), months + 1)
+        return rng.geometric(hazard, size=(runs, count))
+
+    starts = np.where(workforce["start"].to_numpy() > 0, rng.geometric(1 / fill_months, size=(runs, count)), 0)
+    segments = [(starts, starts + tenure())]
+    if backfill:
+        replacement_starts = segments[0][1] + rng.geometric(1 / fill_months, size=(runs, count))
+        segments.append((replacement_starts, replacement_starts + tenure()))
+
+    size = runs * (months + 1)
+    pay = np.zeros(size)
+    headcount = np.zeros(size)
+    run_offsets = (np.arange(runs) * (months + 1))[:, None]
+    gross = np.broadcast_to(workforce["gross"].to_numpy(), (runs, count)).ravel()
+    for segment_start, segment_end in segments:
+        for boundary, sign in [(segment_start, 1), (segment_end, -1)]:
+            positions = (run_offsets + np.minimum(boundary, months)).ravel()
+            pay += sign * np.bincount(positions, weights=gross, minlength=size)
+            headcount += sign * np.bincount(positions, minlength=size)
+    pay = pay.reshape(runs, months + 1).cumsum(axis=1)[:, :months] * get_raise_factors(periods, annual_raise)[None, :]
+    headcount = headcount.reshape(runs, months + 1).cumsum(axis=1)[:, :months]
+
+    simulation = pd.DataFrame({"month": periods.astype(str), "mean_gross": pay.mean(axis=0),
+                               "median_headcount": np.median(headcount, axis=0)})
+    for percentile, values in zip(PROJECTION_PERCENTILES, np.percentile(pay, PROJECTION_PERCENTILES, axis=0)):
+        simulation[f"gross_p{percentile}"] = values
+    totals = np.percentile(pay.sum(axis=1), PROJECTION_PERCENTILES)
+    return simulation, dict(zip([f"p{percentile}" for percentile in PROJECTION_PERCENTILES], totals))
+
+
+def show_workforce_projection():
+    inputs = build_workforce_cost_inputs(get_data_version())
+    if inputs["staff"].empty:
+        st.info("No active employees to project.")
+        return
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        months = st.slider("Months", 12, 36, 12, step=6, key="projection_months")
+        runs = st.selectbox("Monte Carlo Runs", [0, 1000, 5000], format_func=lambda x: "Off" if x == 0 else str(x),
+                            key="projection_runs")
+    with col2:
+        annual_raise = st.number_input("Annual Raise (%)", 0.0, 50.0, 5.0, 0.5, key="projection_raise") / 100
+        attrition_rate = st.number_input("Annual Attrition (%)", 0.0, 90.0, 10.0, 1.0,
+                                         key="projection_attrition") / 100
+    with col3:
+        backfill = st.checkbox("Backfill Leavers", value=True, key="projection_backfill")
+        hire_open_positions = st.checkbox(f"Hire Open Positions ({len(inputs['hires'])})", value=True,
+                                          key="projection_hires")
+    st.caption(f"Raises apply each {date(2000, PROJECTION_RAISE_MONTH, 1):%B}. Open positions and backfills are "
+               f"filled after the department's median time to hire, or {DEFAULT_TIME_TO_FILL_MONTHS} months.")
+
+    projection, by_department = project_workforce_cost(inputs, months, annual_raise, attrition_rate, backfill,
+                                                       hire_open_positions)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Current Monthly Gross", f"₹{inputs['staff']['gross'].sum():,.0f}")
+    col2.metric(f"Gross in {projection['month'].iloc[-1]}", f"₹{projection['gross_cost'].iloc[-1]:,.0f}")
+    col3.metric(f"{months}-Month Gross", f"₹{projection['gross_cost'].sum():,.0f}")
+
+    fig = go.Figure()
+    if runs:
+        simulation, totals = simulate_workforce_cost(inputs, months, annual_raise, attrition_rate, backfill,
+                                                     hire_open_positions, runs)
+        fig.add_trace(go.Scatter(x=simulation["month"], y=simulation["gross_p90"], line={"width": 0},
+                                 showlegend=False))
+        fig.add_trace(go.Scatter(x=simulation["month"], y=simulation["gross_p10"], line={"width": 0}, fill="tonexty",
+                                 name="P10-P90"))
+        st.write(f"{months}-month gross across {runs} runs: P10 ₹{totals['p10']:,.0f}, "
+                 f"P50 ₹{totals['p50']:,.0f}, P90 ₹{totals['p90']:,.0f}")
+    fig.add_trace(go.Scatter(x=projection["month"], y=projection["gross_cost"], name="Expected Gross"))
+    fig.update_layout(title="Projected Monthly Payroll Cost (₹)")
+    st.plotly_chart(fig)
+    st.plotly_chart(px.area(by_department, title="Projected Gross by Department (₹)"))
+    st.dataframe(
+        projection.round(2).style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=300
+    )
+
+
+def show_dashboard():
+    st.title("HR Dashboard")
+    tables = get_db_connection()
     leave_requests = tables.get("leave_requests", pd.DataFrame(
         columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
     attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
 
+    active_employees = get_materialized_view("dashboard_summary", build_dashboard_summary,
+                                             apply_dashboard_summary_events)
+
     col1, col2, col3, col4 = st.columns(4)
-    total_employees = len(employees[employees["is_active"] == 1])
+    total_employees = len(active_employees)
     col1.metric("Total Employees", total_employees)
 
-    avg_salary = employees[employees["is_active"] == 1]["salary"].mean() if not employees[
-        employees["is_active"] == 1].empty else 0
+    avg_salary = active_employees["salary"].mean() if not active_employees.empty else 0
     col2.metric("Average Salary", f"₹{avg_salary:,.2f}")
 
-    total_departments = len(employees[employees["is_active"] == 1]["department"].dropna().unique())
+    total_departments = len(active_employees["department"].dropna().unique())
     col3.metric("Departments", total_departments)
 
-    open_positions = len(recruitment[recruitment["status"] == "Open"])
+    open_positions = get_recruitment_pipeline()["open_positions"]
     col4.metric("Open Positions", open_positions)
 
-    dept_data = employees[employees["is_active"] == 1]["department"].value_counts().reset_index()
+    dept_data = active_employees["department"].value_counts().reset_index()
     dept_data.columns = ["Department", "Count"]
 
     if not dept_data.empty:
         fig = px.pie(dept_data, values="Count", names="Department", title="Employee Distribution by Department")
         st.plotly_chart(fig)
 
-        salary_data = employees[employees["is_active"] == 1].groupby("department")["salary"].mean().reset_index()
+        salary_data = active_employees.groupby("department")["salary"].mean().reset_index()
         salary_data.columns = ["department", "avg_salary"]
         fig2 = px.bar(salary_data, x="department", y="avg_salary", title="Average Salary by Department (₹)")
         st.plotly_chart(fig2)
     else:
         st.info("No department data available yet.")
 
+    with st.expander("Workforce Cost Projection"):
+        show_workforce_projection()
+
     st.subheader("Recent Activities")
-    leaves = leave_requests.merge(
-        employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-        left_on="employee_id",
-        right_on="employee_id_ref",
-        how="left"
-    )
+    leaves = attach_employee_details(leave_requests)
     leaves = leaves.sort_values("created_at", ascending=False).head(5)
     if not leaves.empty:
         st.write("Recent Leave Requests:")
@@ -291,12 +1717,7 @@ def show_dashboard():
     else:
         st.info("No recent leave requests.")
 
-    attendance = attendance.merge(
-        employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-        left_on="employee_id",
-        right_on="employee_id_ref",
-        how="left"
-    )
+    attendance = attach_employee_details(attendance)
     attendance = attendance.sort_values("check_in", ascending=False).head(5)
     if not attendance.empty:
         st.write("Recent Attendance:")
@@ -304,6 +1725,63 @@ def show_dashboard():
     else:
         st.info("No recent attendance records.")
 
+    st.subheader("Data Maintenance")
+    manifest = load_archive_manifest()
+    st.write(
+        f"Archived months - Attendance: {len(manifest.get('attendance', {}).get('partitions', []))}, "
+        f"Payroll: {len(manifest.get('payroll_transactions', {}).get('partitions', []))}")
+    if st.button("Archive Closed Periods", key="archive_history_button"):
+        archived = archive_closed_periods()
+        if archived:
+            st.success(", ".join(f"{count} {table_name} rows archived" for table_name, count in archived.items()))
+            st.rerun()
+        elif archived is not None:
+            st.info("No closed-period records to archive.")
+
+    with st.expander("Change Log"):
+        show_change_log()
+
+    with st.expander("Notifications"):
+        show_notification_outbox()
+
+
+def show_notification_outbox():
+    counts, recent = get_outbox_summary()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Pending", counts.get("pending", 0) + counts.get("sending", 0))
+    col2.metric("Sent", counts.get("sent", 0))
+    col3.metric("Failed", counts.get("failed", 0))
+    worker = get_notification_worker()
+    st.caption(f"Transport: {worker['transport']}" +
+               (f" - last worker error: {worker['last_error']}" if worker["last_error"] else ""))
+    if counts.get("failed") and st.button("Retry Failed Notifications", key="retry_notifications_button"):
+        st.success(f"Requeued {retry_failed_notifications()} notification(s).")
+    if recent.empty:
+        st.info("No notifications queued yet.")
+    else:
+        st.dataframe(recent.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                     use_container_width=True, height=300)
+
+
+def show_change_log():
+    table_filter = st.selectbox("Table", ["All"] + sorted(get_table_schemas()), key="change_log_table")
+    events = read_recent_events(CHANGE_LOG_LIMIT, None if table_filter == "All" else table_filter)
+    if not events:
+        st.info("No changes recorded yet.")
+        return
+    log = pd.DataFrame(events).iloc[::-1]
+    if "reason" not in log.columns:
+        log["reason"] = None
+    rows = log["row"] if "row" in log.columns else [None] * len(log)
+    log["row"] = [json.dumps(redact_event_row(table_name, row)) if isinstance(row, dict) else ""
+                  for table_name, row in zip(log["table"], rows)]
+    st.dataframe(
+        log[["ts", "actor", "table", "op", "id", "reason", "row"]].style.set_properties(
+            **{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=400
+    )
+
 
 def employee_management():
     st.title("Employee Management")
@@ -323,11 +1801,14 @@ def employee_management():
                 use_container_width=True,
                 height=400
             )
+            show_export_controls(lambda: active_employees, "employees", "employees_export")
         else:
             st.info("No employees found in the database.")
 
     with tab2:
         with st.form("add_employee_form", clear_on_submit=True):
+            tax_config = load_tax_config()
+            regimes, states = get_tax_options(tax_config)
             col1, col2 = st.columns(2)
             with col1:
                 employee_id = st.text_input("Employee ID*", key="emp_id")
@@ -336,56 +1817,63 @@ def employee_management():
                 phone = st.text_input("Phone*", key="phone")
                 job_title = st.text_input("Job Title*", key="job_title")
                 salary = st.number_input("Salary (₹)*", min_value=0.0, step=1000.0, key="salary")
+                tax_regime = st.selectbox("Tax Regime", regimes, index=regimes.index(tax_config["default_regime"]),
+                                          key="tax_regime")
             with col2:
                 last_name = st.text_input("Last Name*", key="last_name")
                 password = st.text_input("Password*", type="password", key="password")
                 hire_date = st.date_input("Hire Date*", value=date.today(), key="hire_date")
                 department = st.text_input("Department*", key="department")
+                state = st.selectbox("State (Professional Tax)", states,
+                                     index=states.index(tax_config["default_state"]), key="state")
 
             submitted = st.form_submit_button("Add Employee")
             if submitted:
                 if not all([employee_id, first_name, last_name, email, password, phone, job_title, department]):
                     st.error("Please fill all required fields (*)")
                 else:
-                    tables = get_db_connection()
-                    users = tables.get("users", pd.DataFrame(
-                        columns=["id", "email", "password", "role", "user_type", "password_changed"]))
-                    if email in users["email"].values:
-                        st.error("Email already exists. Please use a unique email.")
-                    else:
-                        is_valid, message = validate_password(password, "employee")
-                        if not is_valid:
-                            st.error(message)
+                    with batch_writes():
+                        tables = get_db_connection()
+                        users = tables.get("users", pd.DataFrame(
+                            columns=["id", "email", "password", "role", "user_type", "password_changed"]))
+                        if email in users["email"].values:
+                            st.error("Email already exists. Please use a unique email.")
                         else:
-                            employees = tables.get("employees", pd.DataFrame(
-                                columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date",
-                                         "job_title", "department", "salary", "is_active"]))
-                            if employee_id in employees["employee_id"].values:
-                                st.error("Employee ID already exists")
+                            is_valid, message = validate_password(password, "employee")
+                            if not is_valid:
+                                st.error(message)
                             else:
-                                success, message = create_employee_user(email, password)
-                                if success:
-                                    new_id = employees["id"].max() + 1 if not employees.empty else 1
-                                    new_employee = pd.DataFrame([{
-                                        "id": int(new_id),
-                                        "employee_id": employee_id,
-                                        "first_name": first_name,
-                                        "last_name": last_name,
-                                        "email": email,
-                                        "phone": phone,
-                                        "hire_date": hire_date,
-                                        "job_title": job_title,
-                                        "department": department,
-                                        "salary": float(salary),
-                                        "is_active": 1
-                                    }])
-                                    new_employee = new_employee.astype({"id": int, "salary": float, "is_active": int})
-                                    tables["employees"] = pd.concat([employees, new_employee], ignore_index=True)
-                                    save_db(tables)
-                                    st.success("Employee added successfully!")
-                                    st.rerun()
+                                employees = tables.get("employees", pd.DataFrame(
+                                    columns=["id", "employee_id", "first_name", "last_name", "email", "phone",
+                                             "hire_date", "job_title", "department", "salary", "is_active"]))
+                                if employee_id in employees["employee_id"].values:
+                                    st.error("Employee ID already exists")
                                 else:
-                                    st.error(message)
+                                    success, message = create_employee_user(email, password)
+                                    if success:
+                                        new_id = employees["id"].max() + 1 if not employees.empty else 1
+                                        new_employee = pd.DataFrame([{
+                                            "id": int(new_id),
+                                            "employee_id": employee_id,
+                                            "first_name": first_name,
+                                            "last_name": last_name,
+                                            "email": email,
+                                            "phone": phone,
+                                            "hire_date": hire_date,
+                                            "job_title": job_title,
+                                            "department": department,
+                                            "salary": float(salary),
+                                            "is_active": 1,
+                                            "tax_regime": tax_regime,
+                                            "state": state
+                                        }])
+                                        new_employee = new_employee.astype({"id": int, "salary": float, "is_active": int})
+                                        tables["employees"] = pd.concat([employees, new_employee], ignore_index=True)
+                                        save_db(tables, changed=["employees"])
+                                        st.success("Employee added successfully!")
+                                        st.rerun()
+                                    else:
+                                        st.error(message)
 
     with tab3:
         st.subheader("Delete Employee")
@@ -424,15 +1912,7 @@ def leave_management():
         tables = get_db_connection()
         leave_requests = tables.get("leave_requests", pd.DataFrame(
             columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        leaves = leave_requests.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        leaves = attach_employee_details(leave_requests)
         leaves = leaves.sort_values("created_at", ascending=False)
         if not leaves.empty:
             st.dataframe(
@@ -440,26 +1920,28 @@ def leave_management():
                 use_container_width=True,
                 height=400
             )
-            st.subheader("Manage Leave Request")
+            show_export_controls(lambda: leaves, "leave_requests", "leave_export")
+            st.subheader("Manage Leave Requests")
             if "id" in leaves.columns:
-                leave_id = st.selectbox(
-                    "Select Leave Request",
+                select_pending = st.checkbox("Select all pending requests", key="select_pending_leaves")
+                leave_ids = st.multiselect(
+                    "Select Leave Requests",
                     leaves["id"].tolist(),
+                    default=leaves[leaves["status"] == "Pending"]["id"].tolist() if select_pending else [],
                     format_func=lambda
                         x: f"Leave {x} - {leaves[leaves['id'] == x]['first_name'].iloc[0] if pd.notna(leaves[leaves['id'] == x]['first_name'].iloc[0]) else 'Unknown'} {leaves[leaves['id'] == x]['last_name'].iloc[0] if pd.notna(leaves[leaves['id'] == x]['last_name'].iloc[0]) else 'Employee'}",
                     key="manage_leave_select"
                 )
                 status = st.selectbox("Update Status", ["Pending", "Approved", "Rejected"], key="leave_status_select")
                 if st.button("Update Status", key="update_leave_status_button"):
-                    tables = get_db_connection()
-                    leave_requests = tables.get("leave_requests", pd.DataFrame(
-                        columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status",
-                                 "created_at"]))
-                    leave_requests.loc[leave_requests["id"] == leave_id, "status"] = status
-                    tables["leave_requests"] = leave_requests
-                    save_db(tables)
-                    st.success("Leave status updated!")
-                    st.rerun()
+                    if not leave_ids:
+                        st.error("Select at least one leave request!")
+                    else:
+                        with batch_writes():
+                            for leave_id in leave_ids:
+                                update_leave_status(leave_id, status)
+                        st.success(f"Updated {len(leave_ids)} leave request(s)!")
+                        st.rerun()
             else:
                 st.error("Error: 'id' column not found in leave requests. Please check the database.")
         else:
@@ -500,7 +1982,7 @@ def leave_management():
                         "created_at": datetime.now()
                     }])
                     tables["leave_requests"] = pd.concat([leave_requests, new_leave], ignore_index=True)
-                    save_db(tables)
+                    save_db(tables, changed=["leave_requests"])
                     st.success("Leave request submitted!")
                     st.rerun()
 
@@ -509,15 +1991,7 @@ def leave_management():
         tables = get_db_connection()
         leave_requests = tables.get("leave_requests", pd.DataFrame(
             columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        leaves = leave_requests.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        leaves = attach_employee_details(leave_requests)
         leaves = leaves.sort_values("created_at", ascending=False)
         if not leaves.empty:
             if "id" in leaves.columns:
@@ -538,7 +2012,7 @@ def leave_management():
                                      "created_at"]))
                         leave_requests = leave_requests[leave_requests["id"] != leave_to_delete]
                         tables["leave_requests"] = leave_requests
-                        save_db(tables)
+                        save_db(tables, changed=["leave_requests"])
                         st.success("Leave request deleted successfully!")
                         st.rerun()
             else:
@@ -547,22 +2021,323 @@ def leave_management():
             st.info("No leave requests found.")
 
 
+def get_shift_templates(tables):
+    templates = tables.get("shift_templates", pd.DataFrame(
+        columns=["id", "name", "start_time", "end_time", "break_minutes", "work_days"]))
+    templates = pd.concat([pd.DataFrame([DEFAULT_SHIFT]), templates], ignore_index=True).drop_duplicates(
+        "id", keep="last").astype({"id": int}).set_index("id")
+    shift_start = pd.to_timedelta(templates["start_time"].astype(str).str.slice(0, 5) + ":00")
+    shift_end = pd.to_timedelta(templates["end_time"].astype(str).str.slice(0, 5) + ":00")
+    shift_end = shift_end.where(shift_end > shift_start, shift_end + pd.Timedelta(days=1))
+    breaks = pd.to_numeric(templates["break_minutes"], errors="coerce").fillna(0)
+    templates["shift_start"] = shift_start
+    templates["shift_hours"] = ((shift_end - shift_start).dt.total_seconds() / 3600 - breaks / 60).clip(lower=0)
+    work_days = templates["work_days"].fillna("").astype(str).str.split(",")
+    for weekday in WEEKDAYS:
+        templates[weekday] = [weekday in [day.strip() for day in days] for days in work_days]
+    templates["weekly_hours"] = templates["shift_hours"] * templates[WEEKDAYS].sum(axis=1)
+    return templates
+
+
+def build_shift_roster(tables, employee_ids, start_date, end_date):
+    days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq="D")
+    employee_ids = np.asarray(employee_ids, dtype=int)
+    roster = pd.DataFrame({"employee_id": np.repeat(employee_ids, len(days)),
+                           "day": np.tile(days.values, len(employee_ids))})
+    assignments = tables.get("shift_assignments",
+                             pd.DataFrame(columns=["id", "employee_id", "shift_id", "effective_date"]))
+    assignments = assignments.dropna(subset=["employee_id", "shift_id", "effective_date"])
+    templates = get_shift_templates(tables)
+    if assignments.empty or roster.empty:
+        shift_ids = np.zeros(len(roster), dtype=int)
+    else:
+        assignments = pd.DataFrame({
+            "employee_id": assignments["employee_id"].astype(int),
+            "effective_date": pd.to_datetime(assignments["effective_date"]).dt.normalize().astype(roster["day"].dtype),
+            "shift_id": assignments["shift_id"].astype(int)}).sort_values("effective_date")
+        roster = pd.merge_asof(roster.sort_values("day"), assignments, left_on="day", right_on="effective_date",
+                               by="employee_id").sort_values(["employee_id", "day"], ignore_index=True)
+        shift_ids = roster.pop("shift_id").fillna(0).astype(int).to_numpy()
+        roster = roster.drop(columns="effective_date")
+    positions = templates.index.get_indexer(shift_ids)
+    positions = np.where(positions >= 0, positions, templates.index.get_loc(0))
+    works = templates[WEEKDAYS].to_numpy()[positions, roster["day"].dt.weekday.to_numpy()]
+    roster["shift_id"] = templates.index.to_numpy()[positions]
+    roster["shift_start"] = templates["shift_start"].to_numpy()[positions]
+    roster["expected_hours"] = np.where(works, templates["shift_hours"].to_numpy()[positions], 0.0)
+    roster["weekly_hours"] = templates["weekly_hours"].to_numpy()[positions]
+    return roster
+
+
+def summarize_attendance_days(attendance):
+    check_in = pd.to_datetime(attendance["check_in"])
+    check_out = pd.to_datetime(attendance["check_out"])
+    day = check_in.dt.normalize()
+    punches = pd.DataFrame({
+        "employee_id": attendance["employee_id"].values,
+        "day": day.values,
+        "first_check_in": (check_in - day).values,
+        "worked_hours": ((check_out - check_in).dt.total_seconds() / 3600).fillna(0).values,
+        "missing_checkouts": check_out.isna().values
+    })
+    daily = punches.groupby(["employee_id", "day"], as_index=False).agg(
+        first_check_in=("first_check_in", "min"),
+        worked_hours=("worked_hours", "sum"),
+        missing_checkouts=("missing_checkouts", "sum")
+    )
+    return daily
+
+
+def get_attendance_daily(month, live_rows):
+    cache = get_index_cache().setdefault("attendance_daily", {})
+    partition_path = entity_path(ARCHIVE_DIR, "attendance", f"{month}.parquet")
+    partition_mtime = os.path.getmtime(partition_path) if os.path.exists(partition_path) else None
+    fingerprint = (partition_mtime, len(live_rows),
+                   int(pd.util.hash_pandas_object(live_rows, index=False).sum()) if not live_rows.empty else 0)
+    cached = cache.get(month)
+    if cached and cached["fingerprint"] == fingerprint:
+        return cached["daily"]
+    frames = [live_rows] if not live_rows.empty else []
+    if partition_mtime is not None:
+        frames.insert(0, load_partition(partition_path, partition_mtime))
+    rows = pd.concat(frames, ignore_index=True) if frames else live_rows
+    daily = summarize_attendance_days(rows)
+    cache[month] = {"fingerprint": fingerprint, "daily": daily}
+    return daily
+
+
+def expand_leave_days(leave_requests, start_date, end_date):
+    approved = leave_requests[leave_requests["status"] == "Approved"]
+    starts = pd.to_datetime(approved["start_date"]).dt.normalize().clip(lower=start_date)
+    ends = pd.to_datetime(approved["end_date"]).dt.normalize().clip(upper=end_date)
+    lengths = ((ends - starts).dt.days + 1).clip(lower=0).fillna(0).astype(int)
+    offsets = np.concatenate([np.arange(length) for length in lengths]) if lengths.sum() else np.array([], dtype=int)
+    leave_days = pd.DataFrame({
+        "employee_id": approved["employee_id"].values.repeat(lengths.values),
+        "day": starts.values.repeat(lengths.values) + pd.to_timedelta(offsets, unit="D")
+    }).drop_duplicates()
+    return leave_days
+
+
+def compute_attendance_rollup(start_date, end_date, group_by, frequency):
+    start_date = pd.Timestamp(start_date).normalize()
+    end_date = pd.Timestamp(end_date).normalize()
+    tables = get_db_connection()
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    leave_requests = tables.get("leave_requests", pd.DataFrame(
+        columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
+    live = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
+
+    live_months = pd.to_datetime(live["check_in"]).dt.strftime("%Y-%m")
+    months = pd.period_range(start_date, end_date, freq="M").strftime("%Y-%m")
+    daily = pd.concat([get_attendance_daily(month, live[live_months == month]) for month in months],
+                      ignore_index=True)
+    daily = daily[(daily["day"] >= start_date) & (daily["day"] <= end_date)]
+
+    active_ids = employees.loc[employees["is_active"] == 1, "id"].unique()
+    roster = build_shift_roster(tables, np.union1d(active_ids, daily["employee_id"].unique()), start_date, end_date)
+    roster["period"] = roster["day"].dt.to_period(frequency)
+    roster["expected_days"] = (roster["expected_hours"] > 0).astype(int)
+    expected = roster.groupby(["employee_id", "period"])[["expected_days", "expected_hours"]].sum()
+
+    daily = daily.assign(day=daily["day"].astype(roster["day"].dtype)).merge(
+        roster[["employee_id", "day", "shift_start", "expected_hours"]], on=["employee_id", "day"], how="left")
+    rostered = daily["expected_hours"].fillna(0) > 0
+    daily["period"] = daily["day"].dt.to_period(frequency)
+    daily["days_worked"] = 1
+    daily["present_days"] = rostered.astype(int)
+    daily["late_arrivals"] = (rostered & (daily["first_check_in"] > daily["shift_start"] + LATE_ARRIVAL_GRACE)).astype(
+        int)
+    daily["overtime_hours"] = (daily["worked_hours"] - daily["expected_hours"].fillna(0)).clip(lower=0)
+    metrics = daily.groupby(["employee_id", "period"])[
+        ["worked_hours", "days_worked", "late_arrivals", "missing_checkouts", "present_days", "overtime_hours"]].sum()
+
+    leave_days = expand_leave_days(leave_requests, start_date, end_date)
+    leave_days = leave_days.assign(day=leave_days["day"].astype(roster["day"].dtype)).merge(
+        roster.loc[roster["expected_days"] == 1, ["employee_id", "day"]], on=["employee_id", "day"])
+    metrics = metrics.reindex(expected.index.union(metrics.index))
+    metrics[["expected_days", "expected_hours"]] = expected.reindex(metrics.index)
+    metrics["leave_days"] = leave_days.groupby(
+        [leave_days["employee_id"], leave_days["day"].dt.to_period(frequency)]).size()
+    metrics = metrics.fillna(0)
+    metrics["absent_days"] = (metrics["expected_days"] - metrics["present_days"] - metrics["leave_days"]).clip(lower=0)
+    metrics = metrics.reset_index()
+
+    if group_by == "Department":
+        metrics = attach_employee_details(metrics, ["department"])
+        metrics["department"] = metrics["department"].fillna("Unassigned")
+        metrics = metrics.drop(columns="employee_id").groupby(["department", "period"], as_index=False).sum()
+        key_column = "department"
+    else:
+        metrics = attach_employee_details(metrics)
+        metrics["employee"] = (metrics.pop("first_name") + " " + metrics.pop("last_name")).fillna("Unknown")
+        key_column = "employee"
+    metrics["average_hours"] = (metrics["worked_hours"] / metrics["days_worked"].where(
+        metrics["days_worked"] > 0)).fillna(0).round(2)
+    metrics["absence_rate"] = (metrics["absent_days"] / metrics["expected_days"].where(
+        metrics["expected_days"] > 0)).fillna(0).round(3)
+    metrics["period"] = metrics["period"].astype(str)
+    return metrics, key_column
+
+
+def get_attendance_rollup(start_date, end_date, group_by, frequency):
+    cache = get_report_cache()
+    key = ("attendance_rollup", str(start_date), str(end_date), group_by, frequency)
+    version = (get_data_version(), load_archive_manifest().get("attendance", {}).get("partitions", []))
+    cached = cache.get(key)
+    if cached and cached["version"] == version:
+        return cached["result"]
+    result = compute_attendance_rollup(start_date, end_date, group_by, frequency)
+    cache[key] = {"version": version, "result": result}
+    return result
+
+
+def show_attendance_analytics():
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        start_date = st.date_input("From", value=date.today().replace(day=1), key="analytics_start_date")
+    with col2:
+        end_date = st.date_input("To", value=date.today(), key="analytics_end_date")
+    with col3:
+        group_by = st.selectbox("Group By", ["Employee", "Department"], key="analytics_group_by")
+    with col4:
+        frequency = st.selectbox("Period", ["Daily", "Weekly", "Monthly"], index=1, key="analytics_frequency")
+    if start_date > end_date:
+        st.error("End date must be after start date!")
+        return
+
+    metrics, key_column = get_attendance_rollup(start_date, end_date, group_by,
+                                                {"Daily": "D", "Weekly": "W", "Monthly": "M"}[frequency])
+    if metrics.empty:
+        st.info("No attendance data for this range.")
+        return
+    st.dataframe(
+        metrics[[key_column, "period", "expected_hours", "worked_hours", "overtime_hours", "average_hours",
+                 "days_worked", "late_arrivals", "missing_checkouts", "leave_days", "absent_days",
+                 "absence_rate"]].style.set_properties(
+            **{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=400
+    )
+    metric = st.selectbox("Heatmap Metric",
+                          ["worked_hours", "overtime_hours", "average_hours", "late_arrivals", "absence_rate"],
+                          key="analytics_heatmap_metric")
+    heatmap = metrics.pivot_table(index=key_column, columns="period", values=metric, aggfunc="sum")
+    fig = px.imshow(heatmap, aspect="auto", color_continuous_scale="Blues",
+                    title=f"{metric.replace('_', ' ').title()} by {group_by} and Period")
+    st.plotly_chart(fig)
+
+
+def show_shift_roster():
+    tables = get_db_connection()
+    templates = get_shift_templates(tables)
+    st.write("Shift Templates:")
+    st.dataframe(
+        templates.reset_index()[["id", "name", "start_time", "end_time", "break_minutes", "work_days", "shift_hours",
+                                 "weekly_hours"]].style.set_properties(
+            **{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        with st.form("add_shift_form", clear_on_submit=True):
+            st.write("Add Shift Template")
+            name = st.text_input("Shift Name", key="shift_name")
+            start_time = st.time_input("Start Time", value=datetime.strptime("09:00", "%H:%M").time(),
+                                       key="shift_start_time")
+            end_time = st.time_input("End Time", value=datetime.strptime("17:00", "%H:%M").time(),
+                                     key="shift_end_time")
+            break_minutes = st.number_input("Break (minutes)", min_value=0, max_value=240, value=0, step=15,
+                                            key="shift_break_minutes")
+            work_days = st.multiselect("Work Days", WEEKDAYS, default=WEEKDAYS[:5], key="shift_work_days")
+            if st.form_submit_button("Add Shift"):
+                if not name or not work_days:
+                    st.error("Shift name and work days are required!")
+                else:
+                    shift_templates = tables.get("shift_templates", pd.DataFrame(
+                        columns=["id", "name", "start_time", "end_time", "break_minutes", "work_days"]))
+                    new_id = shift_templates["id"].max() + 1 if not shift_templates.empty else 1
+                    new_shift = pd.DataFrame([{
+                        "id": new_id,
+                        "name": name,
+                        "start_time": start_time.strftime("%H:%M"),
+                        "end_time": end_time.strftime("%H:%M"),
+                        "break_minutes": break_minutes,
+                        "work_days": ",".join(work_days)
+                    }])
+                    tables["shift_templates"] = pd.concat([shift_templates, new_shift], ignore_index=True)
+                    save_db(tables, changed=["shift_templates"])
+                    st.success("Shift template added!")
+                    st.rerun()
+    with col2:
+        with st.form("assign_shift_form", clear_on_submit=True):
+            st.write("Assign Shift")
+            employee = st.selectbox("Employee", get_active_employees(), format_func=lambda x: f"{x[1]} {x[2]}",
+                                    key="shift_employee")
+            shift_id = st.selectbox("Shift", templates.index.tolist(),
+                                    format_func=lambda x: templates.loc[x, "name"], key="shift_assignment_shift")
+            effective_date = st.date_input("Effective Date", value=date.today(), key="shift_effective_date")
+            if st.form_submit_button("Assign Shift"):
+                if not employee:
+                    st.error("Employee is required!")
+                else:
+                    shift_assignments = tables.get("shift_assignments", pd.DataFrame(
+                        columns=["id", "employee_id", "shift_id", "effective_date"]))
+                    new_id = shift_assignments["id"].max() + 1 if not shift_assignments.empty else 1
+                    new_assignment = pd.DataFrame([{
+                        "id": new_id,
+                        "employee_id": employee[0],
+                        "shift_id": shift_id,
+                        "effective_date": pd.Timestamp(effective_date)
+                    }])
+                    tables["shift_assignments"] = pd.concat([shift_assignments, new_assignment], ignore_index=True)
+                    save_db(tables, changed=["shift_assignments"])
+                    st.success("Shift assigned!")
+                    st.rerun()
+
+    week_start = st.date_input("Roster Week Starting", value=date.today() - pd.Timedelta(days=date.today().weekday()),
+                               key="roster_week_start")
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    active_ids = employees.loc[employees["is_active"] == 1, "id"].unique()
+    if len(active_ids) == 0:
+        st.info("No active employees found.")
+        return
+    roster = attach_employee_details(build_shift_roster(tables, active_ids, week_start,
+                                                        pd.Timestamp(week_start) + pd.Timedelta(days=6)))
+    roster["employee"] = (roster["first_name"] + " " + roster["last_name"]).fillna("Unknown")
+    roster["day"] = roster["day"].dt.strftime("%a %d %b")
+    st.write("Expected Hours:")
+    st.dataframe(
+        roster.pivot_table(index="employee", columns="day", values="expected_hours", aggfunc="sum", sort=False),
+        use_container_width=True,
+        height=300
+    )
+
+    no_show_date = st.date_input("No-Shows On", value=date.today(), key="no_show_date")
+    metrics, _ = get_attendance_rollup(no_show_date, no_show_date, "Employee", "D")
+    no_shows = metrics[metrics["absent_days"] > 0]
+    if no_shows.empty:
+        st.info("No no-shows for this date.")
+    else:
+        st.warning(f"{len(no_shows)} rostered employee(s) did not punch in and had no approved leave:")
+        st.dataframe(no_shows[["employee", "expected_hours"]].style.set_properties(
+            **{"text-align": "left", "white-space": "pre-wrap"}), use_container_width=True)
+
+
 def attendance_tracking():
     st.title("Attendance Tracking")
-    tab1, tab2, tab3 = st.tabs(["Attendance Records", "Record Attendance", "Delete Attendance"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Attendance Records", "Record Attendance", "Delete Attendance", "Analytics", "Shift Roster"])
 
     with tab1:
         tables = get_db_connection()
         attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        attendance_records = attendance.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        attendance_records = attach_employee_details(attendance)
         attendance_records = attendance_records.sort_values("check_in", ascending=False)
         if not attendance_records.empty:
             st.dataframe(
@@ -570,6 +2345,7 @@ def attendance_tracking():
                 use_container_width=True,
                 height=400
             )
+            show_export_controls("attendance", "attendance", "attendance_export")
         else:
             st.info("No attendance records found.")
 
@@ -599,7 +2375,7 @@ def attendance_tracking():
                     tables = get_db_connection()
                     attendance = tables.get("attendance",
                                             pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
-                    new_id = attendance["id"].max() + 1 if not attendance.empty else 1
+                    new_id = get_next_id("attendance", attendance)
                     new_attendance = pd.DataFrame([{
                         "id": new_id,
                         "employee_id": employee[0],
@@ -607,7 +2383,7 @@ def attendance_tracking():
                         "check_out": check_out
                     }])
                     tables["attendance"] = pd.concat([attendance, new_attendance], ignore_index=True)
-                    save_db(tables)
+                    save_db(tables, changed=["attendance"])
                     st.success("Attendance recorded!")
                     st.rerun()
 
@@ -615,15 +2391,7 @@ def attendance_tracking():
         st.subheader("Delete Attendance Record")
         tables = get_db_connection()
         attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        attendance_records = attendance.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        attendance_records = attach_employee_details(attendance)
         attendance_records = attendance_records.sort_values("check_in", ascending=False)
         if not attendance_records.empty:
             if "id" in attendance_records.columns:
@@ -643,7 +2411,7 @@ def attendance_tracking():
                                                 pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
                         attendance = attendance[attendance["id"] != attendance_to_delete]
                         tables["attendance"] = attendance
-                        save_db(tables)
+                        save_db(tables, changed=["attendance"])
                         st.success("Attendance record deleted successfully!")
                         st.rerun()
             else:
@@ -651,24 +2419,155 @@ def attendance_tracking():
         else:
             st.info("No attendance records found.")
 
+    with tab4:
+        st.subheader("Attendance Analytics")
+        show_attendance_analytics()
+
+    with tab5:
+        show_shift_roster()
+
+
+def summarize_employee_reviews(reviews):
+    reviews = reviews.sort_values(["employee_id", "review_date", "id"])
+    grouped = reviews.groupby("employee_id")
+    reviews = reviews.assign(rolling_average=grouped["rating"].rolling(
+        ROLLING_REVIEW_WINDOW, min_periods=1).mean().reset_index(level=0, drop=True))
+    reviews["previous_average"] = reviews.groupby("employee_id")["rolling_average"].shift()
+    summary = reviews.groupby("employee_id").agg(
+        review_count=("id", "count"),
+        latest_rating=("rating", "last"),
+        rolling_average=("rolling_average", "last"),
+        previous_average=("previous_average", "last"),
+        last_review_date=("review_date", "last")
+    )
+    summary["trend"] = (summary["rolling_average"] - summary["previous_average"]).fillna(0).round(2)
+    return summary.drop(columns="previous_average")
+
+
+def get_performance_summary(performance):
+    cache = get_index_cache()
+    state = cache.get("performance_summary")
+    ids = performance["id"].to_numpy()
+    ratings = performance["rating"].to_numpy(dtype=float)
+    summary = None
+    if state:
+        seen = len(state["ids"])
+        if len(ids) >= seen and (ids[:seen] == state["ids"]).all() and (ratings[:seen] == state["ratings"]).all():
+            new_reviews = performance.iloc[seen:]
+            summary = state["summary"]
+            if not new_reviews.empty:
+                affected = new_reviews["employee_id"].unique()
+                summary = pd.concat([
+                    summary.drop(index=affected, errors="ignore"),
+                    summarize_employee_reviews(performance[performance["employee_id"].isin(affected)])
+                ])
+    if summary is None:
+        summary = summarize_employee_reviews(performance)
+    cache["performance_summary"] = {"ids": ids, "ratings": ratings, "summary": summary}
+    return summary
+
+
+def flag_calibration_outliers(reviews, group_column):
+    cycle_means = reviews.groupby("cycle")["rating"].mean()
+    groups = reviews.groupby(["cycle", group_column], as_index=False).agg(
+        reviews=("rating", "count"), average_rating=("rating", "mean"), rating_spread=("rating", "std"))
+    groups["cycle_average"] = groups["cycle"].map(cycle_means)
+    groups["deviation"] = (groups["average_rating"] - groups["cycle_average"]).round(2)
+    groups["outlier"] = (groups["reviews"] >= CALIBRATION_MIN_REVIEWS) & (
+            groups["deviation"].abs() > CALIBRATION_THRESHOLD)
+    return groups
+
+
+def build_performance_analytics(version):
+    cache = get_report_cache()
+    cached = cache.get("performance_analytics")
+    if cached and cached["version"] == version:
+        return cached
+    tables = get_db_connection()
+    performance = tables.get("performance",
+                             pd.DataFrame(columns=["id", "employee_id", "review_date", "rating", "comments"]))
+    employee_details = get_employee_directory()
+    performance = performance.assign(
+        review_date=pd.to_datetime(performance["review_date"]),
+        rating=performance["rating"].astype(float))
+
+    summary = get_performance_summary(performance).reset_index()
+    summary["name"] = summary["employee_id"].map(
+        employee_details["first_name"].astype(str) + " " + employee_details["last_name"].astype(str))
+    summary["department"] = summary["employee_id"].map(employee_details["department"]).fillna("Unassigned")
+    summary["job_title"] = summary["employee_id"].map(employee_details["job_title"]).fillna("Unassigned")
+    summary["department_percentile"] = (summary.groupby("department")["rolling_average"].rank(pct=True) * 100).round(1)
+    summary["rolling_average"] = summary["rolling_average"].round(2)
+
+    reviews = performance.assign(
+        cycle=performance["review_date"].dt.to_period("Q").astype(str),
+        department=performance["employee_id"].map(employee_details["department"]).fillna("Unassigned"),
+        job_title=performance["employee_id"].map(employee_details["job_title"]).fillna("Unassigned"))
+    analytics = {
+        "version": version,
+        "summary": summary,
+        "reviews": reviews[["employee_id", "cycle", "department", "job_title", "rating"]],
+        "department_calibration": flag_calibration_outliers(reviews, "department"),
+        "job_title_calibration": flag_calibration_outliers(reviews, "job_title")
+    }
+    cache["performance_analytics"] = analytics
+    return analytics
+
+
+def show_performance_analytics():
+    analytics = build_performance_analytics(get_data_version())
+    summary = analytics["summary"]
+    if summary.empty:
+        st.info("No performance reviews found.")
+        return
+
+    st.write("Employee Rating Trends:")
+    st.dataframe(
+        summary[["name", "department", "job_title", "review_count", "latest_rating", "rolling_average", "trend",
+                 "department_percentile", "last_review_date"]].sort_values(
+            ["department", "department_percentile"], ascending=[True, False]).style.set_properties(
+            **{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=400
+    )
+
+    reviews = analytics["reviews"]
+    cycles = sorted(reviews["cycle"].unique(), reverse=True)
+    cycle = st.selectbox("Review Cycle", ["All"] + cycles, key="performance_cycle")
+    group_column = st.selectbox("Distribution By", ["department", "job_title"],
+                                format_func=lambda x: x.replace("_", " ").title(), key="performance_group_by")
+    if cycle != "All":
+        reviews = reviews[reviews["cycle"] == cycle]
+    distribution = reviews.assign(rating=reviews["rating"].round()).groupby(
+        [group_column, "rating"]).size().reset_index(name="reviews")
+    fig = px.bar(distribution, x="rating", y="reviews", color=group_column, barmode="group",
+                 title=f"Rating Distribution by {group_column.replace('_', ' ').title()}")
+    st.plotly_chart(fig)
+
+    calibration = analytics[f"{group_column}_calibration"]
+    if cycle != "All":
+        calibration = calibration[calibration["cycle"] == cycle]
+    outliers = calibration[calibration["outlier"]]
+    if not outliers.empty:
+        st.warning(f"{len(outliers)} calibration outlier(s) deviate by more than {CALIBRATION_THRESHOLD} "
+                   f"from the cycle average:")
+        st.dataframe(
+            outliers.drop(columns="outlier").style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+            use_container_width=True
+        )
+    else:
+        st.success("No calibration outliers for this selection.")
+
 
 def performance_management():
     st.title("Performance Management")
-    tab1, tab2, tab3 = st.tabs(["Performance Reviews", "Add Review", "Delete Review"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Performance Reviews", "Add Review", "Delete Review", "Analytics"])
 
     with tab1:
         tables = get_db_connection()
         performance = tables.get("performance",
                                  pd.DataFrame(columns=["id", "employee_id", "review_date", "rating", "comments"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        reviews = performance.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        reviews = attach_employee_details(performance)
         reviews = reviews.sort_values("review_date", ascending=False)
         if not reviews.empty:
             st.dataframe(
@@ -676,6 +2575,7 @@ def performance_management():
                 use_container_width=True,
                 height=400
             )
+            show_export_controls(lambda: reviews, "performance_reviews", "performance_export")
         else:
             st.info("No performance reviews found.")
 
@@ -706,7 +2606,7 @@ def performance_management():
                         "comments": comments
                     }])
                     tables["performance"] = pd.concat([performance, new_review], ignore_index=True)
-                    save_db(tables)
+                    save_db(tables, changed=["performance"])
                     st.success("Performance review added!")
                     st.rerun()
 
@@ -715,15 +2615,7 @@ def performance_management():
         tables = get_db_connection()
         performance = tables.get("performance",
                                  pd.DataFrame(columns=["id", "employee_id", "review_date", "rating", "comments"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        reviews = performance.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        reviews = attach_employee_details(performance)
         reviews = reviews.sort_values("review_date", ascending=False)
         if not reviews.empty:
             if "id" in reviews.columns:
@@ -743,7 +2635,7 @@ def performance_management():
                             columns=["id", "employee_id", "review_date", "rating", "comments"]))
                         performance = performance[performance["id"] != review_to_delete]
                         tables["performance"] = performance
-                        save_db(tables)
+                        save_db(tables, changed=["performance"])
                         st.success("Performance review deleted successfully!")
                         st.rerun()
             else:
@@ -751,79 +2643,453 @@ def performance_management():
         else:
             st.info("No performance reviews found.")
 
+    with tab4:
+        st.subheader("Performance Analytics")
+        show_performance_analytics()
+
+
+def migrate_recruitment():
+    tables = get_db_connection()
+    if "job_positions" in tables:
+        return False
+    recruitment = tables.pop("recruitment", pd.DataFrame(
+        columns=["id", "position", "department", "status", "applicant_name", "applicant_email", "application_date",
+                 "resume_path"]))
+    recruitment = recruitment.sort_values("id")
+    recruitment["application_date"] = pd.to_datetime(recruitment["application_date"]).dt.date
+    positions = recruitment.groupby(["position", "department"], sort=False, dropna=False).agg(
+        status=("status", lambda statuses: "Open" if (statuses == "Open").any() else statuses.iloc[-1]),
+        opened_date=("application_date", "min")
+    ).reset_index()
+    positions.insert(0, "id", range(1, len(positions) + 1))
+    position_ids = recruitment.merge(positions[["id", "position", "department"]], on=["position", "department"],
+                                     how="left", suffixes=("", "_position"))["id_position"]
+    applicants = pd.DataFrame({
+        "id": recruitment["id"].to_numpy(),
+        "position_id": position_ids.to_numpy(),
+        "applicant_name": recruitment["applicant_name"].to_numpy(),
+        "applicant_email": recruitment["applicant_email"].to_numpy(),
+        "application_date": recruitment["application_date"].to_numpy(),
+        "stage": "Applied",
+        "resume_path": recruitment["resume_path"].to_numpy()
+    }, columns=["id", "position_id", "applicant_name", "applicant_email", "application_date", "stage",
+                "resume_path"])
+    stages = pd.DataFrame({
+        "id": range(1, len(applicants) + 1),
+        "applicant_id": applicants["id"].to_numpy(),
+        "stage": "Applied",
+        "changed_at": applicants["application_date"].to_numpy()
+    }, columns=["id", "applicant_id", "stage", "changed_at"])
+    tables["job_positions"] = positions
+    tables["applicants"] = applicants
+    tables["applicant_stages"] = stages
+    save_db(tables, changed=["job_positions", "applicants", "applicant_stages"])
+    return True
+
+
+def build_recruitment_funnel(applicants, stages):
+    ranks = {stage: rank for rank, stage in enumerate(RECRUITMENT_STAGES)}
+    progress = stages[stages["stage"].isin(ranks)]
+    reached = progress.assign(rank=progress["stage"].map(ranks)).groupby("applicant_id")["rank"].max()
+    reached = reached.reindex(applicants["id"]).fillna(0).astype(int)
+    counts = np.bincount(reached.to_numpy(), minlength=len(RECRUITMENT_STAGES))[::-1].cumsum()[::-1]
+    funnel = pd.DataFrame({"stage": RECRUITMENT_STAGES, "applicants": counts})
+    funnel["conversion"] = (funnel["applicants"] / funnel["applicants"].shift().replace(0, np.nan) * 100).round(1)
+    return funnel
+
+
+def build_time_to_hire(applicants, stages):
+    hired = stages[stages["stage"] == "Hired"].groupby("applicant_id")["changed_at"].min()
+    hires = applicants[applicants["id"].isin(hired.index)]
+    hired_at = pd.Series(pd.to_datetime(hired.reindex(hires["id"]).to_numpy()), index=hires.index)
+    days = (hired_at - pd.to_datetime(hires["application_date"])).dt.days
+    hires = hires.assign(days_to_hire=days)
+    return hires.groupby("department", as_index=False).agg(
+        hires=("id", "count"), average_days=("days_to_hire", "mean"), median_days=("days_to_hire", "median")
+    ).round(1)
+
+
+def get_recruitment_pipeline():
+    cache = get_index_cache()
+    version = get_data_version()
+    cached = cache.get("recruitment_pipeline")
+    if cached and cached["version"] == version:
+        return cached
+    tables = get_db_connection()
+    positions = tables.get("job_positions", pd.DataFrame(
+        columns=["id", "position", "department", "status", "opened_date"]))
+    applicants = tables.get("applicants", pd.DataFrame(
+        columns=["id", "position_id", "applicant_name", "applicant_email", "application_date", "stage",
+                 "resume_path"]))
+    stages = tables.get("applicant_stages", pd.DataFrame(columns=["id", "applicant_id", "stage", "changed_at"]))
+
+    positions = positions.sort_values("opened_date", ascending=False, kind="stable").reset_index(drop=True)
+    position_details = positions.set_index("id")
+    applicants = applicants.assign(
+        position=applicants["position_id"].map(position_details["position"]),
+        department=applicants["position_id"].map(position_details["department"])
+    ).sort_values("application_date", ascending=False, kind="stable").reset_index(drop=True)
+    positions["applicants"] = positions["id"].map(applicants.groupby("position_id").size()).fillna(0).astype(int)
+
+    pipeline = {
+        "version": version,
+        "positions": positions,
+        "applicants": applicants,
+        "positions_by_status": positions.groupby("status").indices,
+        "positions_by_department": positions.groupby("department").indices,
+        "applicants_by_position": applicants.groupby("position_id").indices,
+        "applicants_by_stage": applicants.groupby("stage").indices,
+        "funnel": build_recruitment_funnel(applicants, stages),
+        "time_to_hire": build_time_to_hire(applicants, stages)
+    }
+    pipeline["open_positions"] = len(pipeline["positions_by_status"].get("Open", []))
+    cache["recruitment_pipeline"] = pipeline
+    return pipeline
+
+
+def get_pipeline_rows(table_name, index_name, keys):
+    pipeline = get_recruitment_pipeline()
+    positions = [pipeline[index_name].get(key, []) for key in keys]
+    positions = np.sort(np.concatenate(positions)) if positions else []
+    return pipeline[table_name].take(np.asarray(positions, dtype=int))
+
+
+def update_applicant_stage(applicant_id, stage):
+    tables = get_db_connection()
+    applicants = tables.get("applicants", pd.DataFrame(
+        columns=["id", "position_id", "applicant_name", "applicant_email", "application_date", "stage",
+                 "resume_path"]))
+    stages = tables.get("applicant_stages", pd.DataFrame(columns=["id", "applicant_id", "stage", "changed_at"]))
+    applicants.loc[applicants["id"] == applicant_id, "stage"] = stage
+    new_stage = pd.DataFrame([{
+        "id": stages["id"].max() + 1 if not stages.empty else 1,
+        "applicant_id": applicant_id,
+        "stage": stage,
+        "changed_at": date.today()
+    }])
+    tables["applicants"] = applicants
+    tables["applicant_stages"] = pd.concat([stages, new_stage], ignore_index=True)
+    save_db(tables, changed=["applicants", "applicant_stages"])
+
+
+def show_recruitment_pipeline():
+    pipeline = get_recruitment_pipeline()
+    funnel = pipeline["funnel"]
+    if funnel["applicants"].iloc[0] == 0:
+        st.info("No applicants found.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Open Positions", pipeline["open_positions"])
+    col2.metric("Active Applicants", len(pipeline["applicants"]) - len(
+        pipeline["applicants_by_stage"].get("Hired", [])) - len(pipeline["applicants_by_stage"].get("Rejected", [])))
+    col3.metric("Hires", funnel["applicants"].iloc[-1])
+    fig = px.funnel(funnel, x="applicants", y="stage", title="Recruitment Funnel")
+    st.plotly_chart(fig)
+    st.dataframe(funnel.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                 use_container_width=True)
+    st.write("Time to Hire by Department:")
+    if not pipeline["time_to_hire"].empty:
+        st.dataframe(
+            pipeline["time_to_hire"].style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+            use_container_width=True)
+    else:
+        st.info("No hires recorded yet.")
+
+
+def tokenize_text(text):
+    return re.findall(r"[a-z0-9][a-z0-9+#]*", str(text).lower())
+
+
+def extract_resume_text(resume_path):
+    reader = PdfReader(resume_path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+@st.cache_resource
+def get_entity_resume_indexer(data_dir):
+    indexer = {"lock": threading.Lock(), "queue": queue.Queue(), "pending": set(), "store": {}, "version": 0,
+               "index_path": os.path.join(data_dir, RESUME_DIR, RESUME_INDEX_FILE)}
+    if os.path.exists(indexer["index_path"]):
+        try:
+            with open(indexer["index_path"], "r") as f:
+                indexer["store"] = {int(k): v for k, v in json.load(f).items()}
+        except Exception:
+            indexer["store"] = {}
+    threading.Thread(target=run_resume_indexer, args=(indexer,), daemon=True).start()
+    return indexer
+
+
+def get_resume_indexer():
+    return get_entity_resume_indexer(current_entity_dir.get())
+
+
+def run_resume_indexer(indexer):
+    while True:
+        batch = [indexer["queue"].get()]
+        while not indexer["queue"].empty():
+            batch.append(indexer["queue"].get())
+        entries = {}
+        for applicant_id, resume_path in batch:
+            try:
+                mtime = os.path.getmtime(resume_path)
+                text = extract_resume_text(resume_path)
+                entries[applicant_id] = {"resume_path": resume_path, "mtime": mtime,
+                                         "terms": dict(Counter(tokenize_text(text))),
+                                         "excerpt": " ".join(text.split())[:RESUME_EXCERPT_LENGTH]}
+            except Exception as e:
+                entries[applicant_id] = {"resume_path": resume_path, "mtime": None, "terms": {}, "excerpt": "",
+                                         "error": str(e)}
+        with indexer["lock"]:
+            indexer["store"].update(entries)
+            indexer["pending"].difference_update(entries)
+            save_resume_store(indexer)
+
+
+def save_resume_store(indexer):
+    try:
+        os.makedirs(os.path.dirname(indexer["index_path"]) or ".", exist_ok=True)
+        atomic_write(indexer["index_path"], json.dumps(indexer["store"]).encode("utf-8"))
+    finally:
+        indexer["version"] += 1
+
+
+def queue_resume_indexing(applicant_id, resume_path):
+    indexer = get_resume_indexer()
+    with indexer["lock"]:
+        if applicant_id in indexer["pending"]:
+            return
+        indexer["pending"].add(applicant_id)
+    indexer["queue"].put((applicant_id, resume_path))
+
+
+def remove_resume_documents(applicant_ids):
+    indexer = get_resume_indexer()
+    with indexer["lock"]:
+        for applicant_id in applicant_ids:
+            indexer["store"].pop(int(applicant_id), None)
+        save_resume_store(indexer)
+
+
+def sync_resume_documents(index, applicant_ids=None):
+    indexer = get_resume_indexer()
+    with indexer["lock"]:
+        store = dict(indexer["store"])
+        index["store_version"] = indexer["version"]
+    applicants = get_recruitment_pipeline()["applicants"]
+    if applicant_ids is not None:
+        applicants = applicants[applicants["id"].isin(list(applicant_ids))]
+    current = {}
+    for applicant in applicants.itertuples(index=False):
+        fields = " ".join(str(value) for value in [applicant.applicant_name, applicant.applicant_email,
+                                                   applicant.position, applicant.department, applicant.stage])
+        entry = store.get(applicant.id)
+        resume_path = applicant.resume_path if pd.notna(applicant.resume_path) else None
+        if resume_path and os.path.exists(resume_path):
+            if not entry or entry["mtime"] != os.path.getmtime(resume_path):
+                queue_resume_indexing(applicant.id, resume_path)
+        current[applicant.id] = (fields, entry["mtime"] if entry else None, entry)
+
+    postings = index["postings"]
+    checked = list(index["documents"]) if applicant_ids is None else [
+        applicant_id for applicant_id in applicant_ids if applicant_id in index["documents"]]
+    for applicant_id in checked:
+        signature = index["documents"][applicant_id]
+        if applicant_id in current and current[applicant_id][:2] == signature:
+            continue
+        for term in index["terms"].pop(applicant_id, {}):
+            postings[term].pop(applicant_id, None)
+            if not postings[term]:
+                del postings[term]
+        del index["documents"][applicant_id]
+        del index["lengths"][applicant_id]
+    for applicant_id, (fields, mtime, entry) in current.items():
+        if applicant_id in index["documents"]:
+            continue
+        terms = Counter(tokenize_text(fields))
+        if entry:
+            terms.update(entry["terms"])
+        for term, frequency in terms.items():
+            postings.setdefault(term, {})[applicant_id] = frequency
+        index["documents"][applicant_id] = (fields, mtime)
+        index["terms"][applicant_id] = list(terms)
+        index["lengths"][applicant_id] = sum(terms.values())
+    index["excerpts"] = {applicant_id: entry["excerpt"] for applicant_id, entry in store.items()}
+    return index
+
+
+def build_resume_search_index():
+    return sync_resume_documents({"documents": {}, "terms": {}, "postings": {}, "lengths": {}})
+
+
+def apply_resume_search_events(index, events):
+    applicant_ids = {event["id"] for event in events if event["table"] == "applicants"}
+    position_ids = [event["id"] for event in events if event["table"] == "job_positions"]
+    if position_ids:
+        applicant_ids |= set(get_pipeline_rows("applicants", "applicants_by_position", position_ids)["id"])
+    if applicant_ids:
+        sync_resume_documents(index, applicant_ids)
+    return index
+
+
+def get_resume_search_index():
+    index = get_materialized_view("resume_search", build_resume_search_index, apply_resume_search_events)
+    indexer = get_resume_indexer()
+    if index["store_version"] != indexer["version"]:
+        with indexer["lock"]:
+            store = dict(indexer["store"])
+        stale = [applicant_id for applicant_id, (fields, mtime) in index["documents"].items()
+                 if (store.get(applicant_id) or {}).get("mtime") != mtime]
+        sync_resume_documents(index, stale)
+    return index
+
+
+def search_resumes(query, limit=20):
+    index = get_resume_search_index()
+    lengths = index["lengths"]
+    if not lengths:
+        return pd.DataFrame(columns=["id", "score"])
+    document_count = len(lengths)
+    average_length = sum(lengths.values()) / document_count
+    scores = Counter()
+    for term in set(tokenize_text(query)):
+        postings = index["postings"].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+        for applicant_id, frequency in postings.items():
+            length_norm = 1 - BM25_B + BM25_B * lengths[applicant_id] / average_length
+            scores[applicant_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    results = pd.DataFrame(top, columns=["id", "score"])
+    results["score"] = results["score"].round(3)
+    results["excerpt"] = results["id"].map(index["excerpts"]).fillna("")
+    return results
+
+
+def show_resume_search():
+    query = st.text_input("Search resumes and applicants", key="resume_search_query",
+                          placeholder="e.g. python sql analyst")
+    indexer = get_resume_indexer()
+    if indexer["pending"]:
+        st.info(f"{len(indexer['pending'])} resume(s) are still being indexed.")
+    if not query:
+        return
+    results = search_resumes(query)
+    if results.empty:
+        st.info("No matching applicants found.")
+        return
+    applicants = get_recruitment_pipeline()["applicants"]
+    results = results.merge(
+        applicants[["id", "applicant_name", "applicant_email", "position", "department", "stage"]], on="id")
+    st.dataframe(
+        results[["id", "score", "applicant_name", "applicant_email", "position", "department", "stage",
+                 "excerpt"]].style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=400
+    )
+
 
 def recruitment_management(is_admin=True):
     st.title("Recruitment Management")
-    tabs = ["Job Openings", "Add Job Opening", "Delete Job Opening"] if is_admin else ["Job Openings"]
+    tabs = ["Job Openings", "Add Job Opening", "Delete Job Opening", "Pipeline", "Search"] if is_admin else [
+        "Job Openings"]
     tab_objects = st.tabs(tabs)
 
     with tab_objects[0]:
-        tables = get_db_connection()
-        recruitment = tables.get("recruitment", pd.DataFrame(
-            columns=["id", "position", "department", "status", "applicant_name", "applicant_email", "application_date",
-                     "resume_path"]))
-        recruitment = recruitment.sort_values("application_date", ascending=False)
-        if not recruitment.empty:
-            recruitment_display = recruitment.copy()
-            recruitment_display["resume"] = recruitment["resume_path"].apply(
-                lambda x: f"[Download Resume]({x})" if pd.notna(x) and os.path.exists(x) else "No Resume"
-            )
-            recruitment_display["view_resume"] = recruitment["resume_path"].apply(
-                lambda x: x if pd.notna(x) and os.path.exists(x) else None
-            )
+        pipeline = get_recruitment_pipeline()
+        if not pipeline["positions"].empty:
+            col1, col2 = st.columns(2)
+            with col1:
+                status_filter = st.selectbox("Status", ["All"] + POSITION_STATUSES, key="job_status_filter")
+            with col2:
+                department_filter = st.selectbox("Department", ["All"] + sorted(pipeline["positions_by_department"]),
+                                                 key="job_department_filter")
+            positions = pipeline["positions"]
+            if status_filter != "All":
+                positions = get_pipeline_rows("positions", "positions_by_status", [status_filter])
+            if department_filter != "All":
+                positions = positions[positions["department"] == department_filter]
             st.dataframe(
-                recruitment_display[
-                    ["id", "position", "department", "status", "applicant_name", "applicant_email", "application_date",
-                     "resume", "view_resume"]].style.set_properties(
+                positions[["id", "position", "department", "status", "opened_date", "applicants"]].style.set_properties(
                     **{"text-align": "left", "white-space": "pre-wrap"}),
-                use_container_width=True,
-                height=400
+                use_container_width=True
             )
-            selected_job_id = st.selectbox(
-                "Select Job to View Resume",
-                recruitment["id"].tolist(),
-                format_func=lambda
-                    x: f"Job {x} - {recruitment[recruitment['id'] == x]['position'].iloc[0]} - {recruitment[recruitment['id'] == x]['applicant_name'].iloc[0]}",
-                key="view_resume_select"
-            )
-            resume_path = recruitment[recruitment["id"] == selected_job_id]["resume_path"].iloc[0] if not recruitment[
-                recruitment["id"] == selected_job_id].empty else None
-            if resume_path and os.path.exists(resume_path):
-                st.subheader("Resume Preview")
-                display_pdf(resume_path)
-                with open(resume_path, "rb") as f:
-                    st.download_button(
-                        label="Download Resume",
-                        data=f,
-                        file_name=os.path.basename(resume_path),
-                        mime="application/pdf",
-                        key=f"download_resume_{selected_job_id}"
+
+            applicants = get_pipeline_rows("applicants", "applicants_by_position", positions["id"].tolist())
+            if not applicants.empty:
+                applicants_display = applicants.copy()
+                applicants_display["resume"] = applicants["resume_path"].apply(
+                    lambda x: f"[Download Resume]({x})" if pd.notna(x) and os.path.exists(x) else "No Resume"
+                )
+                st.dataframe(
+                    applicants_display[
+                        ["id", "position", "department", "stage", "applicant_name", "applicant_email",
+                         "application_date", "resume"]].style.set_properties(
+                        **{"text-align": "left", "white-space": "pre-wrap"}),
+                    use_container_width=True,
+                    height=400
+                )
+                applicant_labels = dict(zip(applicants["id"],
+                                            "Applicant " + applicants["id"].astype(str) + " - " +
+                                            applicants["position"].astype(str) + " - " +
+                                            applicants["applicant_name"].astype(str)))
+                resume_paths = dict(zip(applicants["id"], applicants["resume_path"]))
+                selected_applicant_id = st.selectbox(
+                    "Select Applicant to View Resume",
+                    applicants["id"].tolist(),
+                    format_func=lambda x: applicant_labels[x],
+                    key="view_resume_select"
+                )
+                resume_path = resume_paths.get(selected_applicant_id)
+                if pd.notna(resume_path) and os.path.exists(resume_path):
+                    st.subheader("Resume Preview")
+                    display_pdf(resume_path)
+                    with open(resume_path, "rb") as f:
+                        st.download_button(
+                            label="Download Resume",
+                            data=f,
+                            file_name=os.path.basename(resume_path),
+                            mime="application/pdf",
+                            key=f"download_resume_{selected_applicant_id}"
+                        )
+                else:
+                    st.info("No resume available for this applicant.")
+                if is_admin:
+                    st.subheader("Move Applicant")
+                    applicant_id = st.selectbox(
+                        "Select Applicant",
+                        applicants["id"].tolist(),
+                        format_func=lambda x: applicant_labels[x],
+                        key="manage_applicant_select"
                     )
+                    stage = st.selectbox("Stage", RECRUITMENT_STAGES + ["Rejected"], key="applicant_stage_select")
+                    if st.button("Update Stage", key="update_applicant_stage_button"):
+                        update_applicant_stage(applicant_id, stage)
+                        st.success("Applicant stage updated!")
+                        st.rerun()
             else:
-                st.info("No resume available for this job opening.")
+                st.info("No applicants for the selected job openings.")
+
             if is_admin:
                 st.subheader("Update Job Status")
+                position_labels = dict(zip(pipeline["positions"]["id"],
+                                           "Job " + pipeline["positions"]["id"].astype(str) + " - " +
+                                           pipeline["positions"]["position"].astype(str) + " - " +
+                                           pipeline["positions"]["department"].astype(str)))
                 job_id = st.selectbox(
                     "Select Job Opening",
-                    recruitment["id"].tolist(),
-                    format_func=lambda
-                        x: f"Job {x} - {recruitment[recruitment['id'] == x]['position'].iloc[0]} - {recruitment[recruitment['id'] == x]['applicant_name'].iloc[0]}",
+                    positions["id"].tolist(),
+                    format_func=lambda x: position_labels[x],
                     key="manage_job_select"
                 )
-                status = st.selectbox("Update Status", ["Open", "Closed", "On Hold"], key="job_status_select")
-                resume_path = recruitment[recruitment["id"] == job_id]["resume_path"].iloc[0] if not recruitment[
-                    recruitment["id"] == job_id].empty else None
-                if resume_path and os.path.exists(resume_path):
-                    st.write("Resume for Selected Job:")
-                    display_pdf(resume_path)
+                status = st.selectbox("Update Status", POSITION_STATUSES, key="job_status_select")
                 if st.button("Update Status", key="update_job_status_button"):
                     tables = get_db_connection()
-                    recruitment = tables.get("recruitment", pd.DataFrame(
-                        columns=["id", "position", "department", "status", "applicant_name", "applicant_email",
-                                 "application_date", "resume_path"]))
-                    recruitment.loc[recruitment["id"] == job_id, "status"] = status
-                    tables["recruitment"] = recruitment
-                    save_db(tables)
+                    job_positions = tables.get("job_positions", pd.DataFrame(
+                        columns=["id", "position", "department", "status", "opened_date"]))
+                    job_positions.loc[job_positions["id"] == job_id, "status"] = status
+                    tables["job_positions"] = job_positions
+                    save_db(tables, changed=["job_positions"])
                     st.success("Job status updated!")
                     st.rerun()
         else:
@@ -838,79 +3104,129 @@ def recruitment_management(is_admin=True):
                 applicant_email = st.text_input("Applicant Email", key="job_applicant_email")
                 application_date = st.date_input("Application Date", value=date.today(), key="job_application_date")
                 resume = st.file_uploader("Upload Resume", type=['pdf'], key="job_resume")
-                status = st.selectbox("Status", ["Open", "Closed", "On Hold"], key="job_status")
+                status = st.selectbox("Status", POSITION_STATUSES, key="job_status")
                 if st.form_submit_button("Add Job Opening"):
-                    if not all([position, department, applicant_name, applicant_email]):
-                        st.error("All fields except resume are required!")
+                    if not all([position, department]):
+                        st.error("Position and department are required!")
+                    elif applicant_name and not applicant_email:
+                        st.error("Applicant email is required when adding an applicant!")
                     else:
-                        resume_path = None
-                        if resume:
-                            if not os.path.exists(RESUME_DIR):
-                                os.makedirs(RESUME_DIR)
-                            resume_path = os.path.join(RESUME_DIR, f"{applicant_name}_{application_date}.pdf")
-                            with open(resume_path, "wb") as f:
-                                f.write(resume.read())
                         tables = get_db_connection()
-                        recruitment = tables.get("recruitment", pd.DataFrame(
-                            columns=["id", "position", "department", "status", "applicant_name", "applicant_email",
-                                     "application_date", "resume_path"]))
-                        new_id = recruitment["id"].max() + 1 if not recruitment.empty else 1
-                        new_job = pd.DataFrame([{
-                            "id": new_id,
-                            "position": position,
-                            "department": department,
-                            "status": status,
-                            "applicant_name": applicant_name,
-                            "applicant_email": applicant_email,
-                            "application_date": application_date,
-                            "resume_path": resume_path
-                        }])
-                        tables["recruitment"] = pd.concat([recruitment, new_job], ignore_index=True)
-                        save_db(tables)
-                        st.success("Job opening added!")
-                        st.rerun()
+                        job_positions = tables.get("job_positions", pd.DataFrame(
+                            columns=["id", "position", "department", "status", "opened_date"]))
+                        existing = job_positions[(job_positions["position"] == position) &
+                                                 (job_positions["department"] == department)]
+                        if not existing.empty and not applicant_name:
+                            st.error(f"A {position} opening in {department} already exists. "
+                                     f"Change its status from the Job Openings tab.")
+                        else:
+                            if not existing.empty:
+                                position_id = existing["id"].iloc[0]
+                            else:
+                                position_id = job_positions["id"].max() + 1 if not job_positions.empty else 1
+                                job_positions = pd.concat([job_positions, pd.DataFrame([{
+                                    "id": position_id,
+                                    "position": position,
+                                    "department": department,
+                                    "status": status,
+                                    "opened_date": application_date
+                                }])], ignore_index=True)
+                            tables["job_positions"] = job_positions
+                            notifications = None
+                            if applicant_name:
+                                resume_path = None
+                                if resume:
+                                    if not os.path.exists(entity_path(RESUME_DIR)):
+                                        os.makedirs(entity_path(RESUME_DIR))
+                                    resume_path = entity_path(RESUME_DIR, f"{applicant_name}_{application_date}.pdf")
+                                    with open(resume_path, "wb") as f:
+                                        f.write(resume.read())
+                                applicants = tables.get("applicants", pd.DataFrame(
+                                    columns=["id", "position_id", "applicant_name", "applicant_email",
+                                             "application_date", "stage", "resume_path"]))
+                                stages = tables.get("applicant_stages", pd.DataFrame(
+                                    columns=["id", "applicant_id", "stage", "changed_at"]))
+                                applicant_id = applicants["id"].max() + 1 if not applicants.empty else 1
+                                new_applicant = pd.DataFrame([{
+                                    "id": applicant_id,
+                                    "position_id": position_id,
+                                    "applicant_name": applicant_name,
+                                    "applicant_email": applicant_email,
+                                    "application_date": application_date,
+                                    "stage": "Applied",
+                                    "resume_path": resume_path
+                                }])
+                                new_stage = pd.DataFrame([{
+                                    "id": stages["id"].max() + 1 if not stages.empty else 1,
+                                    "applicant_id": applicant_id,
+                                    "stage": "Applied",
+                                    "changed_at": application_date
+                                }])
+                                tables["applicants"] = pd.concat([applicants, new_applicant], ignore_index=True)
+                                tables["applicant_stages"] = pd.concat([stages, new_stage], ignore_index=True)
+                                notifications = build_applicant_notifications(tables, new_applicant)
+                                if resume_path:
+                                    queue_resume_indexing(applicant_id, resume_path)
+                            save_db(tables, notifications=notifications,
+                                    changed=["job_positions", "applicants", "applicant_stages"])
+                            st.success("Applicant added to the existing job opening!" if not existing.empty
+                                       else "Job opening added!")
+                            st.rerun()
 
         with tab_objects[2]:
             st.subheader("Delete Job Opening")
-            tables = get_db_connection()
-            recruitment = tables.get("recruitment", pd.DataFrame(
-                columns=["id", "position", "department", "status", "applicant_name", "applicant_email",
-                         "application_date", "resume_path"]))
-            recruitment = recruitment.sort_values("application_date", ascending=False)
-            if not recruitment.empty:
+            pipeline = get_recruitment_pipeline()
+            positions = pipeline["positions"]
+            if not positions.empty:
+                position_labels = dict(zip(positions["id"],
+                                           "Job " + positions["id"].astype(str) + " - " +
+                                           positions["position"].astype(str) + " - " +
+                                           positions["department"].astype(str)))
                 col1, col2 = st.columns([3, 1])
                 with col1:
                     job_to_delete = st.selectbox(
                         "Select Job Opening to Delete",
-                        options=recruitment["id"].tolist(),
-                        format_func=lambda
-                            x: f"Job {x} - {recruitment[recruitment['id'] == x]['position'].iloc[0]} - {recruitment[recruitment['id'] == x]['applicant_name'].iloc[0]}",
+                        options=positions["id"].tolist(),
+                        format_func=lambda x: position_labels[x],
                         key="delete_job_select"
                     )
                 with col2:
                     if st.button("Delete Job Opening", key="delete_job_button"):
                         tables = get_db_connection()
-                        recruitment = tables.get("recruitment", pd.DataFrame(
-                            columns=["id", "position", "department", "status", "applicant_name", "applicant_email",
-                                     "application_date", "resume_path"]))
-                        resume_path = recruitment[recruitment["id"] == job_to_delete]["resume_path"].iloc[0] if not \
-                        recruitment[recruitment["id"] == job_to_delete].empty else None
-                        if resume_path and os.path.exists(resume_path):
-                            try:
-                                os.remove(resume_path)
-                            except Exception as e:
-                                st.warning(f"Could not delete resume file: {str(e)}")
-                        recruitment = recruitment[recruitment["id"] != job_to_delete]
-                        tables["recruitment"] = recruitment
-                        save_db(tables)
+                        job_positions = tables.get("job_positions", pd.DataFrame(
+                            columns=["id", "position", "department", "status", "opened_date"]))
+                        applicants = tables.get("applicants", pd.DataFrame(
+                            columns=["id", "position_id", "applicant_name", "applicant_email", "application_date",
+                                     "stage", "resume_path"]))
+                        stages = tables.get("applicant_stages", pd.DataFrame(
+                            columns=["id", "applicant_id", "stage", "changed_at"]))
+                        removed = applicants[applicants["position_id"] == job_to_delete]
+                        for resume_path in removed["resume_path"].dropna():
+                            if os.path.exists(resume_path):
+                                try:
+                                    os.remove(resume_path)
+                                except Exception as e:
+                                    st.warning(f"Could not delete resume file: {str(e)}")
+                        tables["job_positions"] = job_positions[job_positions["id"] != job_to_delete]
+                        tables["applicants"] = applicants[applicants["position_id"] != job_to_delete]
+                        tables["applicant_stages"] = stages[~stages["applicant_id"].isin(removed["id"])]
+                        save_db(tables, changed=["job_positions", "applicants", "applicant_stages"])
+                        remove_resume_documents(removed["id"].tolist())
                         st.success("Job opening deleted successfully!")
                         st.rerun()
             else:
                 st.info("No job openings found.")
 
+        with tab_objects[3]:
+            st.subheader("Recruitment Pipeline")
+            show_recruitment_pipeline()
+
+        with tab_objects[4]:
+            st.subheader("Search Applicants")
+            show_resume_search()
 
-def get_employees_for_payroll(department):
-    tables = get_db_connection()
+
+def get_employees_for_payroll(tables, department):
     employees = tables.get("employees", pd.DataFrame(
         columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
                  "department", "salary", "is_active"]))
@@ -922,31 +3238,84 @@ def get_employees_for_payroll(department):
 
 def calculate_overtime(employee_id, payroll_date):
     tables = get_db_connection()
-    attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
     employees = tables.get("employees", pd.DataFrame(
         columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
                  "department", "salary", "is_active"]))
 
-    payroll_date = pd.to_datetime(payroll_date)
-    thirty_days_ago = payroll_date - pd.Timedelta(days=30)
-    relevant_attendance = attendance[
-        (attendance["employee_id"] == employee_id) & (pd.to_datetime(attendance["check_in"]) >= thirty_days_ago) & (
-            attendance["check_out"].notna())]
-
-    overtime_hours = 0
-    for _, row in relevant_attendance.iterrows():
-        check_in = pd.to_datetime(row["check_in"])
-        check_out = pd.to_datetime(row["check_out"])
-        hours = (check_out - check_in).total_seconds() / 3600
-        if hours > 8:
-            overtime_hours += hours - 8
-
     salary = employees[employees["id"] == employee_id]["salary"].iloc[0] if not employees[
         employees["id"] == employee_id].empty else 0
     if salary == 0:
         return 0
-    hourly_rate = salary / (52 * 40)
-    return overtime_hours * hourly_rate * 1.5
+    overtime = compute_overtime(tables, pd.Series([float(salary)], index=[employee_id]), payroll_date)
+    return overtime["overtime_pay"].iloc[0]
+
+
+def compute_overtime(tables, base_salary, payroll_date):
+    payroll_date = pd.to_datetime(payroll_date)
+    start_date = payroll_date - pd.Timedelta(days=30)
+    end_date = payroll_date + pd.Timedelta(days=1)
+    attendance = read_table_range(tables, "attendance", start_date, end_date)
+    worked = attendance[attendance["employee_id"].isin(base_salary.index) & attendance["check_out"].notna()]
+    roster = build_shift_roster(tables, base_salary.index, start_date, end_date)
+    daily = summarize_attendance_days(worked)
+    daily = daily.assign(day=daily["day"].astype(roster["day"].dtype)).merge(
+        roster[["employee_id", "day", "expected_hours"]], on=["employee_id", "day"], how="left")
+    extra_hours = (daily["worked_hours"] - daily["expected_hours"].fillna(0)).clip(lower=0)
+    overtime = pd.DataFrame(index=base_salary.index)
+    overtime["overtime_hours"] = extra_hours.groupby(daily["employee_id"]).sum().reindex(
+        base_salary.index, fill_value=0.0)
+    weekly_hours = roster[roster["day"] == payroll_date.normalize()].set_index("employee_id")["weekly_hours"]
+    hourly_rate = base_salary / (52 * weekly_hours.reindex(base_salary.index).replace(0, np.nan))
+    overtime["overtime_pay"] = (overtime["overtime_hours"] * hourly_rate * 1.5).fillna(0.0)
+    return overtime
+
+
+def build_compensation_index(records, type_column):
+    index = {}
+    effective_dates = pd.to_datetime(records["effective_date"], errors="coerce").astype("datetime64[ns]").fillna(
+        pd.Timestamp.min)
+    ordered = records.assign(effective_date=effective_dates.values.astype("int64")).sort_values(
+        ["employee_id", type_column, "effective_date", "id"])
+    for employee_id, item_type, effective_date, amount in zip(ordered["employee_id"], ordered[type_column],
+                                                              ordered["effective_date"], ordered["amount"]):
+        dates, amounts = index.setdefault(employee_id, {}).setdefault(item_type, ([], []))
+        dates.append(effective_date)
+        amounts.append(float(amount))
+    return index
+
+
+def get_compensation_index(tables=None):
+    cache = get_index_cache()
+    version = get_data_version()
+    if tables is None:
+        cached = cache.get("compensation")
+        if cached and cached["version"] == version:
+            return cached
+        tables = get_db_connection()
+    else:
+        version = None
+    allowances = tables.get("payroll_allowances",
+                            pd.DataFrame(columns=["id", "employee_id", "allowance_type", "amount", "effective_date"]))
+    deductions = tables.get("payroll_deductions",
+                            pd.DataFrame(columns=["id", "employee_id", "deduction_type", "amount", "effective_date"]))
+    compensation_index = {
+        "allowances": build_compensation_index(allowances, "allowance_type"),
+        "deductions": build_compensation_index(deductions, "deduction_type"),
+        "version": version
+    }
+    if version is not None:
+        cache["compensation"] = compensation_index
+    return compensation_index
+
+
+def get_compensation_in_force(index, employee_id, as_of):
+    as_of = pd.Timestamp(as_of).value
+    items = []
+    for item_type, (dates, amounts) in index.get(employee_id, {}).items():
+        position = bisect_right(dates, as_of)
+        if position:
+            items.append((item_type, amounts[position - 1]))
+    return items
 
 
 def calculate_gross_pay(employee_id, payroll_date):
@@ -954,88 +3323,253 @@ def calculate_gross_pay(employee_id, payroll_date):
     employees = tables.get("employees", pd.DataFrame(
         columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
                  "department", "salary", "is_active"]))
-    allowances = tables.get("payroll_allowances",
-                            pd.DataFrame(columns=["id", "employee_id", "allowance_type", "amount", "effective_date"]))
 
     base_salary = employees[employees["id"] == employee_id]["salary"].iloc[0] if not employees[
         employees["id"] == employee_id].empty else 0
-    relevant_allowances = allowances[(allowances["employee_id"] == employee_id) & (
-                pd.to_datetime(allowances["effective_date"]) <= pd.to_datetime(payroll_date))]
-    allowances_total = relevant_allowances["amount"].sum() if not relevant_allowances.empty else 0
+    allowances_in_force = get_compensation_in_force(get_compensation_index()["allowances"], employee_id,
+                                                    payroll_date)
+    allowances_total = sum(amount for _, amount in allowances_in_force)
     overtime_pay = calculate_overtime(employee_id, payroll_date)
     return base_salary + allowances_total + overtime_pay
 
 
-def calculate_deductions(employee_id, gross_pay):
+def load_tax_config():
+    config_path = entity_path(TAX_CONFIG_FILE)
+    if not os.path.exists(config_path):
+        return DEFAULT_TAX_CONFIG
+    try:
+        with open(config_path, "r") as f:
+            return {**DEFAULT_TAX_CONFIG, **json.load(f)}
+    except Exception as e:
+        st.error(f"Error reading {TAX_CONFIG_FILE}, using default tax tables: {str(e)}")
+        return DEFAULT_TAX_CONFIG
+
+
+def get_tax_options(config=None):
+    if config is None:
+        config = load_tax_config()
+    regimes = sorted({regime for slabs in config["income_tax"].values() for regime in slabs})
+    return regimes, sorted(config["professional_tax"])
+
+
+def update_employee_tax_settings(employee_id, tax_regime, state):
     tables = get_db_connection()
-    deductions = tables.get("payroll_deductions",
-                            pd.DataFrame(columns=["id", "employee_id", "deduction_type", "amount", "effective_date"]))
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active", "tax_regime", "state"]))
+    for column in ["tax_regime", "state"]:
+        employees[column] = employees[column].astype(object) if column in employees.columns else None
+    employees.loc[employees["id"] == employee_id, ["tax_regime", "state"]] = [tax_regime, state]
+    tables["employees"] = employees
+    return save_db(tables, changed=["employees"])
 
-    fixed_deductions = deductions[deductions["employee_id"] == employee_id]["amount"].sum() if not deductions[
-        deductions["employee_id"] == employee_id].empty else 0
 
-    annual_salary = gross_pay * 12
-    if annual_salary <= 250000:
-        income_tax = 0
-    elif annual_salary <= 500000:
-        income_tax = (annual_salary - 250000) * 0.05
-    elif annual_salary <= 1000000:
-        income_tax = 12500 + (annual_salary - 500000) * 0.20
-    else:
-        income_tax = 112500 + (annual_salary - 1000000) * 0.30
-    monthly_tax = income_tax / 12
+def get_financial_year(dates):
+    dates = pd.to_datetime(pd.Series(dates))
+    start_year = dates.dt.year - (dates.dt.month < 4).astype(int)
+    return start_year.astype(str) + "-" + ((start_year + 1) % 100).astype(str).str.zfill(2)
 
-    provident_fund = gross_pay * 0.12
-    professional_tax = 200
-    total_deductions = fixed_deductions + monthly_tax + provident_fund + professional_tax
-    return total_deductions
 
+def get_financial_quarter(dates):
+    return "Q" + (((pd.to_datetime(pd.Series(dates)).dt.month - 4) % 12) // 3 + 1).astype(str)
 
-def process_payroll(payroll_date, department):
+
+def resolve_slab_table(tables_by_year, financial_year):
+    years = sorted(tables_by_year)
+    eligible = [year for year in years if year <= financial_year]
+    return tables_by_year[eligible[-1] if eligible else years[0]]
+
+
+def evaluate_slabs(amounts, slabs, progressive=True):
+    thresholds = np.array([threshold for threshold, _ in slabs], dtype=float)
+    values = np.array([value for _, value in slabs], dtype=float)
+    position = np.clip(np.searchsorted(thresholds, amounts, side="left") - 1, 0, None)
+    if not progressive:
+        return values[position], position
+    base = np.concatenate([[0.0], np.cumsum(np.diff(thresholds) * values[:-1])])
+    return base[position] + (amounts - thresholds[position]) * values[position], position
+
+
+def format_indian_amount(amount):
+    digits = str(int(amount))
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    groups = [head[max(end - 2, 0):end] for end in range(len(head), 0, -2)][::-1]
+    return ",".join(groups + [tail])
+
+
+def get_slab_labels(slabs):
+    labels = []
+    for position, (threshold, rate) in enumerate(slabs):
+        if position == len(slabs) - 1:
+            labels.append(f"Above ₹{format_indian_amount(threshold)} ({rate:.0%})")
+        elif position == 0:
+            labels.append(f"Up to ₹{format_indian_amount(slabs[1][0])} ({rate:.0%})")
+        else:
+            labels.append(f"₹{format_indian_amount(threshold + 1)} - ₹{format_indian_amount(slabs[position + 1][0])} "
+                          f"({rate:.0%})")
+    return np.array(labels, dtype=object)
+
+
+def compute_statutory_deductions(gross_pay, payroll_dates, regimes=None, states=None, config=None):
+    if config is None:
+        config = load_tax_config()
+    gross_pay = np.asarray(gross_pay, dtype=float)
+    financial_years = get_financial_year(payroll_dates).to_numpy()
+    if len(financial_years) == 1:
+        financial_years = np.repeat(financial_years, len(gross_pay))
+    regimes = pd.Series(regimes, dtype=object).fillna(config["default_regime"]).to_numpy() if regimes is not None \
+        else np.full(len(gross_pay), config["default_regime"], dtype=object)
+    states = pd.Series(states, dtype=object).fillna(config["default_state"]).to_numpy() if states is not None \
+        else np.full(len(gross_pay), config["default_state"], dtype=object)
+
+    income_tax = np.zeros(len(gross_pay))
+    tax_slab = np.empty(len(gross_pay), dtype=object)
+    for financial_year, regime in set(zip(financial_years, regimes)):
+        mask = (financial_years == financial_year) & (regimes == regime)
+        slabs = resolve_slab_table(config["income_tax"], financial_year).get(regime)
+        if slabs is None:
+            slabs = resolve_slab_table(config["income_tax"], financial_year)[config["default_regime"]]
+        annual_tax, position = evaluate_slabs(gross_pay[mask] * 12, slabs)
+        income_tax[mask] = annual_tax / 12
+        tax_slab[mask] = get_slab_labels(slabs)[position]
+
+    professional_tax = np.zeros(len(gross_pay))
+    for state in set(states):
+        mask = states == state
+        slabs = config["professional_tax"].get(state, config["professional_tax"][config["default_state"]])
+        professional_tax[mask] = evaluate_slabs(gross_pay[mask], slabs, progressive=False)[0]
+
+    return pd.DataFrame({
+        "financial_year": financial_years,
+        "tax_regime": regimes,
+        "income_tax": income_tax,
+        "tax_slab": tax_slab,
+        "provident_fund": gross_pay * config["provident_fund_rate"],
+        "professional_tax": professional_tax
+    })
+
+
+def build_tds_summary(version):
+    cache = get_report_cache()
+    cached = cache.get("tds_summary")
+    if cached and cached["version"] == version:
+        return cached
     tables = get_db_connection()
+    payroll_transactions = read_table_range(tables, "payroll_transactions")
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"])).drop_duplicates("id").set_index("id")
+
+    periods = payroll_transactions.assign(
+        period=pd.to_datetime(payroll_transactions["transaction_date"]).dt.to_period("M").dt.to_timestamp(),
+        gross_pay=payroll_transactions["gross_pay"].astype(float)
+    ).groupby(["employee_id", "period"], as_index=False)["gross_pay"].sum()
+    statutory = compute_statutory_deductions(
+        periods["gross_pay"], periods["period"],
+        periods["employee_id"].map(employees["tax_regime"]) if "tax_regime" in employees.columns else None,
+        periods["employee_id"].map(employees["state"]) if "state" in employees.columns else None)
+    periods = pd.concat([periods, statutory.drop(columns="tax_slab")], axis=1)
+    periods["quarter"] = get_financial_quarter(periods["period"])
+
+    quarterly = periods.groupby(["financial_year", "quarter", "employee_id"], as_index=False).agg(
+        gross_pay=("gross_pay", "sum"), tds=("income_tax", "sum"), provident_fund=("provident_fund", "sum"),
+        professional_tax=("professional_tax", "sum"), months=("period", "nunique"))
+    form16 = quarterly.pivot_table(index=["financial_year", "employee_id"], columns="quarter", values="tds",
+                                   aggfunc="sum", fill_value=0.0).reindex(
+        columns=["Q1", "Q2", "Q3", "Q4"], fill_value=0.0).add_prefix("tds_").reset_index()
+    totals = quarterly.groupby(["financial_year", "employee_id"], as_index=False)[
+        ["gross_pay", "tds", "provident_fund", "professional_tax"]].sum()
+    form16 = totals.merge(form16, on=["financial_year", "employee_id"])
+    for frame in [quarterly, form16]:
+        frame["employee_code"] = frame["employee_id"].map(employees["employee_id"])
+        frame["name"] = frame["employee_id"].map(
+            employees["first_name"].astype(str) + " " + employees["last_name"].astype(str))
+    summary = {
+        "version": version,
+        "quarterly": quarterly.round(2),
+        "quarter_totals": quarterly.groupby(["financial_year", "quarter"], as_index=False).agg(
+            employees=("employee_id", "nunique"), gross_pay=("gross_pay", "sum"), tds=("tds", "sum"),
+            provident_fund=("provident_fund", "sum"), professional_tax=("professional_tax", "sum")).round(2),
+        "form16": form16.round(2)
+    }
+    cache["tds_summary"] = summary
+    return summary
+
+
+def calculate_deductions(employee_id, gross_pay, payroll_date=None):
+    if payroll_date is None:
+        payroll_date = date.today()
+    deductions_in_force = get_compensation_in_force(get_compensation_index()["deductions"], employee_id,
+                                                    payroll_date)
+    fixed_deductions = sum(amount for _, amount in deductions_in_force)
+
+    statutory = compute_statutory_deductions([gross_pay], [payroll_date]).iloc[0]
+    total_deductions = fixed_deductions + statutory["income_tax"] + statutory["provident_fund"] + statutory[
+        "professional_tax"]
+    return total_deductions
+
+
+def calculate_income_tax(gross_pay, payroll_date=None):
+    if payroll_date is None:
+        payroll_date = date.today()
+    statutory = compute_statutory_deductions([gross_pay], [payroll_date]).iloc[0]
+    return statutory["income_tax"], statutory["tax_slab"]
+
+
+def build_payroll_run(tables, payroll_date, department):
     payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
         columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
                  "created_at"]))
-    employees = get_employees_for_payroll(department)
+    employees = get_employees_for_payroll(tables, department)
     if not employees:
+        return None
+    breakdown = compute_payroll_breakdown(tables, [employee["id"] for employee in employees], payroll_date)
+    start_id = get_next_id("payroll_transactions", payroll_transactions)
+    new_transactions_df = pd.DataFrame({
+        "id": range(start_id, start_id + len(breakdown)),
+        "employee_id": breakdown.index.to_numpy(),
+        "transaction_date": payroll_date,
+        "gross_pay": breakdown["gross_pay"].to_numpy(),
+        "net_pay": breakdown["net_pay"].to_numpy(),
+        "payment_method": "direct_deposit",
+        "status": "pending",
+        "created_at": datetime.now(),
+        "transaction_type": "regular",
+        "breakdown": [serialize_payslip_breakdown(row) for row in breakdown.to_dict("records")]
+    })
+    tables["payroll_transactions"] = pd.concat([payroll_transactions, new_transactions_df], ignore_index=True)
+    return new_transactions_df
+
+
+def run_payroll(payroll_date, department):
+    tables = get_db_connection()
+    new_transactions = build_payroll_run(tables, payroll_date, department)
+    if new_transactions is None:
+        return None, False
+    saved = save_db(tables, notifications=build_payroll_notifications(tables, new_transactions),
+                    changed=["payroll_transactions"])
+    return new_transactions, saved
+
+
+def process_payroll(payroll_date, department):
+    new_transactions, saved = run_payroll(payroll_date, department)
+    if new_transactions is None:
         st.error("No employees found for the selected department!")
         return
-    new_transactions = []
-    for employee in employees:
-        gross_pay = calculate_gross_pay(employee["id"], payroll_date)
-        deductions = calculate_deductions(employee["id"], gross_pay)
-        net_pay = gross_pay - deductions
-        new_id = payroll_transactions["id"].max() + 1 if not payroll_transactions.empty else 1
-        new_transactions.append({
-            "id": new_id,
-            "employee_id": employee["id"],
-            "transaction_date": payroll_date,
-            "gross_pay": gross_pay,
-            "net_pay": net_pay,
-            "payment_method": "direct_deposit",
-            "status": "pending",
-            "created_at": datetime.now()
-        })
-    if new_transactions:
-        new_transactions_df = pd.DataFrame(new_transactions)
-        tables["payroll_transactions"] = pd.concat([payroll_transactions, new_transactions_df], ignore_index=True)
-        save_db(tables)
-        st.success("Payroll processed successfully!")
-        show_payroll_summary(payroll_date)
+    if not saved:
+        return
+    st.success("Payroll processed successfully!")
+    show_payroll_summary(payroll_date)
 
 
 def show_payroll_summary(payroll_date):
     tables = get_db_connection()
-    payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
-        columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
-                 "created_at"]))
-    employees = tables.get("employees", pd.DataFrame(
-        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                 "department", "salary", "is_active"]))
+    payroll_transactions = read_table_range(tables, "payroll_transactions", payroll_date, payroll_date)
 
-    summary = payroll_transactions[
-        pd.to_datetime(payroll_transactions["transaction_date"]) == pd.to_datetime(payroll_date)].merge(
-        employees[["id", "department"]], left_on="employee_id", right_on="id", how="left"
+    summary = attach_employee_details(payroll_transactions[
+        pd.to_datetime(payroll_transactions["transaction_date"]) == pd.to_datetime(payroll_date)], ["department"]
     ).groupby("department").agg({
         "employee_id": "count",
         "gross_pay": "sum",
@@ -1059,6 +3593,443 @@ def show_payroll_summary(payroll_date):
         st.info("No payroll data available for this date.")
 
 
+def compute_payroll_breakdown(tables, employee_ids, payroll_date, compensation_index=None):
+    employees = tables.get("employees", pd.DataFrame(
+        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                 "department", "salary", "is_active"]))
+    if compensation_index is None:
+        compensation_index = get_compensation_index(tables)
+
+    payroll_date = pd.to_datetime(payroll_date)
+    tax_columns = [column for column in ["tax_regime", "state"] if column in employees.columns]
+    breakdown = employees[employees["id"].isin(employee_ids)].drop_duplicates("id").set_index("id")[
+        ["employee_id", "first_name", "last_name", "department", "job_title", "salary"] + tax_columns].rename(
+        columns={"salary": "base_salary"})
+    breakdown["base_salary"] = pd.to_numeric(breakdown["base_salary"], errors="coerce").fillna(0.0)
+
+    breakdown["allowances"] = [
+        get_compensation_in_force(compensation_index["allowances"], employee_id, payroll_date)
+        for employee_id in breakdown.index]
+    breakdown["deductions"] = [
+        get_compensation_in_force(compensation_index["deductions"], employee_id, payroll_date)
+        for employee_id in breakdown.index]
+    breakdown["allowances_total"] = [sum(amount for _, amount in items) for items in breakdown["allowances"]]
+
+    overtime = compute_overtime(tables, breakdown["base_salary"], payroll_date)
+    breakdown["overtime_hours"] = overtime["overtime_hours"]
+    breakdown["overtime_pay"] = overtime["overtime_pay"]
+    breakdown["gross_pay"] = breakdown["base_salary"] + breakdown["allowances_total"] + breakdown["overtime_pay"]
+
+    breakdown["fixed_deductions"] = [sum(amount for _, amount in items) for items in breakdown["deductions"]]
+    statutory = compute_statutory_deductions(breakdown["gross_pay"], [payroll_date],
+                                             breakdown.get("tax_regime"), breakdown.get("state"))
+    for column in ["tax_regime", "income_tax", "tax_slab", "provident_fund", "professional_tax"]:
+        breakdown[column] = statutory[column].to_numpy()
+    breakdown["total_deductions"] = breakdown["fixed_deductions"] + breakdown["income_tax"] + breakdown[
+        "provident_fund"] + breakdown["professional_tax"]
+    breakdown["net_pay"] = breakdown["gross_pay"] - breakdown["total_deductions"]
+    return breakdown
+
+
+def serialize_payslip_breakdown(row):
+    return json.dumps({field: row[field] for field in PAYSLIP_FIELDS},
+                      default=lambda value: value.item() if isinstance(value, np.generic) else str(value))
+
+
+def build_payslips(payroll_date, department):
+    tables = get_db_connection()
+    payroll_transactions = read_table_range(tables, "payroll_transactions", payroll_date, payroll_date)
+    payroll_transactions = payroll_transactions[
+        pd.to_datetime(payroll_transactions["transaction_date"]) == pd.to_datetime(payroll_date)]
+    if payroll_transactions.empty:
+        return [], []
+    for column in ["transaction_type", "breakdown"]:
+        if column not in payroll_transactions.columns:
+            payroll_transactions[column] = None
+    transaction_types = payroll_transactions["transaction_type"].fillna("regular")
+    run = payroll_transactions[transaction_types == "regular"]
+    adjustments = payroll_transactions[transaction_types != "regular"]
+
+    legacy = run[run["breakdown"].isna()]
+    recomputed = compute_payroll_breakdown(tables, legacy["employee_id"].unique(), payroll_date,
+                                           get_compensation_index())
+
+    payslips = {}
+    skipped = []
+    for transaction in run.to_dict("records"):
+        if isinstance(transaction["breakdown"], str):
+            payslip = json.loads(transaction["breakdown"])
+        elif transaction["employee_id"] in recomputed.index:
+            payslip = recomputed.loc[transaction["employee_id"]].to_dict()
+            if not (np.isclose(payslip["gross_pay"], transaction["gross_pay"]) and
+                    np.isclose(payslip["net_pay"], transaction["net_pay"])):
+                skipped.append(int(transaction["id"]))
+                continue
+        else:
+            skipped.append(int(transaction["id"]))
+            continue
+        payslip.update({
+            "transaction_id": int(transaction["id"]),
+            "gross_pay": float(transaction["gross_pay"]),
+            "net_pay": float(transaction["net_pay"]),
+            "payment_method": transaction["payment_method"],
+            "adjustments": []
+        })
+        payslips[transaction["employee_id"]] = payslip
+
+    directory = get_employee_directory()
+    for transaction in adjustments.to_dict("records"):
+        payslip = payslips.get(transaction["employee_id"])
+        if payslip is None:
+            if transaction["employee_id"] not in directory.index:
+                skipped.append(int(transaction["id"]))
+                continue
+            payslip = directory.loc[transaction["employee_id"]].to_dict()
+            payslip.update({
+                "base_salary": 0.0, "allowances": [], "overtime_hours": 0.0,
+                "overtime_pay": 0.0, "tax_slab": "-", "income_tax": 0.0, "provident_fund": 0.0,
+                "professional_tax": 0.0, "deductions": [], "total_deductions": 0.0, "gross_pay": 0.0,
+                "net_pay": 0.0, "transaction_id": int(transaction["id"]),
+                "payment_method": transaction["payment_method"], "adjustments": []
+            })
+            payslips[transaction["employee_id"]] = payslip
+        gross_pay = float(transaction["gross_pay"])
+        net_pay = float(transaction["net_pay"])
+        label = str(transaction["transaction_type"]).title()
+        if pd.notna(transaction.get("period_date")):
+            label += f" for {pd.Timestamp(transaction['period_date']):%b %Y}"
+        payslip["adjustments"].append((label, gross_pay, gross_pay - net_pay))
+        payslip["gross_pay"] += gross_pay
+        payslip["net_pay"] += net_pay
+        payslip["total_deductions"] += gross_pay - net_pay
+
+    payroll_date = pd.to_datetime(payroll_date).strftime("%Y-%m-%d")
+    result = []
+    for payslip in payslips.values():
+        if department != "All" and payslip["department"] != department:
+            continue
+        payslip["payroll_date"] = payroll_date
+        result.append(payslip)
+    return result, skipped
+
+
+def build_pdf(lines):
+    content = ["BT", "/F1 10 Tf", "14 TL", "50 790 Td"]
+    for line in lines:
+        text = line.replace("₹", "Rs. ").encode("latin-1", "replace").decode("latin-1")
+        text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        content.append(f"({text}) Tj T*")
+    content.append("ET")
+    stream = zlib.compress("\n".join(content).encode("latin-1"))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> "
+        b"/Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+
+def render_payslip_pdf(payslip):
+    lines = [
+        "HR Management System - Payslip",
+        f"Pay Date: {payslip['payroll_date']}",
+        "",
+        f"Employee: {payslip['first_name']} {payslip['last_name']} ({payslip['employee_id']})",
+        f"Department: {payslip['department']}",
+        f"Job Title: {payslip['job_title']}",
+        "",
+        "EARNINGS",
+        f"Base Salary: ₹{payslip['base_salary']:,.2f}"
+    ]
+    for allowance_type, amount in payslip["allowances"]:
+        lines.append(f"Allowance - {allowance_type}: ₹{amount:,.2f}")
+    lines.append(f"Overtime ({payslip['overtime_hours']:.2f} hrs): ₹{payslip['overtime_pay']:,.2f}")
+    for label, gross_pay, _ in payslip["adjustments"]:
+        lines.append(f"{label}: ₹{gross_pay:,.2f}")
+    lines += [
+        f"Gross Pay: ₹{payslip['gross_pay']:,.2f}",
+        "",
+        "DEDUCTIONS",
+        f"Income Tax - {payslip['tax_slab']}: ₹{payslip['income_tax']:,.2f}",
+        f"Provident Fund: ₹{payslip['provident_fund']:,.2f}",
+        f"Professional Tax: ₹{payslip['professional_tax']:,.2f}"
+    ]
+    for deduction_type, amount in payslip["deductions"]:
+        lines.append(f"Deduction - {deduction_type}: ₹{amount:,.2f}")
+    for label, _, amount in payslip["adjustments"]:
+        lines.append(f"Deductions on {label}: ₹{amount:,.2f}")
+    lines += [
+        f"Total Deductions: ₹{payslip['total_deductions']:,.2f}",
+        "",
+        f"Net Pay: ₹{payslip['net_pay']:,.2f}",
+        f"Payment Method: {payslip['payment_method']}"
+    ]
+    file_name = f"{payslip['employee_id']}_{payslip['first_name']}_{payslip['last_name']}_{payslip['payroll_date']}.pdf"
+    return file_name, build_pdf(lines)
+
+
+def generate_payslips(payroll_date, department):
+    payslips, skipped = build_payslips(payroll_date, department)
+    if not payslips:
+        return None, 0, skipped
+    if not os.path.exists(entity_path(PAYSLIP_DIR)):
+        os.makedirs(entity_path(PAYSLIP_DIR))
+    zip_path = entity_path(PAYSLIP_DIR,
+                           f"payslips_{pd.to_datetime(payroll_date).strftime('%Y-%m-%d')}_{department}.zip")
+    with ThreadPoolExecutor() as executor, zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for file_name, pdf_data in executor.map(render_payslip_pdf, payslips):
+            archive.writestr(file_name, pdf_data)
+    return zip_path, len(payslips), skipped
+
+
+def get_payroll_period_index():
+    cache = get_index_cache()
+    version = get_data_version()
+    cached = cache.get("payroll_periods")
+    if cached and cached["version"] == version:
+        return cached["index"]
+    payroll_transactions = read_table_range(get_db_connection(), "payroll_transactions")
+    period_dates = pd.to_datetime(payroll_transactions["transaction_date"])
+    if "period_date" in payroll_transactions.columns:
+        period_dates = pd.to_datetime(payroll_transactions["period_date"]).fillna(period_dates)
+    periods = payroll_transactions.assign(
+        period=period_dates.astype("datetime64[ns]").values.astype("int64")).groupby(
+        ["employee_id", "period"], as_index=False)[["gross_pay", "net_pay"]].sum()
+    index = {}
+    for employee_id, period, gross_pay, net_pay in zip(periods["employee_id"], periods["period"],
+                                                       periods["gross_pay"], periods["net_pay"]):
+        dates, gross, net = index.setdefault(employee_id, ([], [], []))
+        dates.append(period)
+        gross.append(float(gross_pay))
+        net.append(float(net_pay))
+    cache["payroll_periods"] = {"version": version, "index": index}
+    return index
+
+
+def find_affected_periods(changes):
+    period_index = get_payroll_period_index()
+    affected = {}
+    for employee_id, start_date, end_date in changes:
+        dates, gross, net = period_index.get(employee_id, ([], [], []))
+        first = bisect_left(dates, pd.Timestamp(start_date).value)
+        last = bisect_right(dates, pd.Timestamp(end_date).value) if end_date is not None else len(dates)
+        for position in range(first, last):
+            affected[(employee_id, dates[position])] = (gross[position], net[position])
+    return affected
+
+
+def recalculate_payroll(changes):
+    affected = find_affected_periods(changes)
+    if not affected:
+        return pd.DataFrame(
+            columns=["employee_id", "period", "original_gross", "recalculated_gross", "gross_difference",
+                     "original_net", "recalculated_net", "net_difference"])
+    tables = get_db_connection()
+    compensation_index = get_compensation_index()
+    employees_by_period = {}
+    for employee_id, period in affected:
+        employees_by_period.setdefault(period, []).append(employee_id)
+
+    diffs = []
+    for period, employee_ids in sorted(employees_by_period.items()):
+        period_date = pd.Timestamp(period)
+        breakdown = compute_payroll_breakdown(tables, employee_ids, period_date, compensation_index)
+        for employee_id in employee_ids:
+            original_gross, original_net = affected[(employee_id, period)]
+            recalculated_gross = float(breakdown.loc[employee_id, "gross_pay"]) if employee_id in breakdown.index else 0.0
+            recalculated_net = float(breakdown.loc[employee_id, "net_pay"]) if employee_id in breakdown.index else 0.0
+            diffs.append({
+                "employee_id": employee_id,
+                "period": period_date,
+                "original_gross": original_gross,
+                "recalculated_gross": recalculated_gross,
+                "gross_difference": round(recalculated_gross - original_gross, 2),
+                "original_net": original_net,
+                "recalculated_net": recalculated_net,
+                "net_difference": round(recalculated_net - original_net, 2)
+            })
+    return pd.DataFrame(diffs)
+
+
+def post_payroll_adjustments(diffs, payment_date):
+    adjustments = diffs[(diffs["gross_difference"] != 0) | (diffs["net_difference"] != 0)]
+    if adjustments.empty:
+        return 0
+    tables = get_db_connection()
+    payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
+        columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
+                 "created_at", "transaction_type", "period_date"]))
+    start_id = get_next_id("payroll_transactions", payroll_transactions)
+    new_transactions = pd.DataFrame({
+        "id": range(start_id, start_id + len(adjustments)),
+        "employee_id": adjustments["employee_id"].values,
+        "transaction_date": pd.Timestamp(payment_date),
+        "period_date": adjustments["period"].values,
+        "gross_pay": adjustments["gross_difference"].values,
+        "net_pay": adjustments["net_difference"].values,
+        "payment_method": "direct_deposit",
+        "status": "pending",
+        "created_at": datetime.now(),
+        "transaction_type": ["arrears" if net_difference > 0 else "adjustment" for net_difference in
+                             adjustments["net_difference"]]
+    })
+    tables["payroll_transactions"] = pd.concat([payroll_transactions, new_transactions], ignore_index=True)
+    if not save_db(tables, changed=["payroll_transactions"]):
+        return None
+    return len(new_transactions)
+
+
+def format_disbursement_rows(rows, payroll_date):
+    payroll_date = pd.to_datetime(payroll_date)
+    return pd.DataFrame({
+        "payment_mode": (rows["net_pay"] >= RTGS_MINIMUM).map({True: "RTGS", False: "NEFT"}),
+        "amount": rows["net_pay"].round(2).map("{:.2f}".format),
+        "value_date": payroll_date.strftime("%d/%m/%Y"),
+        "beneficiary_name": (rows["first_name"].fillna("") + " " + rows["last_name"].fillna("")).str.strip(),
+        "beneficiary_account": rows["account_number"],
+        "ifsc_code": rows["ifsc_code"],
+        "account_type": rows["account_type"].fillna("Savings"),
+        "reference": "PAY" + payroll_date.strftime("%Y%m%d") + rows["id"].astype(str),
+        "remarks": "Salary " + payroll_date.strftime("%b %Y")
+    })
+
+
+def export_disbursement_file(payroll_date, chunk_size=5000):
+    tables = get_db_connection()
+    payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
+        columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
+                 "created_at"]))
+    bank_details = tables.get("bank_details", pd.DataFrame(
+        columns=["id", "employee_id", "bank_name", "account_number", "ifsc_code", "account_type"]))
+
+    pending = (pd.to_datetime(payroll_transactions["transaction_date"]) == pd.to_datetime(payroll_date)) & (
+            payroll_transactions["payment_method"] == "direct_deposit") & (payroll_transactions["status"] == "pending")
+    run = payroll_transactions.loc[pending, ["id", "employee_id", "net_pay"]]
+    run = run.merge(
+        bank_details[bank_details["employee_id"].isin(run["employee_id"])].drop_duplicates(
+            "employee_id", keep="last")[["employee_id", "bank_name", "account_number", "ifsc_code", "account_type"]],
+        on="employee_id", how="left"
+    ).join(get_employee_directory()[["employee_id", "first_name", "last_name"]].rename(
+        columns={"employee_id": "employee_code"}), on="employee_id")
+    if run.empty:
+        return None, 0, run
+
+    run["account_number"] = run["account_number"].astype(str).str.replace(r"\.0$", "", regex=True).str.strip()
+    run["ifsc_code"] = run["ifsc_code"].astype(str).str.strip().str.upper()
+    run["error"] = ""
+    run.loc[~run["ifsc_code"].str.fullmatch(IFSC_PATTERN), "error"] = "Invalid IFSC code"
+    run.loc[~run["account_number"].str.fullmatch(ACCOUNT_NUMBER_PATTERN), "error"] = "Invalid account number"
+    run.loc[run["bank_name"].isna(), "error"] = "Missing bank details"
+    run.loc[run["net_pay"] <= 0, "error"] = "Non-positive net pay"
+    valid = run[run["error"] == ""]
+    rejected = run[run["error"] != ""][["id", "employee_code", "first_name", "last_name", "net_pay", "error"]]
+    if valid.empty:
+        return None, 0, rejected
+
+    if not os.path.exists(entity_path(DISBURSEMENT_DIR)):
+        os.makedirs(entity_path(DISBURSEMENT_DIR))
+    file_path = entity_path(DISBURSEMENT_DIR,
+                            f"disbursement_{pd.to_datetime(payroll_date).strftime('%Y%m%d')}_"
+                            f"{datetime.now().strftime('%H%M%S')}.csv")
+    with open(file_path, "w", newline="") as f:
+        f.write("payment_mode,amount,value_date,beneficiary_name,beneficiary_account,ifsc_code,account_type,"
+                "reference,remarks\n")
+        for start in range(0, len(valid), chunk_size):
+            format_disbursement_rows(valid.iloc[start:start + chunk_size], payroll_date).to_csv(
+                f, header=False, index=False)
+        f.write(f"TRAILER,{valid['net_pay'].round(2).sum():.2f},{len(valid)}\n")
+
+    payroll_transactions.loc[payroll_transactions["id"].isin(valid["id"]), "status"] = "exported"
+    tables["payroll_transactions"] = payroll_transactions
+    save_db(tables, changed=["payroll_transactions"])
+    return file_path, len(valid), rejected
+
+
+def show_bank_disbursement():
+    col1, col2 = st.columns(2)
+    with col1:
+        disbursement_date = st.date_input("Payroll Date", value=date.today(), key="disbursement_date")
+    if st.button("Export Bank File", key="export_disbursement_button"):
+        file_path, exported, rejected = export_disbursement_file(disbursement_date)
+        if file_path:
+            st.success(f"Exported {exported} payments. Transactions marked as exported.")
+            with open(file_path, "rb") as f:
+                st.download_button(
+                    label="Download Bank File",
+                    data=f,
+                    file_name=os.path.basename(file_path),
+                    mime="text/csv",
+                    key="download_disbursement_button"
+                )
+        else:
+            st.info("No pending direct deposit transactions ready for export on this date.")
+        if not rejected.empty:
+            st.warning(f"{len(rejected)} payments were not exported:")
+            st.dataframe(
+                rejected.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                use_container_width=True
+            )
+
+
+def show_retro_recalculation():
+    st.write("Recalculate past payroll periods after a correction to salary, allowances, deductions or attendance.")
+    st.caption("Base salary has no effective-dated history: a Salary correction recalculates every period from the "
+               "effective date onward with the employee's current salary.")
+    employees = get_active_employees()
+    if not employees:
+        st.info("No active employees found.")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        change_type = st.selectbox("Corrected Input", ["Salary", "Allowance", "Deduction", "Attendance"],
+                                   key="retro_change_type")
+        selected_employees = st.multiselect(
+            "Employees",
+            options=employees,
+            format_func=lambda x: f"{x[1]} {x[2]}",
+            key="retro_employees"
+        )
+    with col2:
+        effective_date = st.date_input("Effective From", value=date.today(), key="retro_effective_date")
+    if change_type == "Attendance":
+        end_date = pd.Timestamp(effective_date) + pd.Timedelta(days=30)
+    else:
+        end_date = None
+    changes = [(employee[0], effective_date, end_date) for employee in selected_employees]
+
+    if st.button("Preview Recalculation", key="retro_preview_button"):
+        st.session_state.retro_diffs = recalculate_payroll(changes)
+    diffs = st.session_state.get("retro_diffs")
+    if diffs is not None:
+        if diffs.empty:
+            st.info("No payroll periods are affected by this change.")
+        else:
+            st.dataframe(
+                diffs.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                use_container_width=True
+            )
+            payment_date = st.date_input("Pay With Payroll Date", value=date.today(), key="retro_payment_date")
+            if st.button("Post Adjustments", key="retro_post_button"):
+                posted = post_payroll_adjustments(diffs, payment_date)
+                if posted is not None:
+                    del st.session_state["retro_diffs"]
+                    st.success(f"Posted {posted} arrears/adjustment transactions for the {payment_date} payroll.")
+                    st.rerun()
+
+
 def show_employee_compensation(employee_id):
     tables = get_db_connection()
     employees = tables.get("employees", pd.DataFrame(
@@ -1073,102 +4044,239 @@ def show_employee_compensation(employee_id):
 
     employee = employees[employees["id"] == employee_id]
     if not employee.empty:
+        as_of = st.date_input("In Force As Of", value=date.today(), key="compensation_as_of")
+        compensation_index = get_compensation_index()
         col1, col2 = st.columns(2)
         with col1:
             st.write("Base Salary:", f"₹{employee['salary'].iloc[0]:,.2f}")
+            allowances_in_force = get_compensation_in_force(compensation_index["allowances"], employee_id, as_of)
+            if allowances_in_force:
+                st.write("Allowances:")
+                st.dataframe(pd.DataFrame(allowances_in_force, columns=["allowance_type", "amount"]))
             employee_allowances = allowances[allowances["employee_id"] == employee_id]
             if not employee_allowances.empty:
-                st.write("Allowances:")
-                st.dataframe(employee_allowances)
+                with st.expander("Allowance History"):
+                    st.dataframe(employee_allowances.sort_values("effective_date", ascending=False))
         with col2:
+            deductions_in_force = get_compensation_in_force(compensation_index["deductions"], employee_id, as_of)
+            if deductions_in_force:
+                st.write("Deductions:")
+                st.dataframe(pd.DataFrame(deductions_in_force, columns=["deduction_type", "amount"]))
             employee_deductions = deductions[deductions["employee_id"] == employee_id]
             if not employee_deductions.empty:
-                st.write("Deductions:")
-                st.dataframe(employee_deductions)
+                with st.expander("Deduction History"):
+                    st.dataframe(employee_deductions.sort_values("effective_date", ascending=False))
             employee_bank_details = bank_details[bank_details["employee_id"] == employee_id]
             if not employee_bank_details.empty:
                 st.write("Bank Details:")
                 st.write(f"Account: {employee_bank_details['account_number'].iloc[0]}")
                 st.write(f"Bank: {employee_bank_details['bank_name'].iloc[0]}")
+        tax_config = load_tax_config()
+        regimes, states = get_tax_options(tax_config)
+        current_regime = employee["tax_regime"].iloc[0] if "tax_regime" in employee.columns else None
+        current_state = employee["state"].iloc[0] if "state" in employee.columns else None
+        current_regime = current_regime if current_regime in regimes else tax_config["default_regime"]
+        current_state = current_state if current_state in states else tax_config["default_state"]
+        with st.form(f"tax_settings_form_{employee_id}"):
+            col1, col2 = st.columns(2)
+            with col1:
+                tax_regime = st.selectbox("Tax Regime", regimes, index=regimes.index(current_regime),
+                                          key=f"tax_regime_{employee_id}")
+            with col2:
+                state = st.selectbox("State (Professional Tax)", states, index=states.index(current_state),
+                                     key=f"tax_state_{employee_id}")
+            if st.form_submit_button("Update Tax Settings"):
+                if update_employee_tax_settings(employee_id, tax_regime, state):
+                    st.success("Tax settings updated successfully!")
     else:
         st.info("No compensation details found.")
 
 
-def generate_payroll_report(report_type):
+def update_payroll_aggregates(state, payroll_transactions):
+    ids = payroll_transactions["id"].to_numpy()
+    gross = payroll_transactions["gross_pay"].to_numpy(dtype=float)
+    net = payroll_transactions["net_pay"].to_numpy(dtype=float)
+    start = 0
+    aggregates = pd.DataFrame(columns=["month", "department", "employee_count", "total_gross", "total_net"])
+    recent = payroll_transactions.iloc[:0]
+    if state:
+        seen = len(state["ids"])
+        if len(ids) >= seen and (ids[:seen] == state["ids"]).all() and (gross[:seen] == state["gross"]).all() and (
+                net[:seen] == state["net"]).all():
+            start = seen
+            aggregates = state["aggregates"]
+            recent = state["recent"]
+
+    new_rows = payroll_transactions.iloc[start:]
+    if not new_rows.empty:
+        new_aggregates = pd.DataFrame({
+            "month": pd.to_datetime(new_rows["transaction_date"]).dt.strftime("%Y-%m"),
+            "department": attach_employee_details(new_rows, ["department"])["department"].fillna("Unassigned"),
+            "employee_count": 1,
+            "total_gross": new_rows["gross_pay"].astype(float),
+            "total_net": new_rows["net_pay"].astype(float)
+        })
+        aggregates = pd.concat([aggregates, new_aggregates], ignore_index=True).groupby(
+            ["month", "department"], as_index=False).sum()
+        recent = pd.concat([new_rows.drop(columns=["breakdown"], errors="ignore"), recent], ignore_index=True)
+        recent = recent.sort_values("transaction_date", ascending=False, kind="stable", key=pd.to_datetime).head(500)
+    return {"ids": ids, "gross": gross, "net": net, "aggregates": aggregates, "recent": recent}
+
+
+def get_table_fingerprint(table_name):
+    hashes = get_row_hashes().get(table_name, pd.Series(dtype="uint64"))
+    fingerprint = hashlib.sha1(pd.util.hash_pandas_object(hashes).to_numpy().tobytes())
+    fingerprint.update(json.dumps(load_archive_manifest().get(table_name, {}), sort_keys=True).encode("utf-8"))
+    return fingerprint.hexdigest()
+
+
+def get_report_version(report_type):
+    return tuple(get_table_fingerprint(table_name) for table_name in REPORT_TABLES[report_type])
+
+
+def build_payroll_report(report_type, version):
+    cache = get_report_cache()
+    cached = cache.get(report_type)
+    if cached and cached["version"] == version:
+        return cached
+
     tables = get_db_connection()
-    payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status", "created_at"]))
-    employees = tables.get("employees", pd.DataFrame(columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title", "department", "salary", "is_active"]))
-    deductions = tables.get("payroll_deductions", pd.DataFrame(columns=["id", "employee_id", "deduction_type", "amount", "effective_date"]))
+    payroll_transactions = read_table_range(tables, "payroll_transactions")
+    deductions = tables.get("payroll_deductions",
+                            pd.DataFrame(columns=["id", "employee_id", "deduction_type", "amount", "effective_date"]))
 
     if report_type == "Payroll Summary":
-        data = payroll_transactions.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
-        data = data.sort_values("transaction_date", ascending=False)
-        if not data.empty:
+        state = update_payroll_aggregates(cached.get("state") if cached else None, payroll_transactions)
+        report = {"state": state, "summary": state["aggregates"].sort_values(["month", "department"]),
+                  "data": attach_employee_details(state["recent"])}
+    else:
+        keyword = "tax" if report_type == "Tax Withholding" else "benefit"
+        deduction_types = deductions["deduction_type"].astype(str)
+        unique_types = deduction_types.unique()
+        matching_types = unique_types[pd.Series(unique_types).str.contains(keyword, case=False).to_numpy()]
+        data = attach_employee_details(deductions[deduction_types.isin(matching_types)],
+                                       ["first_name", "last_name", "department"])
+        summary = data.groupby("department", as_index=False)["amount"].sum()
+        report = {"summary": summary, "data": data}
+    report["version"] = version
+    cache[report_type] = report
+    return report
+
+
+def generate_payroll_report(report_type):
+    report = build_payroll_report(report_type, get_report_version(report_type))
+    data = report["data"]
+    summary = report["summary"]
+
+    if report_type == "Payroll Summary":
+        if not summary.empty:
             st.dataframe(
-                data.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                summary.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
                 use_container_width=True,
                 height=400
             )
-            fig = px.bar(data, x="transaction_date", y="gross_pay", title="Payroll Trends (₹)")
+            fig = px.bar(summary, x="month", y="total_gross", color="department", title="Payroll Trends (₹)")
             st.plotly_chart(fig)
+            st.write("Latest Transactions:")
+            st.dataframe(
+                data.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                use_container_width=True,
+                height=400
+            )
         else:
             st.info("No payroll data available.")
     elif report_type == "Tax Withholding":
-        data = deductions[deductions["deduction_type"].str.contains("tax", case=False)].merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
         if not data.empty:
             st.dataframe(
                 data.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
                 use_container_width=True,
                 height=400
             )
+            fig = px.bar(summary, x="department", y="amount", title="Tax Withholding by Department (₹)")
+            st.plotly_chart(fig)
         else:
             st.info("No tax withholding data available.")
     elif report_type == "Benefits Deductions":
-        data = deductions[deductions["deduction_type"].str.contains("benefit", case=False)].merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
         if not data.empty:
             st.dataframe(
                 data.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
                 use_container_width=True,
                 height=400
             )
+            fig = px.bar(summary, x="department", y="amount", title="Benefits Deductions by Department (₹)")
+            st.plotly_chart(fig)
         else:
             st.info("No benefits deductions data available.")
 
 def show_tax_compliance():
     st.write("Tax Compliance Dashboard")
-    st.info("""
-    Current Tax Settings (India):
-    - Income Tax: As per slabs (0% to 30%)
-    - Provident Fund: 12% of gross pay
-    - Professional Tax: ₹200/month
-    - TDS Filing: Quarterly
-    """)
-    st.write("Compliance Checklist:")
-    st.checkbox("TDS Deposited", value=True)
-    st.checkbox("Form 16 Generated", value=True)
-    st.checkbox("Quarterly TDS Returns Filed", value=True)
-    st.checkbox("PF Contributions Deposited", value=True)
+    config = load_tax_config()
+    summary = build_tds_summary(get_data_version())
+    financial_years = sorted(set(summary["quarter_totals"]["financial_year"]) | set(config["income_tax"]),
+                             reverse=True)
+    financial_year = st.selectbox("Financial Year", financial_years, key="tax_financial_year")
+
+    slab_tables = resolve_slab_table(config["income_tax"], financial_year)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("Income Tax Slabs:")
+        slabs = pd.DataFrame([
+            {"regime": regime, "slab": label}
+            for regime, regime_slabs in slab_tables.items() for label in get_slab_labels(regime_slabs)])
+        st.dataframe(slabs.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                     use_container_width=True)
+    with col2:
+        st.write("Statutory Settings:")
+        st.write(f"- Default Regime: {config['default_regime'].title()}")
+        st.write(f"- Provident Fund: {config['provident_fund_rate']:.0%} of gross pay")
+        st.write(f"- Default Professional Tax State: {config['default_state']}")
+        professional_tax = pd.DataFrame([
+            {"state": state, "monthly_gross_above": threshold, "amount": amount}
+            for state, state_slabs in config["professional_tax"].items() for threshold, amount in state_slabs])
+        st.dataframe(professional_tax.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                     use_container_width=True, height=200)
+
+    quarter_totals = summary["quarter_totals"][summary["quarter_totals"]["financial_year"] == financial_year]
+    if quarter_totals.empty:
+        st.info("No payroll transactions found for this financial year.")
+        return
+    st.write("Quarterly TDS:")
+    st.dataframe(quarter_totals.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                 use_container_width=True)
+    fig = px.bar(quarter_totals, x="quarter", y="tds", title=f"TDS by Quarter - FY {financial_year} (₹)")
+    st.plotly_chart(fig)
+
+    quarter = st.selectbox("Quarter", quarter_totals["quarter"].tolist(), key="tax_quarter")
+    quarterly = summary["quarterly"]
+    quarterly = quarterly[(quarterly["financial_year"] == financial_year) & (quarterly["quarter"] == quarter)]
+    st.dataframe(
+        quarterly[["employee_code", "name", "months", "gross_pay", "tds", "provident_fund",
+                   "professional_tax"]].style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+        use_container_width=True,
+        height=300
+    )
+
+    st.write("Form 16 Summary:")
+    form16 = summary["form16"]
+    form16 = form16[form16["financial_year"] == financial_year].drop(columns=["financial_year", "employee_id"])
+    form16 = form16[["employee_code", "name"] + [column for column in form16.columns
+                                                 if column not in ["employee_code", "name"]]]
+    st.dataframe(form16.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
+                 use_container_width=True, height=300)
+    st.download_button(
+        label="Download Form 16 Summary",
+        data=form16.to_csv(index=False).encode("utf-8"),
+        file_name=f"form16_summary_{financial_year}.csv",
+        mime="text/csv",
+        key="download_form16_button"
+    )
 
 
 def payroll_management():
     st.title("Payroll Management")
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(
-        ["Process Payroll", "Employee Compensation", "Payroll Reports", "Tax & Compliance", "Delete Payroll"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
+        ["Process Payroll", "Employee Compensation", "Payroll Reports", "Tax & Compliance", "Delete Payroll",
+         "Payslips", "Retro Recalculation", "Bank Disbursement"])
 
     with tab1:
         st.subheader("Process Payroll")
@@ -1201,6 +4309,9 @@ def payroll_management():
                                    key="report_type")
         if st.button("Generate Report", key="generate_report_button"):
             generate_payroll_report(report_type)
+        export_key = "summary" if report_type == "Payroll Summary" else "data"
+        show_export_controls(lambda: build_payroll_report(report_type, get_report_version(report_type))[export_key],
+                             report_type.lower().replace(" ", "_"), "report_export")
 
     with tab4:
         st.subheader("Tax & Compliance")
@@ -1212,15 +4323,7 @@ def payroll_management():
         payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
             columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
                      "created_at"]))
-        employees = tables.get("employees", pd.DataFrame(
-            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                     "department", "salary", "is_active"]))
-        payroll = payroll_transactions.merge(
-            employees[["id", "first_name", "last_name"]].rename(columns={"id": "employee_id_ref"}),
-            left_on="employee_id",
-            right_on="employee_id_ref",
-            how="left"
-        )
+        payroll = attach_employee_details(payroll_transactions)
         payroll = payroll.sort_values("transaction_date", ascending=False)
         if not payroll.empty:
             if "id" in payroll.columns:
@@ -1241,7 +4344,7 @@ def payroll_management():
                                      "status", "created_at"]))
                         payroll_transactions = payroll_transactions[payroll_transactions["id"] != payroll_to_delete]
                         tables["payroll_transactions"] = payroll_transactions
-                        save_db(tables)
+                        save_db(tables, changed=["payroll_transactions"])
                         st.success("Payroll transaction deleted successfully!")
                         st.rerun()
             else:
@@ -1249,6 +4352,98 @@ def payroll_management():
         else:
             st.info("No payroll transactions found.")
 
+    with tab6:
+        st.subheader("Generate Payslips")
+        col1, col2 = st.columns(2)
+        with col1:
+            payslip_date = st.date_input("Payroll Date", value=date.today(), key="payslip_date")
+        with col2:
+            payslip_department = st.selectbox("Department", ["All"] + get_departments(), key="payslip_department")
+        if st.button("Generate Payslips", key="generate_payslips_button"):
+            with st.spinner("Rendering payslips..."):
+                zip_path, payslip_count, skipped = generate_payslips(payslip_date, payslip_department)
+            if skipped:
+                st.warning(f"Skipped {len(skipped)} payslips whose stored pay no longer matches the recomputed "
+                           f"breakdown (transactions {', '.join(str(transaction_id) for transaction_id in skipped)}).")
+            if zip_path:
+                st.success(f"Generated {payslip_count} payslips.")
+                with open(zip_path, "rb") as f:
+                    st.download_button(
+                        label="Download Payslips",
+                        data=f,
+                        file_name=os.path.basename(zip_path),
+                        mime="application/zip",
+                        key="download_payslips_button"
+                    )
+            else:
+                st.info("No payroll transactions found for this date.")
+
+    with tab7:
+        st.subheader("Retroactive Recalculation")
+        show_retro_recalculation()
+
+    with tab8:
+        st.subheader("Bank Disbursement")
+        show_bank_disbursement()
+
+
+def show_export_controls(source, name, key, start_date=None, end_date=None):
+    col1, col2, col3 = st.columns([2, 1, 2])
+    with col1:
+        file_format = st.selectbox("Export Format", list(EXPORT_FORMATS), key=f"{key}_format")
+    with col2:
+        compress = st.checkbox("Gzip", key=f"{key}_gzip")
+    file_name, mime = get_export_file_name(name, file_format, compress)
+    if isinstance(source, str):
+        row_count = estimate_table_rows(source, start_date, end_date)
+        if row_count > EXPORT_UI_MAX_ROWS:
+            query = {"format": file_format.lower(), "gzip": "true" if compress else None,
+                     "start": start_date and pd.Timestamp(start_date).strftime("%Y-%m-%d"),
+                     "end": end_date and pd.Timestamp(end_date).strftime("%Y-%m-%d")}
+            query = "&".join(f"{param}={value}" for param, value in query.items() if value)
+            with col3:
+                st.info(f"This export has about {row_count:,} rows; browser downloads are held in memory and "
+                        f"limited to {EXPORT_UI_MAX_ROWS:,} rows. Download it from the API instead: "
+                        f"GET /export/{source}?{query}")
+            return
+    data_dir = current_entity_dir.get()
+
+    def build_export():
+        token = current_entity_dir.set(data_dir)
+        try:
+            if isinstance(source, str):
+                chunks = iter_table_chunks(source, start_date, end_date)
+            else:
+                chunks = iter_frame_chunks(source())
+            spool = tempfile.TemporaryFile()
+            for block in stream_export(chunks, file_format, compress, name):
+                spool.write(block)
+            spool.seek(0)
+            return spool
+        finally:
+            current_entity_dir.reset(token)
+
+    with col3:
+        st.download_button(label=f"Export {file_format}", data=build_export, file_name=file_name, mime=mime,
+                           on_click="ignore", key=f"{key}_download")
+
+
+def show_data_export():
+    st.title("Data Export")
+    tables = get_db_connection()
+    table_name = st.selectbox("Table", sorted(name for name in tables if name != "users"), key="export_table")
+    if table_name in PARTITIONED_TABLES:
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input("Start Date", value=None, key="export_start_date")
+        with col2:
+            end_date = st.date_input("End Date", value=None, key="export_end_date")
+        if start_date or end_date:
+            show_export_controls(table_name, f"{table_name}_{start_date or 'start'}_{end_date or 'end'}",
+                                 "table_export", start_date, end_date)
+            return
+    show_export_controls(table_name, table_name, "table_export")
+
 
 def password_vault():
     st.title("Password Vault")
@@ -1267,22 +4462,77 @@ def password_vault():
         st.info("No employee accounts found in the database.")
 
 
+def get_employee_view_sources(tables):
+    return {
+        "employees": (tables.get("employees", pd.DataFrame(
+            columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
+                     "department", "salary", "is_active"])), "id", None),
+        "attendance": (read_table_range(tables, "attendance"), "employee_id", "check_in"),
+        "leave_requests": (tables.get("leave_requests", pd.DataFrame(
+            columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status",
+                     "created_at"])), "employee_id", "created_at"),
+        "performance": (tables.get("performance", pd.DataFrame(
+            columns=["id", "employee_id", "review_date", "rating", "comments"])), "employee_id", "review_date"),
+        "payroll_transactions": (read_table_range(tables, "payroll_transactions"), "employee_id", "transaction_date")
+    }
+
+
+def build_employee_views():
+    views = {}
+    for table_name, (df, key_column, sort_column) in get_employee_view_sources(get_db_connection()).items():
+        if sort_column:
+            df = df.assign(**{sort_column: pd.to_datetime(df[sort_column], errors="coerce")}).sort_values(
+                sort_column, ascending=False, kind="stable")
+        views[table_name] = {
+            "key_column": key_column,
+            "sort_column": sort_column,
+            "template": df.iloc[:0],
+            "owners": pd.Series(df[key_column].to_numpy(), index=df["id"].to_numpy()),
+            "frames": {key: group for key, group in df.groupby(key_column)}
+        }
+    return views
+
+
+def apply_employee_view_events(views, events):
+    for table_name, view in views.items():
+        table_events = [event for event in events if event["table"] == table_name and not (
+                event.get("reason") == "archive" and table_name in PARTITIONED_TABLES)]
+        if not table_events:
+            continue
+        changed_ids = {event["id"] for event in table_events}
+        rows = events_to_frame(list({event["id"]: event["row"] for event in table_events if "row" in event}.values()),
+                               view["template"])
+        owners = view["owners"]
+        affected = set(owners[owners.index.isin(changed_ids)].tolist()) | set(rows[view["key_column"]].tolist())
+        owners = owners[~owners.index.isin(changed_ids)]
+        view["owners"] = pd.concat([owners, pd.Series(rows[view["key_column"]].to_numpy(),
+                                                       index=rows["id"].to_numpy())])
+        for key in affected:
+            frame = view["frames"].get(key, view["template"])
+            frame = pd.concat([frame[~frame["id"].isin(changed_ids)], rows[rows[view["key_column"]] == key]],
+                              ignore_index=True)
+            if view["sort_column"]:
+                frame = frame.sort_values(view["sort_column"], ascending=False, kind="stable")
+            if frame.empty:
+                view["frames"].pop(key, None)
+            else:
+                view["frames"][key] = frame
+    return views
+
+
+def get_employee_views():
+    return get_materialized_view("employee_views", build_employee_views, apply_employee_view_events)
+
+
+def get_employee_view(employee_id, table_name):
+    view = get_employee_views()[table_name]
+    return view["frames"].get(employee_id, view["template"])
+
+
 def employee_dashboard():
     st.title(f"Welcome, {st.session_state.employee_name}!")
-    tables = get_db_connection()
-    employees = tables.get("employees", pd.DataFrame(
-        columns=["id", "employee_id", "first_name", "last_name", "email", "phone", "hire_date", "job_title",
-                 "department", "salary", "is_active"]))
-    attendance = tables.get("attendance", pd.DataFrame(columns=["id", "employee_id", "check_in", "check_out"]))
-    leave_requests = tables.get("leave_requests", pd.DataFrame(
-        columns=["id", "employee_id", "start_date", "end_date", "leave_type", "reason", "status", "created_at"]))
-    performance = tables.get("performance",
-                             pd.DataFrame(columns=["id", "employee_id", "review_date", "rating", "comments"]))
-    payroll_transactions = tables.get("payroll_transactions", pd.DataFrame(
-        columns=["id", "employee_id", "transaction_date", "gross_pay", "net_pay", "payment_method", "status",
-                 "created_at"]))
-
-    employee = employees[employees["id"] == st.session_state.employee_id]
+    employee_id = st.session_state.employee_id
+    employee = get_employee_view(employee_id, "employees")
     if not employee.empty:
         st.subheader("Your Details")
         st.write(f"Employee ID: {employee['employee_id'].iloc[0]}")
@@ -1291,8 +4541,7 @@ def employee_dashboard():
         st.write(f"Job Title: {employee['job_title'].iloc[0]}")
 
         st.subheader("Your Attendance")
-        employee_attendance = attendance[attendance["employee_id"] == st.session_state.employee_id].sort_values(
-            "check_in", ascending=False)
+        employee_attendance = get_employee_view(employee_id, "attendance")
         if not employee_attendance.empty:
             st.dataframe(
                 employee_attendance.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
@@ -1303,8 +4552,7 @@ def employee_dashboard():
             st.info("No attendance records found.")
 
         st.subheader("Your Leave Requests")
-        employee_leaves = leave_requests[leave_requests["employee_id"] == st.session_state.employee_id].sort_values(
-            "created_at", ascending=False)
+        employee_leaves = get_employee_view(employee_id, "leave_requests")
         if not employee_leaves.empty:
             st.dataframe(
                 employee_leaves.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
@@ -1315,8 +4563,7 @@ def employee_dashboard():
             st.info("No leave requests found.")
 
         st.subheader("Your Performance Reviews")
-        employee_performance = performance[performance["employee_id"] == st.session_state.employee_id].sort_values(
-            "review_date", ascending=False)
+        employee_performance = get_employee_view(employee_id, "performance")
         if not employee_performance.empty:
             st.dataframe(
                 employee_performance.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
@@ -1327,9 +4574,8 @@ def employee_dashboard():
             st.info("No performance reviews found.")
 
         st.subheader("Your Payroll")
-        employee_payroll = payroll_transactions[
-            payroll_transactions["employee_id"] == st.session_state.employee_id].sort_values("transaction_date",
-                                                                                             ascending=False).head(3)
+        employee_payroll = get_employee_view(employee_id, "payroll_transactions").head(3).drop(
+            columns=["breakdown"], errors="ignore")
         if not employee_payroll.empty:
             st.dataframe(
                 employee_payroll.style.set_properties(**{"text-align": "left", "white-space": "pre-wrap"}),
@@ -1348,18 +4594,50 @@ def employee_dashboard():
 
 def main():
     st.set_page_config(page_title="HR Management System", layout="wide")
-    if not os.path.exists(EXCEL_FILE):
-        init_db()
-
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
         st.session_state.role = None
         st.session_state.user_type = None
         st.session_state.employee_id = None
         st.session_state.employee_name = None
+        st.session_state.entity = DEFAULT_ENTITY
+        st.session_state.migrated_entities = set()
+
+    if not st.session_state.logged_in:
+        session_token = get_session_cookie()
+        session = validate_session_token(session_token) if session_token else None
+        if session and session["entity"] in load_entities():
+            st.session_state.logged_in = True
+            st.session_state.role = session["role"]
+            st.session_state.user_type = session["user_type"]
+            st.session_state.user_email = session["email"]
+            st.session_state.employee_id = session["employee_id"]
+            st.session_state.employee_name = session["employee_name"]
+            st.session_state.entity = session["entity"]
+            st.session_state.session_token = session_token
 
     if not st.session_state.logged_in:
+        if st.session_state.pop("clear_session_cookie", False):
+            set_session_cookie("", 0)
         st.title("HR Management System - Login")
+        entities = load_entities()
+        if len(entities) > 1:
+            st.session_state.entity = st.selectbox("Entity", list(entities),
+                                                   format_func=lambda x: entities[x].get("name", x),
+                                                   key="login_entity")
+        elif st.session_state.entity not in entities:
+            st.session_state.entity = next(iter(entities))
+    entity = set_current_entity(st.session_state.entity)
+    current_actor.set(st.session_state.get("user_email", "system"))
+    if not os.path.exists(entity_path(EXCEL_FILE)):
+        init_db()
+    elif st.session_state.entity not in st.session_state.migrated_entities:
+        migrate_recruitment()
+        st.session_state.migrated_entities.add(st.session_state.entity)
+    get_notification_worker()
+    show_workbook_recovery()
+
+    if not st.session_state.logged_in:
         user_type = st.selectbox("Login As", ["Admin", "Employee"], key="login_user_type")
         email = st.text_input("Email", key="login_email")
         password = st.text_input("Password", type="password", key="login_password")
@@ -1369,6 +4647,7 @@ def main():
                 st.session_state.logged_in = True
                 st.session_state.role = role
                 st.session_state.user_type = user_type
+                st.session_state.user_email = email
                 if user_type.lower() == "employee":
                     tables = get_db_connection()
                     employees = tables.get("employees", pd.DataFrame(
@@ -1381,16 +4660,27 @@ def main():
                     else:
                         st.error("Employee profile not found!")
                         return
+                st.session_state.session_token = create_session(
+                    email, role, user_type, st.session_state.entity, st.session_state.employee_id,
+                    st.session_state.employee_name)
+                st.session_state.set_session_cookie = True
                 st.success("Logged in successfully!")
                 st.rerun()
             else:
                 st.error("Invalid credentials!")
     else:
+        if st.session_state.pop("set_session_cookie", False):
+            set_session_cookie(st.session_state.session_token, SESSION_TTL_SECONDS)
         st.sidebar.title(
             f"Welcome, {st.session_state.employee_name if st.session_state.user_type == 'employee' else 'Admin'}")
+        if len(load_entities()) > 1:
+            st.sidebar.caption(f"Entity: {entity.get('name', st.session_state.entity)}")
         if st.sidebar.button("Logout", key="logout_button"):
+            if st.session_state.get("session_token"):
+                revoke_session(st.session_state.session_token)
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
+            st.session_state.clear_session_cookie = True
             st.success("Logged out successfully!")
             st.rerun()
 
@@ -1401,7 +4691,7 @@ def main():
             menu = st.sidebar.selectbox(
                 "Menu",
                 ["Dashboard", "Employee Management", "Leave Management", "Attendance Tracking",
-                 "Performance Management", "Recruitment", "Payroll Management", "Password Vault"],
+                 "Performance Management", "Recruitment", "Payroll Management", "Data Export", "Password Vault"],
                 key="admin_menu"
             )
             if menu == "Dashboard":
@@ -1418,6 +4708,8 @@ def main():
                 recruitment_management()
             elif menu == "Payroll Management":
                 payroll_management()
+            elif menu == "Data Export":
+                show_data_export()
             elif menu == "Password Vault":
                 password_vault()
         else:
@@ -0,0 +1,269 @@
+# Migrates hrms_data.xlsx (and archived parquet partitions) into an indexed SQLite database.
+# Run with: python migrate_to_sqlite.py [--entity NAME] [--database hrms_data.db]
+# Sheets are streamed in chunks, normalized to the init_db() schemas, bulk inserted and verified.
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+import main
+
+DEFAULT_DATABASE = "hrms_data.db"
+DEFAULT_CHUNK_ROWS = 20000
+DATETIME_COLUMNS = {"hire_date", "check_in", "check_out", "review_date", "opened_date", "application_date",
+                    "changed_at", "start_date", "end_date", "created_at", "transaction_date", "effective_date"}
+INDEXED_COLUMNS = ["employee_id", "position_id", "applicant_id", "email", "status", "stage"]
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+
+
+def get_column_types(table_name, columns):
+    schema = main.get_table_schemas().get(table_name)
+    column_types = {}
+    for column in columns:
+        dtype = schema[column].dtype if schema is not None and column in schema.columns else None
+        if column in DATETIME_COLUMNS:
+            column_types[column] = "DATETIME"
+        elif column == "id" or (dtype is not None and pd.api.types.is_integer_dtype(dtype)):
+            column_types[column] = "INTEGER"
+        elif dtype is not None and pd.api.types.is_float_dtype(dtype):
+            column_types[column] = "REAL"
+        else:
+            column_types[column] = "TEXT"
+    return column_types
+
+
+def normalize_column(values, column_type):
+    present = values.notna()
+    if column_type == "INTEGER":
+        numbers = pd.to_numeric(values, errors="coerce")
+        numbers = numbers.where(numbers == numbers.round())
+        normalized = [None if pd.isna(value) else int(value) for value in numbers.tolist()]
+    elif column_type == "REAL":
+        numbers = pd.to_numeric(values, errors="coerce")
+        normalized = [None if pd.isna(value) else float(value) for value in numbers.tolist()]
+    elif column_type == "DATETIME":
+        is_number = values.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool))
+        dates = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        if is_number.any():
+            serials = pd.to_numeric(values[is_number], errors="coerce")
+            dates[is_number] = EXCEL_EPOCH + pd.to_timedelta(serials, unit="D")
+        if (~is_number).any():
+            dates[~is_number] = pd.to_datetime(values[~is_number].astype(object), errors="coerce", format="mixed")
+        normalized = [None if pd.isna(value) else str(value) for value in dates.tolist()]
+    else:
+        normalized = [None if value is None or (isinstance(value, float) and pd.isna(value))
+                      else str(int(value)) if isinstance(value, float) and value.is_integer()
+                      else str(value) for value in values.tolist()]
+    failures = int((present & pd.Series([value is None for value in normalized], index=values.index)).sum())
+    return normalized, failures
+
+
+def normalize_chunk(df, column_types):
+    columns = {}
+    failures = {}
+    for column, column_type in column_types.items():
+        values = df[column] if column in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+        columns[column], failed = normalize_column(values, column_type)
+        if failed:
+            failures[column] = failed
+    return list(zip(*columns.values())) if columns else [], failures
+
+
+def row_checksum(rows):
+    total = 0
+    for row in rows:
+        total += int.from_bytes(hashlib.blake2b(repr(row).encode("utf-8"), digest_size=8).digest(), "big")
+    return total % (1 << 64)
+
+
+def iter_sheet_chunks(worksheet, chunk_rows):
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    columns = [str(column) if column is not None else f"column_{position}" for position, column in enumerate(header)]
+    batch = []
+    yielded = False
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch, columns=columns)
+            batch = []
+            yielded = True
+    if batch or not yielded:
+        yield pd.DataFrame(batch, columns=columns)
+
+
+def iter_archive_chunks(table_name, chunk_rows):
+    for month in main.load_archive_manifest().get(table_name, {}).get("partitions", []):
+        path = main.entity_path(main.ARCHIVE_DIR, table_name, f"{month}.parquet")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+
+
+def create_table(connection, table_name, column_types):
+    definitions = [f'"{column}" INTEGER PRIMARY KEY' if column == "id" else
+                   f'"{column}" {"TEXT" if column_type == "DATETIME" else column_type}'
+                   for column, column_type in column_types.items()]
+    connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    connection.execute(f'CREATE TABLE "{table_name}" ({", ".join(definitions)})')
+
+
+def create_indexes(connection, table_name, column_types):
+    indexed = [column for column in INDEXED_COLUMNS if column in column_types]
+    date_column = main.PARTITIONED_TABLES.get(table_name)
+    if date_column in column_types:
+        indexed.append(date_column)
+    for column in indexed:
+        connection.execute(f'CREATE INDEX "idx_{table_name}_{column}" ON "{table_name}" ("{column}")')
+    return indexed
+
+
+def migrate_table(connection, table_name, chunks, duplicates, chunk_rows):
+    report = {"table": table_name, "source_rows": 0, "loaded_rows": 0, "duplicate_ids": 0, "renumbered": 0,
+              "skipped": 0, "coercion_failures": {}, "duplicates": []}
+    column_types = None
+    placeholders = None
+    seen = set()
+    deferred = []
+    checksum = 0
+    max_id = 0
+    for chunk in chunks:
+        if column_types is None:
+            schema = main.get_table_schemas().get(table_name, pd.DataFrame())
+            columns = ["id"] + [column for column in chunk.columns if column != "id"]
+            column_types = get_column_types(table_name, columns + [column for column in schema.columns
+                                                                   if column not in columns])
+            create_table(connection, table_name, column_types)
+            placeholders = ", ".join("?" * len(column_types))
+        rows, failures = normalize_chunk(chunk, column_types)
+        report["source_rows"] += len(rows)
+        for column, failed in failures.items():
+            report["coercion_failures"][column] = report["coercion_failures"].get(column, 0) + failed
+        unique_rows = []
+        for row in rows:
+            row_id = row[0]
+            if row_id is None or row_id in seen:
+                report["duplicate_ids"] += 1
+                if len(report["duplicates"]) < 20:
+                    report["duplicates"].append(row_id)
+                if duplicates == "renumber":
+                    deferred.append(row)
+                else:
+                    report["skipped"] += 1
+                continue
+            seen.add(row_id)
+            max_id = max(max_id, row_id)
+            unique_rows.append(row)
+        connection.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', unique_rows)
+        checksum = (checksum + row_checksum(unique_rows)) % (1 << 64)
+        report["loaded_rows"] += len(unique_rows)
+    if column_types is None:
+        return None
+    for start in range(0, len(deferred), chunk_rows):
+        renumbered = [(max_id + start + offset + 1,) + row[1:]
+                      for offset, row in enumerate(deferred[start:start + chunk_rows])]
+        connection.executemany(f'INSERT INTO "{table_name}" VALUES ({placeholders})', renumbered)
+        checksum = (checksum + row_checksum(renumbered)) % (1 << 64)
+        report["loaded_rows"] += len(renumbered)
+        report["renumbered"] += len(renumbered)
+    report["indexes"] = create_indexes(connection, table_name, column_types)
+    report["checksum"] = checksum
+    return report
+
+
+def verify_table(connection, report, chunk_rows):
+    cursor = connection.execute(f'SELECT * FROM "{report["table"]}"')
+    count = 0
+    checksum = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        count += len(rows)
+        checksum = (checksum + row_checksum(rows)) % (1 << 64)
+    report["count_ok"] = count == report["loaded_rows"] == report["source_rows"] - report["skipped"]
+    report["checksum_ok"] = checksum == report["checksum"]
+    return report["count_ok"] and report["checksum_ok"]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Migrate the HRMS workbook into an indexed SQLite database")
+    parser.add_argument("--entity", default=main.DEFAULT_ENTITY)
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--duplicates", choices=["renumber", "skip"], default="renumber",
+                        help="Give duplicate or missing ids new ids, or skip the later rows")
+    parser.add_argument("--skip-archive", action="store_true", help="Do not load archived parquet partitions")
+    args = parser.parse_args()
+
+    try:
+        main.set_current_entity(args.entity)
+    except KeyError as e:
+        sys.exit(str(e.args[0]))
+    workbook_path = main.entity_path(main.EXCEL_FILE)
+    database_path = args.database or main.entity_path(DEFAULT_DATABASE)
+    if not os.path.exists(workbook_path):
+        sys.exit(f"{workbook_path} not found")
+
+    started = time.perf_counter()
+    workbook = load_workbook(workbook_path, read_only=True, data_only=True)
+    connection = sqlite3.connect(database_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    reports = []
+    try:
+        for table_name in workbook.sheetnames:
+            chunks = iter_sheet_chunks(workbook[table_name], args.chunk_rows)
+            if table_name in main.PARTITIONED_TABLES and not args.skip_archive:
+                chunks = (chunk for source in (iter_archive_chunks(table_name, args.chunk_rows), chunks)
+                          for chunk in source)
+            with connection:
+                report = migrate_table(connection, table_name, chunks, args.duplicates, args.chunk_rows)
+            if report is not None:
+                verify_table(connection, report, args.chunk_rows)
+                reports.append(report)
+        with connection:
+            connection.execute('DROP TABLE IF EXISTS "_migration"')
+            connection.execute('CREATE TABLE "_migration" (table_name TEXT PRIMARY KEY, source_rows INTEGER, '
+                               'loaded_rows INTEGER, checksum TEXT, migrated_at TEXT)')
+            connection.executemany('INSERT INTO "_migration" VALUES (?, ?, ?, ?, ?)', [
+                (report["table"], report["source_rows"], report["loaded_rows"], f"{report['checksum']:016x}",
+                 datetime.now().isoformat(timespec="seconds")) for report in reports])
+        connection.execute("PRAGMA synchronous=FULL")
+    finally:
+        connection.close()
+        workbook.close()
+
+    failed = False
+    print(f"{'table':<22} {'source':>9} {'loaded':>9} {'dupes':>6} {'fixed':>6} {'skipped':>7}  verified")
+    for report in reports:
+        verified = report["count_ok"] and report["checksum_ok"]
+        failed = failed or not verified
+        print(f"{report['table']:<22} {report['source_rows']:>9} {report['loaded_rows']:>9} "
+              f"{report['duplicate_ids']:>6} {report['renumbered']:>6} {report['skipped']:>7}  "
+              f"{'ok' if verified else 'FAILED'}")
+        if report["duplicates"]:
+            shown = ", ".join(str(row_id) for row_id in report["duplicates"])
+            print(f"  duplicate or missing ids: {shown}{' ...' if report['duplicate_ids'] > 20 else ''}")
+        for column, count in report["coercion_failures"].items():
+            print(f"  {count} value(s) in {column} could not be converted and were stored as NULL")
+    print(f"Migrated {len(reports)} tables to {database_path} in {time.perf_counter() - started:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
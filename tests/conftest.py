@@ -0,0 +1,40 @@
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+@pytest.fixture
+def entity(tmp_path):
+    token = main.current_entity_dir.set(str(tmp_path))
+    main.save_db(main.get_table_schemas())
+    yield tmp_path
+    main.current_entity_dir.reset(token)
+
+
+def seed_employees(salaries, allowances=(), deductions=()):
+    tables = main.get_db_connection()
+    tables["employees"] = pd.DataFrame([{
+        "id": employee_id, "employee_id": f"E{employee_id:04d}", "first_name": f"First{employee_id}",
+        "last_name": f"Last{employee_id}", "email": f"employee{employee_id}", "phone": "1",
+        "hire_date": datetime(2023, 1, 1), "job_title": "Engineer", "department": "Engineering",
+        "salary": float(salary), "is_active": 1
+    } for employee_id, salary in salaries.items()])
+    tables["payroll_allowances"] = pd.DataFrame([{
+        "id": allowance_id, "employee_id": employee_id, "allowance_type": allowance_type, "amount": float(amount),
+        "effective_date": effective_date
+    } for allowance_id, (employee_id, allowance_type, amount, effective_date) in enumerate(allowances, start=1)],
+        columns=["id", "employee_id", "allowance_type", "amount", "effective_date"])
+    tables["payroll_deductions"] = pd.DataFrame([{
+        "id": deduction_id, "employee_id": employee_id, "deduction_type": deduction_type, "amount": float(amount),
+        "effective_date": effective_date
+    } for deduction_id, (employee_id, deduction_type, amount, effective_date) in enumerate(deductions, start=1)],
+        columns=["id", "employee_id", "deduction_type", "amount", "effective_date"])
+    assert main.save_db(tables)
+    return tables
@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from conftest import seed_employees
+
+OLD_REGIME = main.DEFAULT_TAX_CONFIG["income_tax"]["2024-25"]["old"]
+PAYROLL_DATE = datetime(2025, 1, 31)
+
+
+def payslip_earnings(payslip):
+    return (payslip["base_salary"] + sum(amount for _, amount in payslip["allowances"]) +
+            payslip["overtime_pay"] + sum(gross for _, gross, _ in payslip["adjustments"]))
+
+
+def test_evaluate_slabs_progressive():
+    annual_tax, position = main.evaluate_slabs([200000, 250000, 360000, 500000, 720000, 1200000], OLD_REGIME)
+    assert np.allclose(annual_tax, [0, 0, 5500, 12500, 56500, 172500])
+    assert list(position) == [0, 0, 1, 1, 2, 3]
+
+
+def test_evaluate_slabs_flat_lookup():
+    slabs = main.DEFAULT_TAX_CONFIG["professional_tax"]["Maharashtra"]
+    professional_tax, _ = main.evaluate_slabs([5000, 7500, 7501, 10000, 20000], slabs, progressive=False)
+    assert np.allclose(professional_tax, [0, 0, 175, 175, 200])
+
+
+@pytest.mark.parametrize("gross_pay, expected", [
+    (20000, 0 + 2400 + 200 + 100),
+    (30000, 5500 / 12 + 3600 + 200 + 100),
+    (60000, 56500 / 12 + 7200 + 200 + 100),
+    (100000, 172500 / 12 + 12000 + 200 + 100),
+])
+def test_calculate_deductions_matches_baseline(entity, gross_pay, expected):
+    seed_employees({1: gross_pay}, deductions=[(1, "Loan", 100, datetime(2024, 6, 1))])
+    assert main.calculate_deductions(1, gross_pay, PAYROLL_DATE) == pytest.approx(expected)
+
+
+def test_run_payroll_matches_baseline(entity):
+    seed_employees({1: 50000}, allowances=[(1, "HRA", 5000, datetime(2024, 6, 1))],
+                   deductions=[(1, "Loan", 100, datetime(2024, 6, 1))])
+    new_transactions, saved = main.run_payroll(PAYROLL_DATE, "All")
+    assert saved
+    transaction = new_transactions.iloc[0]
+    assert transaction["gross_pay"] == pytest.approx(55000)
+    assert transaction["net_pay"] == pytest.approx(55000 - (44500 / 12 + 6600 + 200 + 100))
+
+
+def test_compensation_index_supersedes_by_effective_date(entity):
+    tables = seed_employees({1: 50000}, allowances=[
+        (1, "HRA", 5000, datetime(2024, 6, 1)),
+        (1, "HRA", 7000, datetime(2025, 1, 15)),
+        (1, "Transport", 1000, datetime(2025, 2, 1)),
+        (1, "Meal", 300, datetime(2025, 1, 1)),
+        (1, "Meal", 400, datetime(2025, 1, 1)),
+    ])
+    index = main.get_compensation_index(tables)["allowances"]
+    assert main.get_compensation_in_force(index, 1, datetime(2024, 5, 31)) == []
+    assert sorted(main.get_compensation_in_force(index, 1, datetime(2025, 1, 14))) == [("HRA", 5000), ("Meal", 400)]
+    assert sorted(main.get_compensation_in_force(index, 1, datetime(2025, 1, 15))) == [("HRA", 7000), ("Meal", 400)]
+    assert sorted(main.get_compensation_in_force(index, 1, datetime(2025, 3, 1))) == [
+        ("HRA", 7000), ("Meal", 400), ("Transport", 1000)]
+    assert main.get_compensation_in_force(index, 2, datetime(2025, 3, 1)) == []
+
+
+def test_recalculate_payroll_is_idempotent_after_posting(entity):
+    seed_employees({1: 50000, 2: 60000}, allowances=[(1, "HRA", 5000, datetime(2024, 6, 1))])
+    main.run_payroll(datetime(2025, 1, 31), "All")
+    main.run_payroll(datetime(2025, 2, 28), "All")
+
+    tables = main.get_db_connection()
+    allowances = tables["payroll_allowances"]
+    tables["payroll_allowances"] = pd.concat([allowances, pd.DataFrame([{
+        "id": 2, "employee_id": 1, "allowance_type": "HRA", "amount": 8000.0, "effective_date": datetime(2025, 1, 20)
+    }])], ignore_index=True)
+    assert main.save_db(tables)
+
+    changes = [(1, datetime(2025, 1, 20), None)]
+    diffs = main.recalculate_payroll(changes)
+    assert len(diffs) == 2
+    assert (diffs["gross_difference"] == 3000).all()
+    assert main.post_payroll_adjustments(diffs, datetime(2025, 3, 31)) == 2
+
+    arrears = main.get_db_connection()["payroll_transactions"].query("transaction_type == 'arrears'")
+    assert (pd.to_datetime(arrears["transaction_date"]) == datetime(2025, 3, 31)).all()
+    assert sorted(pd.to_datetime(arrears["period_date"])) == [datetime(2025, 1, 31), datetime(2025, 2, 28)]
+
+    diffs = main.recalculate_payroll(changes)
+    assert len(diffs) == 2
+    assert (diffs["gross_difference"] == 0).all()
+    assert (diffs["net_difference"] == 0).all()
+    assert main.post_payroll_adjustments(diffs, datetime(2025, 3, 31)) == 0
+
+
+def test_payslip_totals_reconcile_with_stored_pay(entity):
+    seed_employees({1: 50000, 2: 60000}, allowances=[(1, "HRA", 5000, datetime(2024, 6, 1))],
+                   deductions=[(2, "Loan", 100, datetime(2024, 6, 1))])
+    main.run_payroll(PAYROLL_DATE, "All")
+    tables = main.get_db_connection()
+    tables["employees"].loc[tables["employees"]["id"] == 1, "salary"] = 90000.0
+    assert main.save_db(tables)
+
+    payslips, skipped = main.build_payslips(PAYROLL_DATE, "All")
+    assert skipped == []
+    transactions = main.get_db_connection()["payroll_transactions"].set_index("employee_id")
+    for payslip in payslips:
+        stored = transactions.loc[int(payslip["employee_id"][1:])]
+        assert payslip_earnings(payslip) == pytest.approx(stored["gross_pay"])
+        assert payslip["gross_pay"] == pytest.approx(stored["gross_pay"])
+        assert payslip["gross_pay"] - payslip["total_deductions"] == pytest.approx(stored["net_pay"])
+        assert payslip["net_pay"] == pytest.approx(stored["net_pay"])
+    assert [payslip["base_salary"] for payslip in payslips if payslip["employee_id"] == "E0001"] == [50000]
+
+
+def test_payslip_includes_adjustments_paid_on_the_same_date(entity):
+    seed_employees({1: 50000})
+    main.run_payroll(datetime(2025, 1, 31), "All")
+    tables = main.get_db_connection()
+    tables["payroll_allowances"] = pd.DataFrame([{
+        "id": 1, "employee_id": 1, "allowance_type": "HRA", "amount": 2000.0, "effective_date": datetime(2025, 1, 1)
+    }])
+    assert main.save_db(tables)
+    diffs = main.recalculate_payroll([(1, datetime(2025, 1, 1), None)])
+    main.post_payroll_adjustments(diffs, datetime(2025, 2, 28))
+    main.run_payroll(datetime(2025, 2, 28), "All")
+
+    payslips, skipped = main.build_payslips(datetime(2025, 2, 28), "All")
+    assert skipped == []
+    payslip = payslips[0]
+    assert [label for label, _, _ in payslip["adjustments"]] == ["Arrears for Jan 2025"]
+    stored = main.get_db_connection()["payroll_transactions"]
+    stored = stored[pd.to_datetime(stored["transaction_date"]) == datetime(2025, 2, 28)]
+    assert payslip_earnings(payslip) == pytest.approx(stored["gross_pay"].sum())
+    assert payslip["gross_pay"] == pytest.approx(stored["gross_pay"].sum())
+    assert payslip["gross_pay"] - payslip["total_deductions"] == pytest.approx(stored["net_pay"].sum())
+
+
+def test_payslip_skips_legacy_rows_that_no_longer_reconcile(entity):
+    seed_employees({1: 50000, 2: 60000})
+    main.run_payroll(PAYROLL_DATE, "All")
+    tables = main.get_db_connection()
+    tables["payroll_transactions"]["breakdown"] = None
+    tables["employees"].loc[tables["employees"]["id"] == 1, "salary"] = 90000.0
+    assert main.save_db(tables)
+
+    payslips, skipped = main.build_payslips(PAYROLL_DATE, "All")
+    assert [payslip["employee_id"] for payslip in payslips] == ["E0002"]
+    assert skipped == [int(tables["payroll_transactions"].query("employee_id == 1")["id"].iloc[0])]